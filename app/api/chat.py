@@ -1,7 +1,11 @@
+import json
 from fastapi import APIRouter, Depends, Query, Body, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.services.chat_service import ChatService
 from app.dependencies import get_chat_service
+from app.api.errors import admission_error
+from app.core.executors import AdmissionError
 from app.core.logger import logger
 
 router = APIRouter()
@@ -10,7 +14,7 @@ class ChatQuery(BaseModel):
     query: str
 
 @router.post("")
-def chat_endpoint(
+async def chat_endpoint(
     repo_name: str = Query(..., description="Repository name to query"),
     payload: ChatQuery = Body(..., description="User query payload"),
     chat_service: ChatService = Depends(get_chat_service),
@@ -18,11 +22,14 @@ def chat_endpoint(
     try:
         logger.info(f"Received chat request | repo={repo_name} | query='{payload.query}'")
 
-        response = chat_service.answer_question(repo_name, payload.query)
+        response = await chat_service.answer_question_async(repo_name, payload.query)
 
         logger.info(f"Response generated successfully | repo={repo_name}")
         return {"answer": response}
 
+    except AdmissionError as e:
+        raise admission_error(e)
+
     except ValueError as ve:
         logger.warning(f"Validation error | repo={repo_name} | error={str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -30,3 +37,53 @@ def chat_endpoint(
     except Exception as e:
         logger.exception(f"Unexpected error in chat_endpoint | repo={repo_name}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def _sse(event: str, data: dict) -> str:
+    """One Server-Sent Event; JSON data keeps newlines inside tokens intact."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/stream")
+async def chat_stream_endpoint(
+    repo_name: str = Query(..., description="Repository name to query"),
+    payload: ChatQuery = Body(..., description="User query payload"),
+    chat_service: ChatService = Depends(get_chat_service),
+):
+    """
+    Stream the answer as Server-Sent Events: `token` events carrying {"token": ...},
+    then a final `done` event (or `error` if generation fails midway).
+    """
+    if not payload.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+
+    logger.info(f"Received streaming chat request | repo={repo_name} | query='{payload.query}'")
+    try:
+        # Retrieval runs on the embedding/search executors; generation holds an LLM worker
+        # until it ends, so streams never run more generations than LLM_EXECUTOR_WORKERS
+        stream = await chat_service.stream_answer_async(repo_name, payload.query)
+    except AdmissionError as e:
+        raise admission_error(e)
+    except ValueError as ve:
+        logger.warning(f"Validation error | repo={repo_name} | error={str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception:
+        logger.exception(f"Unexpected error in chat_stream_endpoint | repo={repo_name}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    async def events():
+        try:
+            async for token in stream:
+                yield _sse("token", {"token": token})
+            yield _sse("done", {})
+            logger.info(f"Streamed response successfully | repo={repo_name}")
+        except Exception:
+            logger.exception(f"Unexpected error in chat_stream_endpoint | repo={repo_name}")
+            yield _sse("error", {"detail": "Internal server error"})
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
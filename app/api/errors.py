@@ -0,0 +1,9 @@
+from fastapi import HTTPException
+from app.core.executors import AdmissionError
+from app.core.logger import logger
+
+
+def admission_error(e: AdmissionError) -> HTTPException:
+    """HTTP error for work refused by an overloaded executor (429 saturated, 503 timed out)."""
+    logger.warning(f"Rejected request: {e}")
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from app.core.warmup import Warmup
+from app.dependencies import get_warmup
+
+router = APIRouter()
+
+@router.get("/live")
+def liveness():
+    """The process is up and serving requests (models may still be loading)."""
+    return {"status": "alive"}
+
+@router.get("/ready")
+def readiness(warmup: Warmup = Depends(get_warmup)):
+    """503 until the start-up warm-up has loaded every model, so traffic is only routed to warm instances."""
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
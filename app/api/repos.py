@@ -1,23 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pathlib import Path
 from app.core.config import settings
 from app.core.logger import logger
+from app.dependencies import get_index_jobs
+from app.services.index_jobs import IndexJobRunner
+from scripts.init_db import list_repo_paths
 
 router = APIRouter()
 
 @router.get("/")
-def list_indexed_repos():
+def list_indexed_repos(jobs: IndexJobRunner = Depends(get_index_jobs)):
+    """
+    Indexed repositories, plus indexing status per repo: queued / running / ready / failed
+    with file progress for repos that have a job, "ready" for indexes built earlier.
+    """
     try:
         root = Path(settings.VECTOR_STORE_DIR)
+        job_status = jobs.jobs()
 
         if not root.exists() or not root.is_dir():
-            logger.warning(f"Vector store directory not found: {root}")
-            raise HTTPException(status_code=404, detail="Vector store directory not found")
-
-        repos = [p.name for p in root.iterdir() if p.is_dir()]
+            if not job_status:
+                logger.warning(f"Vector store directory not found: {root}")
+                raise HTTPException(status_code=404, detail="Vector store directory not found")
+            repos = []
+        else:
+            repos = [p.name for p in root.iterdir() if p.is_dir()]
 
+        status = {name: {"repo_name": name, "state": "ready"} for name in repos}
+        status.update(job_status)
         logger.info(f"Indexed repositories found: {repos}")
-        return {"repos": repos}
+        return {"repos": repos, "status": status}
 
     except HTTPException:
         # re-raise so FastAPI handles it properly
@@ -26,3 +38,29 @@ def list_indexed_repos():
     except Exception as e:
         logger.exception("Unexpected error while listing indexed repositories")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/index", status_code=202)
+def index_all_repos(full_rebuild: bool = False, jobs: IndexJobRunner = Depends(get_index_jobs)):
+    """Queue indexing of every repository under CODEATLAS_REPO_ROOT."""
+    queued = jobs.submit_all((str(path) for path in list_repo_paths()), full_rebuild=full_rebuild)
+    return {"jobs": {name: job.to_dict() for name, job in queued.items()}}
+
+
+@router.post("/{repo_name}/index", status_code=202)
+def index_repo_endpoint(repo_name: str, full_rebuild: bool = False, jobs: IndexJobRunner = Depends(get_index_jobs)):
+    """Queue (re-)indexing of one repository; returns its job (the existing one if already queued or running)."""
+    repo_path = next((path for path in list_repo_paths() if path.name == repo_name), None)
+    if repo_path is None:
+        raise HTTPException(status_code=404, detail=f"Repository '{repo_name}' not found under the repo root")
+    return jobs.submit(str(repo_path), full_rebuild=full_rebuild).to_dict()
+
+
+@router.get("/{repo_name}/status")
+def repo_status(repo_name: str, jobs: IndexJobRunner = Depends(get_index_jobs)):
+    status = jobs.get(repo_name)
+    if status is not None:
+        return status
+    if (Path(settings.VECTOR_STORE_DIR) / repo_name).is_dir():
+        return {"repo_name": repo_name, "state": "ready"}
+    raise HTTPException(status_code=404, detail=f"Repository '{repo_name}' has no index or indexing job")
@@ -1,46 +1,179 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.dependencies import get_code_searcher
-from app.services.searcher import CodeSearcher
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.dependencies import get_answer_cache, get_code_searcher, get_embedder, get_query_cache, get_searcher
+from app.models.query import BatchSearchRequest
+from app.services.searcher import SEARCH_MODES, CodeSearcher
+from app.core.config import settings
+from app.api.errors import admission_error
+from app.core.executors import AdmissionError, executor_stats
 from app.core.logger import logger
 
 router = APIRouter()
 
+def format_results(results) -> list:
+    return [
+        {
+            "score": float(score),
+            "path": meta["path"],
+            "name": meta["name"],
+            "type": meta["type"],
+            "start_line": meta["start_line"],
+            "end_line": meta["end_line"],
+            **({"text": meta["text"]} if "text" in meta else {}),
+        }
+        for score, meta in results
+    ]
+
 @router.get("")
-def search_endpoint(
+async def search_endpoint(
     repo_name: str,
     query: str,
     top_k: int = 5,
+    nprobe: int = Query(None, ge=1, description="IVF lists to visit (IVF indexes only)"),
+    ef_search: int = Query(None, ge=1, description="HNSW search breadth (HNSW indexes only)"),
+    min_score: float = Query(
+        None, ge=0.0, le=1.0,
+        description="Drop vector/hybrid results scoring below this (0-1); lexical results use LEXICAL_MIN_SCORE",
+    ),
+    mode: str = Query(None, description="auto, semantic, hybrid or lexical (default SEARCH_MODE)"),
+    include_text: bool = Query(False, description="Return each hit's indexed source text inline"),
     searcher: CodeSearcher = Depends(get_code_searcher)
 ):
     """
-    Perform semantic search over indexed code.
+    Perform semantic, lexical (BM25 over identifiers) or hybrid search over indexed code.
     """
     if not query.strip():
         logger.warning("Received empty search query")
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
+    if mode is not None and mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(SEARCH_MODES)}.")
 
     try:
         logger.info(f"Search request - repo: {repo_name}, query: '{query}', top_k: {top_k}")
 
-        results = searcher.semantic_search(repo_name, query, top_k)
-
-        formatted = [
-            {
-                "score": float(score),
-                "path": meta["path"],
-                "name": meta["name"],
-                "type": meta["type"],
-                "start_line": meta["start_line"],
-                "end_line": meta["end_line"]
-            }
-            for score, meta in results
-        ]
+        # Only forward the tuning knobs that were set
+        tuning = {
+            k: v
+            for k, v in (("nprobe", nprobe), ("ef_search", ef_search), ("min_score", min_score), ("mode", mode))
+            if v is not None
+        }
+        if include_text:
+            tuning["with_text"] = True
+        results = await searcher.semantic_search_async(repo_name, query, top_k, **tuning)
+
+        formatted = format_results(results)
 
         logger.info(f"Search results - repo: {repo_name}, matches found: {len(formatted)}")
         return {"results": formatted}
 
     except HTTPException:
         raise
+    except AdmissionError as e:
+        raise admission_error(e)
     except Exception as e:
         logger.exception(f"Unexpected error during search in repo: {repo_name}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/stats")
+def search_stats():
+    """
+    Query embedding and chat answer cache counters, executor load (in flight, rejected,
+    timed out) and query batch-size histogram (once the embedder has been loaded).
+    """
+    stats = {
+        "query_embedding_cache": get_query_cache().stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "executors": executor_stats(),
+    }
+    # Only report on an embedder that already exists; a stats call should never load the model
+    if get_embedder.cache_info().currsize and get_embedder().query_batcher is not None:
+        stats["query_batcher"] = get_embedder().query_batcher.stats()
+    return stats
+
+
+@router.post("/batch")
+async def batch_search_endpoint(
+    payload: BatchSearchRequest,
+    searcher: CodeSearcher = Depends(get_searcher),
+):
+    """
+    Run many queries in one request, optionally across repos. Queries are embedded
+    together and each repo's index is searched once for all of its queries.
+    """
+    if not payload.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required.")
+    if len(payload.queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.SEARCH_BATCH_MAX_QUERIES} queries per batch."
+        )
+    pairs = []
+    for item in payload.queries:
+        repo_name = item.repo_name or payload.repo_name
+        if not repo_name:
+            raise HTTPException(status_code=400, detail="Each query needs a repo_name (per query or per request).")
+        if not item.query.strip():
+            raise HTTPException(status_code=400, detail="Query cannot be empty.")
+        pairs.append((repo_name, item.query))
+
+    try:
+        logger.info(f"Batch search request - {len(pairs)} queries over {len({r for r, _ in pairs})} repos")
+        tuning = {
+            k: v for k, v in (("nprobe", payload.nprobe), ("ef_search", payload.ef_search),
+                              ("min_score", payload.min_score)) if v is not None
+        }
+        results = await searcher.search_batch_async(pairs, payload.top_k, **tuning)
+        return {
+            "results": [
+                {"repo_name": repo_name, "query": query, "results": format_results(hits)}
+                if hits is not None else
+                {"repo_name": repo_name, "query": query, "results": [], "error": "Repository index not available"}
+                for (repo_name, query), hits in zip(pairs, results)
+            ]
+        }
+
+    except AdmissionError as e:
+        raise admission_error(e)
+    except Exception as e:
+        logger.exception("Unexpected error during batch search")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/federated")
+async def federated_search_endpoint(
+    query: str,
+    repos: List[str] = Query(None, description="Repos to search (repeat the parameter); all indexed repos if omitted"),
+    top_k: int = Query(10, ge=1),
+    timeout_ms: int = Query(None, ge=1, description="Per-repo timeout; slower repos are skipped"),
+    total_timeout_ms: int = Query(None, ge=1, description="Deadline for all repos together; unfinished repos are skipped"),
+    nprobe: int = Query(None, ge=1, description="IVF lists to visit (IVF indexes only)"),
+    ef_search: int = Query(None, ge=1, description="HNSW search breadth (HNSW indexes only)"),
+    min_score: float = Query(None, ge=0.0, le=1.0, description="Drop results scoring below this (0-1)"),
+    searcher: CodeSearcher = Depends(get_searcher),
+):
+    """
+    Search one query across many repos and return a single merged top-k.
+    """
+    if not query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+
+    try:
+        tuning = {
+            k: v for k, v in (("nprobe", nprobe), ("ef_search", ef_search), ("min_score", min_score)) if v is not None
+        }
+        timeout = timeout_ms / 1000.0 if timeout_ms is not None else None
+        total_timeout = total_timeout_ms / 1000.0 if total_timeout_ms is not None else None
+        hits, statuses = await searcher.federated_search(
+            query, repos, top_k, timeout=timeout, total_timeout=total_timeout, **tuning
+        )
+        results = [
+            {"repo_name": meta["repo_name"], **item}
+            for (_, meta), item in zip(hits, format_results(hits))
+        ]
+        return {"results": results, "repos": statuses}
+
+    except AdmissionError as e:
+        raise admission_error(e)
+    except Exception as e:
+        logger.exception("Unexpected error during federated search")
+        raise HTTPException(status_code=500, detail="Internal server error")
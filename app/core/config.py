@@ -1,3 +1,4 @@
+from typing import List
 from dotenv import load_dotenv
 from pydantic import BaseSettings
 
@@ -13,6 +14,7 @@ class Settings(BaseSettings):
 
     # OpenAI config (optional)
     OPENAI_API_KEY: str = None
+    OPENAI_TEMPERATURE: float = 0.7  # Sampling temperature; answers are only cached at 0
 
     # LLM backend (required from .env)
     CODEATLAS_CHAT_BACKEND: str
@@ -24,6 +26,79 @@ class Settings(BaseSettings):
 
     VECTOR_STORE_DIR: str = "vector_store"  # Optional default kept
 
+    # In-memory index registry (shared across requests)
+    INDEX_CACHE_MAX_BYTES: int = 4 * 1024 ** 3  # Evict least recently used repos beyond this
+    INDEX_MMAP_MODE: str = "auto"  # "auto" memory-maps indexes of at least INDEX_MMAP_MIN_BYTES; "always" / "never"
+    INDEX_MMAP_MIN_BYTES: int = 64 * 1024 ** 2  # Mapped vectors are shared by all uvicorn workers via the page cache
+
+    # Similarity: "cosine" normalizes embeddings into an inner-product index (matches BGE training); "l2" ranks by distance
+    SIMILARITY_METRIC: str = "cosine"
+    EMBEDDING_QUERY_INSTRUCTION: str = None  # Query prefix; None uses the model's default (BGE instruction for bge-*-en)
+    QUERY_CACHE_SIZE: int = 4096  # Query embeddings kept in an in-process LRU (0 disables)
+    QUERY_CACHE_PATH: str = None  # Optional .npz file persisting the query cache across restarts
+    QUERY_BATCH_MAX_SIZE: int = 32  # Concurrent queries coalesced into one model call (1 disables batching)
+    QUERY_BATCH_WINDOW_MS: float = 5.0  # How long the first query of a batch waits for others to join
+    SEARCH_MIN_SCORE: float = 0.0  # Drop /search hits scoring below this (scores are 0-1)
+    LEXICAL_MIN_SCORE: float = 0.0  # Drop BM25 hits below this raw score (SEARCH_MIN_SCORE / CHAT_MIN_SCORE do not apply to lexical-only results)
+    SEARCH_MODE: str = "semantic"  # "hybrid" (vectors + BM25 fused by rank), "lexical" or "auto" (lexical for identifier queries, else hybrid)
+    HYBRID_CANDIDATES: int = 50  # Hits taken from each retriever before reciprocal-rank fusion
+    SEARCH_BATCH_MAX_QUERIES: int = 1000  # Largest accepted POST /search/batch request
+    FEDERATED_REPO_TIMEOUT: float = 2.0  # Seconds a federated search waits for any one repo before skipping it
+    FEDERATED_PARALLELISM: int = 4  # Repos one federated search queries at a time on the search executor
+    FEDERATED_TOTAL_TIMEOUT: float = 5.0  # Seconds a federated search waits for all repos together
+    CHAT_MIN_SCORE: float = 0.0  # Drop chunks below this before building the LLM prompt (e.g. 0.5 with cosine)
+    CHAT_CONTEXT_TOKENS: int = 768  # Tokenizer tokens of retrieved code packed into the prompt (capped by the model's window)
+    ANSWER_CACHE_SIZE: int = 256  # Chat answers kept per process, keyed by question, retrieved chunks, index version and model (0 disables)
+    ANSWER_CACHE_TTL: float = 24 * 3600.0  # Seconds a cached answer stays valid
+    ANSWER_CACHE_PATH: str = None  # Optional JSON file persisting cached answers across restarts
+
+    # Vector index type: "auto" picks by corpus size, or flat / ivf_flat / ivf_pq / hnsw / opq_ivf_pq
+    INDEX_TYPE: str = "auto"
+    INDEX_TRAIN_SAMPLE: int = 100_000  # Vectors sampled to train IVF/PQ indexes
+    FAISS_NPROBE: int = None  # IVF lists visited per query (None = index default)
+    FAISS_EF_SEARCH: int = None  # HNSW search breadth (None = index default)
+
+    # Background indexing (the API serves existing indexes while jobs run)
+    INDEX_ON_STARTUP: bool = True  # Queue a job per repo under CODEATLAS_REPO_ROOT when the API starts
+    INDEX_JOB_WORKERS: int = 1  # Repos indexed concurrently by the background job runner
+
+    # Start-up: heavy libraries and models load after the app accepts requests
+    WARMUP_ON_STARTUP: bool = True  # Load embedding and chat models in the background; /health/ready reports when done
+
+    # Crawler
+    CRAWL_RESPECT_GITIGNORE: bool = True  # Skip paths ignored by the repo's .gitignore files
+    CRAWL_EXCLUDE_GLOBS: List[str] = []  # Extra gitignore-style globs to skip, e.g. ["build/", "*.min.js"]
+
+    # Change detection (which files a re-index has to process)
+    CHANGE_DETECTION_WORKERS: int = 8  # Threads hashing files whose size/mtime/inode changed
+    GIT_CHANGE_DETECTION: bool = True  # In git checkouts, trust clean files whose blob id is unchanged
+
+    # Watch mode (re-index files as they are saved)
+    WATCH_REPOS: bool = False  # Watch CODEATLAS_REPO_ROOT while the API runs
+    WATCH_BACKEND: str = "auto"  # auto (watchdog if installed), watchdog or polling
+    WATCH_DEBOUNCE_SECONDS: float = 1.0  # Quiet time before a burst of edits is re-indexed
+    WATCH_MAX_DELAY_SECONDS: float = 10.0  # Re-index at least this often during continuous edits
+    WATCH_POLL_INTERVAL: float = 2.0  # Seconds between scans with the polling backend
+
+    # Streaming indexing pipeline
+    PIPELINE_CHUNK_WORKERS: int = 4  # Parallel chunk extraction threads
+    CHUNK_PROCESS_WORKERS: int = 0  # >1 chunks in a process pool of this size instead of threads
+    PIPELINE_FILE_QUEUE_SIZE: int = 256  # Chunked files buffered ahead of the embedder
+    PIPELINE_BATCH_QUEUE_SIZE: int = 8  # Embedded batches buffered ahead of the index writer
+    EMBED_BATCH_SIZE: int = 64  # Chunks per model.encode call (packed across files)
+    EMBED_SORT_WINDOW: int = 8  # Batches worth of chunks sorted by length together to reduce padding
+    EMBEDDING_CACHE_PATH: str = None  # Content-addressed chunk vector cache; None = <VECTOR_STORE_DIR>/embedding_cache.sqlite
+    EMBEDDING_CACHE_MAX_BYTES: int = 2 * 1024 ** 3  # Evict least recently used vectors beyond this (0 disables the cache)
+
+    # Dedicated API executors: slow chat generations never queue ahead of search traffic
+    EMBED_EXECUTOR_WORKERS: int = 32  # Concurrent query embeddings (mostly waiting on the query batcher)
+    EMBED_EXECUTOR_QUEUE: int = 64  # Waiting embeddings beyond which requests get 429
+    SEARCH_EXECUTOR_WORKERS: int = 4  # Concurrent FAISS searches
+    SEARCH_EXECUTOR_QUEUE: int = 128
+    LLM_EXECUTOR_WORKERS: int = 1  # Concurrent chat generations (including streams)
+    LLM_EXECUTOR_QUEUE: int = 4
+    EXECUTOR_QUEUE_TIMEOUT: float = 30.0  # Queued work not started within this many seconds gets 503
+
     class Config:
         env_file = ".env"
         extra = "ignore"  # Allow extra env vars safely
@@ -0,0 +1,119 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class AdmissionError(Exception):
+    """Work was refused because an executor is overloaded."""
+    status_code = 503
+    retry_after = 1
+
+
+class ExecutorSaturated(AdmissionError):
+    """Every worker is busy and the wait queue is full."""
+    status_code = 429
+
+
+class ExecutorTimeout(AdmissionError):
+    """Work waited in the queue longer than the executor's queue timeout."""
+    status_code = 503
+
+
+class BoundedExecutor:
+    """
+    Thread pool with admission control.
+
+    At most `max_workers` tasks run and `max_queue` more may wait; anything beyond
+    that is rejected immediately (ExecutorSaturated) instead of piling up. Tasks that
+    could not start within `queue_timeout` seconds are dropped (ExecutorTimeout).
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, queue_timeout: float = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"codeatlas-{name}")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _admit(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorSaturated(f"The {self.name} executor is saturated, retry shortly")
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self, *_):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _call(self, submitted: float, fn, *args, **kwargs):
+        if self.queue_timeout is not None and time.monotonic() - submitted > self.queue_timeout:
+            with self._lock:
+                self.timed_out += 1
+            raise ExecutorTimeout(f"Request waited too long for the {self.name} executor")
+        return fn(*args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs) -> "asyncio.Future":
+        """
+        Admit fn(*args, **kwargs) right away (raising AdmissionError if the pool is
+        saturated) and return an awaitable for its result.
+        """
+        self._admit()
+        try:
+            future = self._executor.submit(partial(self._call, time.monotonic(), fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the work itself finishes, even if the awaiting request is cancelled
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on this pool and await the result."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+EXECUTOR_KINDS = ("embedding", "search", "llm")
+
+
+@lru_cache(maxsize=None)
+def get_executor(kind: str) -> BoundedExecutor:
+    """Process-wide executor for one kind of work: "embedding", "search" (FAISS) or "llm"."""
+    sizes = {
+        "embedding": (settings.EMBED_EXECUTOR_WORKERS, settings.EMBED_EXECUTOR_QUEUE),
+        "search": (settings.SEARCH_EXECUTOR_WORKERS, settings.SEARCH_EXECUTOR_QUEUE),
+        "llm": (settings.LLM_EXECUTOR_WORKERS, settings.LLM_EXECUTOR_QUEUE),
+    }
+    if kind not in sizes:
+        raise ValueError(f"Unknown executor '{kind}'. Use one of {EXECUTOR_KINDS}")
+    max_workers, max_queue = sizes[kind]
+    logger.info(f"Starting {kind} executor with {max_workers} workers and {max_queue} queue slots")
+    return BoundedExecutor(kind, max_workers, max_queue, queue_timeout=settings.EXECUTOR_QUEUE_TIMEOUT)
+
+
+def executor_stats() -> dict:
+    return {kind: get_executor(kind).stats() for kind in EXECUTOR_KINDS}
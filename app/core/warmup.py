@@ -0,0 +1,68 @@
+import time
+import threading
+from typing import Callable, Dict
+from app.core.logger import logger
+
+WARMUP_STATES = ("pending", "loading", "ready", "failed")
+
+
+class Warmup:
+    """
+    Runs named load steps (embedding model, FAISS, chat model, ...) one after another
+    in a background thread, so the API answers requests while models load, and keeps
+    per-step state for the readiness probe.
+
+    Steps are idempotent loaders; a request that needs a model before its step ran
+    simply loads it on first use.
+    """
+
+    def __init__(self, steps: Dict[str, Callable[[], None]]):
+        self.steps = steps
+        self.state = {name: "pending" for name in steps}
+        self.errors: Dict[str, str] = {}
+        self.seconds: Dict[str, float] = {}
+        self.started = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.started:
+                return
+            self.started = True
+        self._thread = threading.Thread(target=self.run, name="codeatlas-warmup", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        for name, step in self.steps.items():
+            self.state[name] = "loading"
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                logger.error(f"Warm-up step '{name}' failed: {e}", exc_info=True)
+                self.state[name] = "failed"
+                self.errors[name] = str(e)
+                continue
+            self.seconds[name] = round(time.perf_counter() - start, 3)
+            self.state[name] = "ready"
+            logger.info(f"Warm-up step '{name}' ready in {self.seconds[name]:.2f}s")
+
+    def wait(self, timeout: float = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    @property
+    def ready(self) -> bool:
+        # Without warm-up, models load lazily on first use and there is nothing to wait for
+        return not self.started or all(state == "ready" for state in self.state.values())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "started": self.started,
+            "steps": dict(self.state),
+            "seconds": dict(self.seconds),
+            "errors": dict(self.errors),
+        }
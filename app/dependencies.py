@@ -1,23 +1,56 @@
 import os
-from functools import lru_cache
+from functools import lru_cache, partial
 from fastapi import Query
 from app.services.chat_service import ChatService
 from app.services.llm_huggingface import HuggingFaceChat
 from app.services.llm_openai import OpenAIChat
 from app.services.embedder import Embedder
 from app.services.searcher import CodeSearcher
+from app.services.index_registry import IndexRegistry
+from app.services.query_cache import QueryEmbeddingCache
+from app.services.answer_cache import AnswerCache
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.index_jobs import IndexJobRunner
+from app.services.watcher import RepoWatcher
 from app.services.chunker import extract_chunks
+from app.services import indexer
 from app.core.config import settings
+from app.core.warmup import Warmup
+from app.utils.lazy_import import ensure_loaded
+from app.utils.repo_utils import get_index_paths
+from scripts.init_db import index_repo
+
+# ---- Shared Query Embedding Cache ----
+@lru_cache(maxsize=1)
+def get_query_cache() -> QueryEmbeddingCache:
+    return QueryEmbeddingCache(max_size=settings.QUERY_CACHE_SIZE, persist_path=settings.QUERY_CACHE_PATH)
+
+# ---- Shared LLM Answer Cache ----
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache:
+    return AnswerCache(
+        max_size=settings.ANSWER_CACHE_SIZE, ttl=settings.ANSWER_CACHE_TTL, persist_path=settings.ANSWER_CACHE_PATH
+    )
 
 # ---- Shared Embedder (cached) ----
 @lru_cache()
 def get_embedder() -> Embedder:
-    return Embedder(
+    embedder = Embedder(
         backend=settings.EMBEDDER_BACKEND,
         hf_model=settings.EMBEDDING_MODEL_NAME,
         openai_model=settings.LLM_MODEL_NAME,
         openai_api_key=settings.OPENAI_API_KEY,
+        normalize=settings.SIMILARITY_METRIC == "cosine",
+        query_instruction=settings.EMBEDDING_QUERY_INSTRUCTION,
+        query_cache=get_query_cache() if settings.QUERY_CACHE_SIZE > 0 else None,
     )
+    if settings.QUERY_BATCH_MAX_SIZE > 1:
+        embedder.query_batcher = EmbeddingBatcher(
+            embedder.embed,
+            max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+            window_ms=settings.QUERY_BATCH_WINDOW_MS,
+        )
+    return embedder
 
 # ---- Cached Chat Backends ----
 @lru_cache(maxsize=1)  # Singleton-like caching for heavy LLM
@@ -28,42 +61,73 @@ def get_hf_chat() -> HuggingFaceChat:
 def get_openai_chat() -> OpenAIChat:
     return OpenAIChat()
 
-# ChatService Dependency (Dynamic per-repo)
-def get_chat_service(repo_name: str = Query(...)) -> ChatService:
-    embedder = get_embedder()
-    vector_store_path = os.path.join(settings.VECTOR_STORE_DIR, repo_name)
-    index_path = os.path.join(vector_store_path, "faiss.index")
-    metadata_path = os.path.join(vector_store_path, "metadata.pkl")
+# ---- Shared Index Registry (loaded indexes reused across requests) ----
+@lru_cache(maxsize=1)
+def get_index_registry() -> IndexRegistry:
+    return IndexRegistry(
+        dim=get_embedder().dim,
+        vector_store_dir=settings.VECTOR_STORE_DIR,
+        max_bytes=settings.INDEX_CACHE_MAX_BYTES,
+        mmap_mode=settings.INDEX_MMAP_MODE,
+        mmap_min_bytes=settings.INDEX_MMAP_MIN_BYTES,
+    )
+
+# ---- Background Indexing Jobs ----
+@lru_cache(maxsize=1)
+def get_index_jobs() -> IndexJobRunner:
+    # Jobs embed with the API's own embedder, so indexing never loads a second copy of the model
+    return IndexJobRunner(partial(index_repo, embedder=get_embedder()), max_workers=settings.INDEX_JOB_WORKERS)
+
+# ---- Watch Mode (changed files are re-indexed by background jobs) ----
+@lru_cache(maxsize=1)
+def get_repo_watcher() -> RepoWatcher:
+    return RepoWatcher(
+        settings.REPO_ROOT,
+        lambda repo_path, paths: get_index_jobs().submit(repo_path, paths=paths),
+        backend=settings.WATCH_BACKEND,
+        debounce=settings.WATCH_DEBOUNCE_SECONDS,
+        max_delay=settings.WATCH_MAX_DELAY_SECONDS,
+        poll_interval=settings.WATCH_POLL_INTERVAL,
+    )
+
+# ---- Start-up Warm-up (models load in the background, see /health/ready) ----
+def _load_chat_backend():
+    if settings.USE_OPENAI:
+        get_openai_chat()
+    else:
+        get_hf_chat().load()
+
+@lru_cache(maxsize=1)
+def get_warmup() -> Warmup:
+    return Warmup({
+        "embedder": lambda: get_embedder().load(),
+        "faiss": lambda: ensure_loaded(indexer.faiss),
+        "chat": _load_chat_backend,
+    })
+
+# Repo-independent searcher (batch and federated search pick repos per query)
+def get_searcher() -> CodeSearcher:
+    return CodeSearcher(embedder=get_embedder(), registry=get_index_registry())
+
+def _build_searcher(repo_name: str) -> CodeSearcher:
+    index_path, metadata_path = get_index_paths(repo_name)
     if not os.path.exists(index_path) or not os.path.exists(metadata_path):
         raise FileNotFoundError(
             f"[CodeAtlas] Vector index for repo '{repo_name}' not found.\n"
             f"Expected: {index_path} and {metadata_path}.\n"
             f"Run the indexing pipeline for this repo first."
         )
-    searcher = CodeSearcher(
-        index_path=index_path,
-        metadata_path=metadata_path,
-        embedder=embedder
-    )
+    return get_searcher()
+
+# ChatService Dependency (Dynamic per-repo)
+def get_chat_service(repo_name: str = Query(...)) -> ChatService:
+    searcher = _build_searcher(repo_name)
     chunker = extract_chunks
     hf_chat = get_hf_chat() if not settings.USE_OPENAI else None
     openai_chat = get_openai_chat() if settings.USE_OPENAI else None
-    return ChatService(searcher, chunker, hf_chat, openai_chat)
+    answer_cache = get_answer_cache() if settings.ANSWER_CACHE_SIZE > 0 else None
+    return ChatService(searcher, chunker, hf_chat, openai_chat, answer_cache=answer_cache)
 
 # CodeSearcher Dependency (Dynamic per-repo)
 def get_code_searcher(repo_name: str = Query(...)) -> CodeSearcher:
-    embedder = get_embedder()
-    vector_store_path = os.path.join(settings.VECTOR_STORE_DIR, repo_name)
-    index_path = os.path.join(vector_store_path, "faiss.index")
-    metadata_path = os.path.join(vector_store_path, "metadata.pkl")
-    if not os.path.exists(index_path) or not os.path.exists(metadata_path):
-        raise FileNotFoundError(
-            f"[CodeAtlas] Vector index for repo '{repo_name}' not found.\n"
-            f"Expected: {index_path} and {metadata_path}.\n"
-            f"Run the indexing pipeline for this repo first."
-        )
-    return CodeSearcher(
-        index_path=index_path,
-        metadata_path=metadata_path,
-        embedder=embedder
-    )
+    return _build_searcher(repo_name)
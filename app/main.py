@@ -1,17 +1,48 @@
 from fastapi import FastAPI
-from app.api import search, chat, repos
-from scripts.init_db import init_repos
+from app.api import search, chat, repos, health
+from app.core.config import settings
+from app.dependencies import get_answer_cache, get_index_jobs, get_query_cache, get_repo_watcher, get_warmup
+from scripts.init_db import list_repo_paths
 import dotenv
 
 dotenv.load_dotenv()
 
-# Run init pipeline before FastAPI is created
-init_repos()
-
 app = FastAPI()
 app.include_router(search.router, prefix="/search", tags=["Search"])
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
 app.include_router(repos.router, prefix="/repos", tags=["Repos"])
+app.include_router(health.router, prefix="/health", tags=["Health"])
+
+
+@app.on_event("startup")
+def start_warmup():
+    # Models load after the server starts listening; /health/ready turns 200 once they are in
+    if settings.WARMUP_ON_STARTUP:
+        get_warmup().start()
+
+
+@app.on_event("startup")
+def start_background_indexing():
+    # Indexing runs in the background; existing indexes are served while it does
+    if settings.INDEX_ON_STARTUP:
+        get_index_jobs().submit_all(str(path) for path in list_repo_paths())
+
+
+@app.on_event("startup")
+def start_watching():
+    # Saved files are re-indexed in the background; searches pick up the new index on their next query
+    if settings.WATCH_REPOS:
+        get_repo_watcher().start()
+
+
+@app.on_event("shutdown")
+def save_caches():
+    if get_repo_watcher.cache_info().currsize:
+        get_repo_watcher().stop()
+    get_query_cache().save()
+    get_answer_cache().save()
+    if get_index_jobs.cache_info().currsize:
+        get_index_jobs().shutdown()
 
 
 @app.get("/")
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 class SearchResponseItem(BaseModel):
     score: float
@@ -11,3 +12,15 @@ class SearchResponseItem(BaseModel):
 class SearchResponse(BaseModel):
     results: list[SearchResponseItem]
 
+
+class BatchSearchQuery(BaseModel):
+    query: str
+    repo_name: Optional[str] = None  # Defaults to the request-level repo_name
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery]
+    repo_name: Optional[str] = None
+    top_k: int = Field(5, ge=1)
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    min_score: Optional[float] = Field(None, ge=0.0, le=1.0)
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+from app.core.logger import logger
+from app.services.query_cache import normalize_query
+
+
+def answer_key(question: str, chunk_ids: Sequence[int], index_version, model_version: str) -> str:
+    """
+    Cache key of an answer: the normalized question, the retrieved chunks (in rank
+    order, since that shapes the prompt), the index they came from and the model/prompt.
+    """
+    chunks = hashlib.sha256(",".join(str(i) for i in chunk_ids).encode("utf-8")).hexdigest()
+    raw = "\0".join([normalize_query(question).lower(), chunks, str(index_version), model_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU cache of LLM answers with a time-to-live.
+
+    Entries remember the repo and index version they were generated from; seeing a new
+    version of a repo (i.e. it was re-indexed) drops that repo's older answers. With
+    `persist_path` set, entries are loaded from a JSON file on start-up and written back
+    by `save()`.
+    """
+
+    def __init__(self, max_size: int, ttl: float, persist_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._versions: Dict[str, str] = {}  # Repo -> latest index version seen
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        if persist_path and os.path.exists(persist_path):
+            self.load()
+
+    def observe_version(self, repo_name: str, index_version):
+        """Drop cached answers of a repo whose index changed since they were generated."""
+        version = str(index_version)
+        with self._lock:
+            if self._versions.get(repo_name) == version:
+                return
+            self._versions[repo_name] = version
+            stale = [key for key, entry in self._entries.items()
+                     if entry["repo"] == repo_name and entry["version"] != version]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        if stale:
+            logger.info(f"Dropped {len(stale)} cached answers for re-indexed repo '{repo_name}'")
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires"] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["answer"]
+
+    def put(self, key: str, answer, repo_name: str, index_version):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "repo": repo_name,
+                "version": str(index_version),
+                "expires": time.time() + self.ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def save(self):
+        """Write unexpired entries (oldest first) to persist_path atomically."""
+        if not self.persist_path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[key, entry] for key, entry in self._entries.items() if entry["expires"] >= now]
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.persist_path)
+            logger.info(f"Saved {len(entries)} cached answers to {self.persist_path}")
+        except OSError as e:
+            logger.warning(f"Could not save answer cache to {self.persist_path}: {e}")
+
+    def load(self):
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable answer cache {self.persist_path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, entry in entries[-self.max_size:] if self.max_size > 0 else []:
+                if entry["expires"] >= now:
+                    self._entries[key] = entry
+        logger.info(f"Loaded {len(self._entries)} cached answers from {self.persist_path}")
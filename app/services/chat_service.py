@@ -3,8 +3,15 @@ from app.services.llm_openai import OpenAIChat
 from app.core.config import settings
 from app.services.searcher import CodeSearcher
 from app.services.chunker import extract_chunks
+from app.services.context_builder import ContextBuilder, approx_token_count
+from app.services.answer_cache import AnswerCache, answer_key
 from app.core.logger import logger
+from app.core.executors import get_executor
+from typing import AsyncIterator, Iterator
+import asyncio
 import os
+import threading
+import time
 
 class ChatService:
     def __init__(
@@ -12,12 +19,14 @@ class ChatService:
         searcher: CodeSearcher,
         chunker,
         hf_chat: HuggingFaceChat,
-        openai_chat: OpenAIChat
+        openai_chat: OpenAIChat,
+        answer_cache: AnswerCache = None,
     ):
         self.searcher = searcher
         self.chunker = chunker
         self.hf_chat = hf_chat
         self.openai_chat = openai_chat
+        self.answer_cache = answer_cache
 
     def get_chat_backend(self):
         if settings.USE_OPENAI:
@@ -27,35 +36,35 @@ class ChatService:
             logger.info("Using HuggingFace backend for chat.")
             return self.hf_chat
 
-    def combine_chunks(self, relevant_chunks) -> str:
-        """Combine relevant chunks into a context string with better formatting."""
-        context_parts = []
-        total_length = 0
-        max_length = 2000  # Reduced from 4000 to speed up inference
+    def combine_chunks(self, relevant_chunks, question: str = "", backend=None) -> str:
+        """
+        Pack relevant chunks into the prompt's token budget (see ContextBuilder).
 
+        Chunk source comes from the index's text store (metadata["text"]); only indexes
+        built without one fall back to reading the file, once per file.
+        """
+        backend = backend or self.get_chat_backend()
+        count_tokens = getattr(backend, "count_tokens", approx_token_count)
+        max_tokens = settings.CHAT_CONTEXT_TOKENS
+        if hasattr(backend, "context_token_limit"):
+            max_tokens = min(max_tokens, backend.context_token_limit(question))
+
+        hits = []
+        file_lines = {}
         for score, meta in relevant_chunks:
             try:
-                with open(meta["path"], "r", encoding="utf-8") as f:
-                    lines = f.readlines()
+                chunk_code = meta.get("text")
+                if chunk_code is None:
+                    if meta["path"] not in file_lines:
+                        with open(meta["path"], "r", encoding="utf-8") as f:
+                            file_lines[meta["path"]] = f.readlines()
+                    lines = file_lines[meta["path"]]
                     chunk_code = "".join(lines[meta["start_line"] - 1 : meta["end_line"]])
-
-                chunk_code = chunk_code.strip()
-                # Better formatting with file info
-                summary = f"=== From {meta['path']} (lines {meta['start_line']}-{meta['end_line']}) ===\n"
-                summary += f"Type: {meta.get('type', 'unknown')}, Name: {meta.get('name', 'unknown')}\n\n"
-
-                chunk_with_summary = summary + chunk_code + "\n\n"
-
-                if total_length + len(chunk_with_summary) > max_length:
-                    break
-
-                context_parts.append(chunk_with_summary)
-                total_length += len(chunk_with_summary)
-
+                hits.append((score, meta, chunk_code.strip()))
             except Exception as e:
                 logger.warning(f"Failed to read chunk from {meta['path']}: {e}")
 
-        combined_context = "".join(context_parts) if context_parts else "No relevant code context found."
+        combined_context = ContextBuilder(count_tokens, max_tokens).build(hits) or "No relevant code context found."
 
         # Log the context being sent to LLM for debugging
         logger.info(f"Combined context length: {len(combined_context)} characters")
@@ -64,11 +73,166 @@ class ChatService:
         return combined_context
 
 
-    def answer_question(self, repo_name: str, question: str) -> str:
-        logger.info(f"Answering question for repo={repo_name}: {question}")
-        relevant_chunks = self.searcher.semantic_search(repo_name, question, top_k=10)
-        context = self.combine_chunks(relevant_chunks)
-        backend = self.get_chat_backend()
+    def _answer_cache_entry(self, repo_name: str, question: str, relevant_chunks, backend):
+        """(key, index version) of this answer in the answer cache, or None when caching is off or the backend samples."""
+        if self.answer_cache is None or not getattr(backend, "deterministic", True):
+            return None  # Sampled answers differ between calls and must not be replayed
+        version = self.searcher.index_version(repo_name)
+        if version is None:
+            return None
+        self.answer_cache.observe_version(repo_name, version)
+        # The context budget shapes the prompt just like the model and template do
+        model_version = f"{getattr(backend, 'cache_version', type(backend).__name__)}:{settings.CHAT_CONTEXT_TOKENS}"
+        chunk_ids = [meta.get("id") for _, meta in relevant_chunks]
+        return answer_key(question, chunk_ids, version, model_version), version
+
+    def _cached_answer(self, cache_entry):
+        if cache_entry is None:
+            return None
+        answer = self.answer_cache.get(cache_entry[0])
+        if answer is not None:
+            logger.info("Serving answer from the answer cache.")
+        return answer
+
+    def _store_answer(self, cache_entry, repo_name: str, answer):
+        # Fallback messages come back as dicts and are not worth keeping
+        if cache_entry is not None and isinstance(answer, str) and answer:
+            key, version = cache_entry
+            self.answer_cache.put(key, answer, repo_name, version)
+
+    def _answer_from_chunks(self, question: str, relevant_chunks, backend=None, repo_name: str = None,
+                            cache_entry=None) -> str:
+        backend = backend or self.get_chat_backend()
+        context = self.combine_chunks(relevant_chunks, question, backend)
         response = backend.chat(question, context)
         logger.info("Received response from LLM backend.")
+        self._store_answer(cache_entry, repo_name, response)
         return response
+
+    def answer_question(self, repo_name: str, question: str) -> str:
+        logger.info(f"Answering question for repo={repo_name}: {question}")
+        relevant_chunks = self.searcher.semantic_search(
+            repo_name, question, top_k=10, min_score=settings.CHAT_MIN_SCORE, with_text=True
+        )
+        backend = self.get_chat_backend()
+        cache_entry = self._answer_cache_entry(repo_name, question, relevant_chunks, backend)
+        cached = self._cached_answer(cache_entry)
+        if cached is not None:
+            return cached
+        return self._answer_from_chunks(question, relevant_chunks, backend, repo_name, cache_entry)
+
+    async def answer_question_async(self, repo_name: str, question: str) -> str:
+        """answer_question with retrieval and generation on their dedicated executors."""
+        logger.info(f"Answering question for repo={repo_name}: {question}")
+        relevant_chunks = await self.searcher.semantic_search_async(
+            repo_name, question, top_k=10, min_score=settings.CHAT_MIN_SCORE, with_text=True
+        )
+        backend = self.get_chat_backend()
+        cache_entry = self._answer_cache_entry(repo_name, question, relevant_chunks, backend)
+        # Cache hits never take an LLM executor slot
+        cached = self._cached_answer(cache_entry)
+        if cached is not None:
+            return cached
+        return await get_executor("llm").run(
+            self._answer_from_chunks, question, relevant_chunks, backend, repo_name, cache_entry
+        )
+
+    def _stream_from_chunks(self, question: str, relevant_chunks, backend, repo_name: str, cache_entry,
+                            start: float) -> Iterator[str]:
+        context = self.combine_chunks(relevant_chunks, question, backend)
+
+        if hasattr(backend, "stream_chat"):
+            pieces = backend.stream_chat(question, context)
+        else:
+            answer = backend.chat(question, context)
+            pieces = [answer.get("answer", "") if isinstance(answer, dict) else answer]
+
+        first = True
+        streamed = []
+        try:
+            for piece in pieces:
+                if first:
+                    logger.info(f"Time to first token: {time.perf_counter() - start:.2f}s")
+                    first = False
+                streamed.append(piece)
+                yield piece
+        finally:
+            if hasattr(pieces, "close"):
+                pieces.close()  # Stops a backend generation thread when the consumer stops early
+        # Only complete answers are cached; a client that disconnects never gets here. They are
+        # formatted like chat()'s, so /chat serves the same text whichever endpoint cached it
+        answer = "".join(streamed)
+        if hasattr(backend, "normalize_answer"):
+            answer = backend.normalize_answer(answer)
+        self._store_answer(cache_entry, repo_name, answer)
+        logger.info(f"Streamed answer complete in {time.perf_counter() - start:.2f}s")
+
+    def stream_answer(self, repo_name: str, question: str) -> Iterator[str]:
+        """Yield the answer incrementally as the LLM backend generates it."""
+        logger.info(f"Streaming answer for repo={repo_name}: {question}")
+        start = time.perf_counter()
+        backend = self.get_chat_backend()
+        relevant_chunks = self.searcher.semantic_search(
+            repo_name, question, top_k=10, min_score=settings.CHAT_MIN_SCORE, with_text=True
+        )
+        cache_entry = self._answer_cache_entry(repo_name, question, relevant_chunks, backend)
+        cached = self._cached_answer(cache_entry)
+        if cached is not None:
+            yield cached
+            return
+        yield from self._stream_from_chunks(question, relevant_chunks, backend, repo_name, cache_entry, start)
+
+    async def stream_answer_async(self, repo_name: str, question: str) -> AsyncIterator[str]:
+        """
+        stream_answer with retrieval on the embedding/search executors and generation on
+        an LLM executor worker, which it holds until the stream ends. Retrieval errors and
+        LLM admission errors are raised here, before any token is produced.
+
+        Returns:
+            An async iterator over the answer pieces
+        """
+        logger.info(f"Streaming answer for repo={repo_name}: {question}")
+        start = time.perf_counter()
+        relevant_chunks = await self.searcher.semantic_search_async(
+            repo_name, question, top_k=10, min_score=settings.CHAT_MIN_SCORE, with_text=True
+        )
+        backend = self.get_chat_backend()
+        cache_entry = self._answer_cache_entry(repo_name, question, relevant_chunks, backend)
+        cached = self._cached_answer(cache_entry)
+        if cached is not None:
+            return _single(cached)
+
+        loop = asyncio.get_running_loop()
+        pieces: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            stream = self._stream_from_chunks(question, relevant_chunks, backend, repo_name, cache_entry, start)
+            try:
+                for piece in stream:
+                    if cancelled.is_set():
+                        break  # Client went away: closing the stream stops generation
+                    loop.call_soon_threadsafe(pieces.put_nowait, piece)
+            finally:
+                stream.close()
+
+        generation = get_executor("llm").submit(produce)
+        generation.add_done_callback(lambda _: pieces.put_nowait(_STREAM_END))
+
+        async def consume() -> AsyncIterator[str]:
+            try:
+                while True:
+                    piece = await pieces.get()
+                    if piece is _STREAM_END:
+                        break
+                    yield piece
+                await generation  # Re-raises a generation failure
+            finally:
+                cancelled.set()
+        return consume()
+
+
+_STREAM_END = object()
+
+async def _single(answer: str) -> AsyncIterator[str]:
+    yield answer
@@ -0,0 +1,213 @@
+import os
+import glob
+import json
+import uuid
+import zlib
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # zlib frames are written instead
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("zstd", "zlib")
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+COMPACT_DEAD_RATIO = 0.5  # Rewrite the blob on save once this fraction of it belongs to removed chunks
+
+
+def chunk_store_path_for(index_path: str) -> str:
+    """Offset table of the chunk text store next to a FAISS index (faiss.index -> faiss.chunks.npz)."""
+    return f"{os.path.splitext(index_path)[0]}.chunks.npz"
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(codec: str, frame: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(frame)
+    return zlib.decompress(frame)
+
+
+class ChunkTextStore:
+    """
+    Compressed source text of every indexed chunk, keyed by vector ID.
+
+    Each chunk is an independent zstd (or zlib) frame in an append-only blob file, and
+    an offset table maps vector IDs to (offset, length), so reading a chunk is one
+    pread and one decompress. The table is replaced atomically on save; the blob is
+    only appended to until compaction writes a new one, so a reader holding an older
+    table always reads valid frames.
+    """
+
+    def __init__(self, table_path: str, codec: str = "auto"):
+        if codec == "auto":
+            codec = "zstd" if zstandard is not None else "zlib"
+        if codec not in CODECS:
+            raise ValueError(f"Unsupported codec '{codec}'. Use 'auto' or one of {CODECS}")
+        if codec == "zstd" and zstandard is None:
+            raise ImportError("zstandard package not installed. Run: pip install zstandard")
+        self.table_path = table_path
+        self.codec = codec
+        self.blob_name: Optional[str] = None  # Blob file in the table's directory
+        # Offset table as saved (sorted by ID)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._offsets = np.zeros(0, dtype=np.int64)
+        self._lengths = np.zeros(0, dtype=np.int64)
+        # Changes since then
+        self._added: Dict[int, Tuple[int, int]] = {}
+        self._removed = set()
+        self._reader = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def _blob_path(self, name: str) -> str:
+        return os.path.join(os.path.dirname(self.table_path), name)
+
+    def _new_blob_name(self) -> str:
+        base = os.path.basename(os.path.splitext(self.table_path)[0])
+        return f"{base}.{uuid.uuid4().hex[:12]}.bin"
+
+    def __len__(self) -> int:
+        removed = int(np.isin(self._ids, list(self._removed)).sum()) if self._removed else 0
+        return len(self._ids) - removed + len(self._added)
+
+    def add(self, ids: Sequence[int], texts: Sequence[str]):
+        """Append one compressed frame per chunk."""
+        with self._lock:
+            if self._writer is None:
+                self.blob_name = self.blob_name or self._new_blob_name()
+                self._writer = open(self._blob_path(self.blob_name), "ab")
+                self._writer.seek(0, os.SEEK_END)
+            for vector_id, text in zip(ids, texts):
+                frame = _compress(self.codec, text.encode("utf-8"))
+                self._added[int(vector_id)] = (self._writer.tell(), len(frame))
+                self._removed.discard(int(vector_id))
+                self._writer.write(frame)
+            self._writer.flush()  # Visible to preads from this process right away
+
+    def remove(self, ids: Sequence[int]):
+        with self._lock:
+            for vector_id in ids:
+                if self._added.pop(int(vector_id), None) is None:
+                    self._removed.add(int(vector_id))
+
+    def _locate(self, vector_id: int) -> Optional[Tuple[int, int]]:
+        if vector_id in self._added:
+            return self._added[vector_id]
+        if vector_id in self._removed:
+            return None
+        row = int(np.searchsorted(self._ids, vector_id))
+        if row < len(self._ids) and self._ids[row] == vector_id:
+            return int(self._offsets[row]), int(self._lengths[row])
+        return None
+
+    def get_many(self, ids: Sequence[int]) -> List[Optional[str]]:
+        """Source text of each chunk, or None where the store has none."""
+        if self.blob_name is None:
+            return [None] * len(ids)
+        if self._reader is None:
+            with self._lock:
+                if self._reader is None:
+                    self._reader = open(self._blob_path(self.blob_name), "rb", buffering=0)
+        fd = self._reader.fileno()
+        texts = []
+        for vector_id in ids:
+            location = self._locate(int(vector_id))
+            if location is None:
+                texts.append(None)
+                continue
+            offset, length = location
+            texts.append(_decompress(self.codec, os.pread(fd, length, offset)).decode("utf-8"))
+        return texts
+
+    def get(self, vector_id: int) -> Optional[str]:
+        return self.get_many([vector_id])[0]
+
+    def _merged(self):
+        """Current offset table with pending changes applied, sorted by ID."""
+        if len(self._ids):
+            keep = ~np.isin(self._ids, np.fromiter(self._removed, dtype=np.int64)) if self._removed else slice(None)
+            ids, offsets, lengths = self._ids[keep], self._offsets[keep], self._lengths[keep]
+        else:
+            ids = offsets = lengths = np.zeros(0, dtype=np.int64)
+        if self._added:
+            entries = sorted(self._added.items())
+            ids = np.concatenate([ids, np.array([i for i, _ in entries], dtype=np.int64)])
+            offsets = np.concatenate([offsets, np.array([o for _, (o, _) in entries], dtype=np.int64)])
+            lengths = np.concatenate([lengths, np.array([n for _, (_, n) in entries], dtype=np.int64)])
+            order = np.argsort(ids, kind="stable")
+            ids, offsets, lengths = ids[order], offsets[order], lengths[order]
+        return ids, offsets, lengths
+
+    def _compact(self, offsets, lengths):
+        """Copy live frames (in file order) into a new blob; returns their new offsets."""
+        source = self._blob_path(self.blob_name)
+        name = self._new_blob_name()
+        new_offsets = np.empty_like(offsets)
+        with open(source, "rb", buffering=0) as src, open(self._blob_path(name), "wb") as dst:
+            position = 0
+            for row in np.argsort(offsets, kind="stable"):
+                dst.write(os.pread(src.fileno(), int(lengths[row]), int(offsets[row])))
+                new_offsets[row] = position
+                position += int(lengths[row])
+        logger.info(f"Compacted chunk text store {source} into {name}")
+        return name, new_offsets
+
+    def save(self):
+        """Write the offset table atomically, compacting the blob first if it is mostly dead."""
+        with self._lock:
+            ids, offsets, lengths = self._merged()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            blob_name = self.blob_name
+            if blob_name is not None:
+                blob_size = os.path.getsize(self._blob_path(blob_name))
+                if blob_size and (blob_size - int(lengths.sum())) / blob_size > COMPACT_DEAD_RATIO:
+                    blob_name, offsets = self._compact(offsets, lengths)
+
+            header = json.dumps({"codec": self.codec, "blob": blob_name}).encode("utf-8")
+            tmp_path = f"{self.table_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, ids=ids, offsets=offsets, lengths=lengths, header=np.frombuffer(header, dtype=np.uint8))
+            os.replace(tmp_path, self.table_path)
+
+            if blob_name != self.blob_name:
+                self.blob_name, self._reader = blob_name, None
+            self._ids, self._offsets, self._lengths = ids, offsets, lengths
+            self._added.clear()
+            self._removed.clear()
+            self._remove_stale_blobs()
+
+    def _remove_stale_blobs(self):
+        # Readers that still have an old blob open keep reading it until they close it
+        pattern = self._blob_path(f"{os.path.basename(os.path.splitext(self.table_path)[0])}.*.bin")
+        for path in glob.glob(pattern):
+            if os.path.basename(path) != self.blob_name:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale chunk text blob {path}: {e}")
+
+    @classmethod
+    def load(cls, table_path: str) -> "ChunkTextStore":
+        with np.load(table_path, allow_pickle=False) as data:
+            header = json.loads(data["header"].tobytes().decode("utf-8"))
+            store = cls(table_path, codec=header["codec"])
+            store.blob_name = header["blob"]
+            store._ids = data["ids"]
+            store._offsets = data["offsets"]
+            store._lengths = data["lengths"]
+        if store.blob_name is not None:
+            # Open now: compaction by a later indexing run may delete this blob, but not an open handle's data
+            store._reader = open(store._blob_path(store.blob_name), "rb", buffering=0)
+        return store
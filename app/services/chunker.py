@@ -1,37 +1,125 @@
 import ast
-from typing import List, Dict
+import hashlib
+import threading
+from itertools import accumulate
+from typing import List, Dict, Optional, Tuple
 from app.core.logger import logger
-import tree_sitter_languages
-from tree_sitter import Parser
+from app.utils.lazy_import import lazy_module
+
+tree_sitter = lazy_module("tree_sitter")
+tree_sitter_languages = lazy_module("tree_sitter_languages")
 
 SUPPORTED_TREE_SITTER_LANGS = {"javascript": "javascript", "typescript": "typescript", "java": "java", "go": "go", "c": "c", "cpp": "cpp"}  # Mapped to tree-sitter names
 
-def extract_chunks(file_path: str, language: str) -> List[Dict]:
+# Compact chunk record shipped between processes: (code, type, name, start_line, end_line)
+ChunkRecord = Tuple[str, str, str, int, int]
+
+# Parsers are not thread-safe, so every thread (and every pool process) keeps its own
+_local = threading.local()
+
+# ast.parse can fail spuriously when threads call it concurrently on some CPython 3.11
+# releases ("AST constructor recursion depth mismatch"); parsing is short, so serialize it
+_ast_lock = threading.Lock()
+
+def _get_parser(language: str) -> "tree_sitter.Parser":
+    parsers = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+    parser = parsers.get(language)
+    if parser is None:
+        parser = tree_sitter.Parser()
+        parser.set_language(tree_sitter_languages.get_language(language))
+        parsers[language] = parser
+    return parser
+
+def init_worker():
+    """Process-pool initializer: build this worker's tree-sitter parsers up front."""
+    for language in SUPPORTED_TREE_SITTER_LANGS.values():
+        try:
+            _get_parser(language)
+        except Exception as e:
+            logger.warning(f"Could not load tree-sitter parser for {language}: {e}")
+
+def extract_chunk_records(file_path: str, language: str) -> List[ChunkRecord]:
+    """
+    Same as extract_chunks, but returns compact tuples that are cheap to pickle across processes.
+    """
+    return extract_file_records(file_path, language)[1]
+
+def extract_file_records(file_path: str, language: str) -> Tuple[Optional[str], List[ChunkRecord]]:
+    """
+    Read a file exactly once and return (sha256 of its bytes, chunk records).
+
+    The hash lets the indexer record the content it actually indexed without reading the
+    file again. Files that are not UTF-8 text yield no chunks; unreadable ones yield (None, []).
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        logger.warning(f"Failed to read {file_path}: {e}")
+        return None, []
+    sha256 = hashlib.sha256(data).hexdigest()
+    try:
+        # Same newline handling as text-mode open()
+        source = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    except UnicodeDecodeError:
+        logger.info(f"Skipping non-text file {file_path}")
+        return sha256, []
+    return sha256, [
+        (chunk['code'], chunk['type'], chunk['name'], chunk['start_line'], chunk['end_line'])
+        for chunk in extract_chunks(file_path, language, source=source)
+    ]
+
+class LineIndex:
+    """
+    Start offset of every line in a source string, built once per file and shared by all
+    extractors so snippets are single slices of the source instead of split-and-join copies.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        # Same line-break semantics as str.splitlines(); offsets[i] is where line i+1 starts
+        self.offsets = [0, *accumulate(map(len, source.splitlines(keepends=True)))]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def slice(self, start_line: int, end_line: int) -> str:
+        """Source text of the 1-based, inclusive line range (clamped to the file)."""
+        start_line = max(1, start_line)
+        end_line = min(len(self), end_line)
+        if end_line < start_line:
+            return ""
+        return self.source[self.offsets[start_line - 1]:self.offsets[end_line]]
+
+def extract_chunks(file_path: str, language: str, source: str = None) -> List[Dict]:
     """
     Dispatch to language-specific chunking functions with added overlapping and summaries for better retrieval.
+    Pass `source` when the file was already read to avoid reading it again.
     """
     chunks = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source = f.read()
+        if source is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                source = f.read()
 
+        lines = LineIndex(source)
         if language.lower() == "python":
-            chunks = extract_python_chunks(source, file_path)
+            chunks = extract_python_chunks(source, file_path, lines)
         elif language.lower() in SUPPORTED_TREE_SITTER_LANGS:
-            chunks = extract_treesitter_chunks(source, SUPPORTED_TREE_SITTER_LANGS[language.lower()], file_path)
+            chunks = extract_treesitter_chunks(source, SUPPORTED_TREE_SITTER_LANGS[language.lower()], file_path, lines)
         else:
-            chunks = extract_generic_chunks(source, file_path)
+            chunks = extract_generic_chunks(source, file_path, lines)
 
         # Add summaries and overlapping for all chunks
         for chunk in chunks:
             chunk['summary'] = f"Summary: {chunk['type']} named {chunk['name']} in {file_path} (lines {chunk['start_line']}-{chunk['end_line']})"
 
         # Add overlapping overview chunk for larger files
-        lines = source.splitlines()
         if len(lines) > 50:
-            overview = '\n'.join(lines[:100])
             chunks.append({
-                'code': overview,
+                'code': lines.slice(1, 100),
                 'type': 'overview',
                 'name': file_path.split('/')[-1],
                 'start_line': 1,
@@ -45,23 +133,24 @@ def extract_chunks(file_path: str, language: str) -> List[Dict]:
         logger.warning(f"Failed to chunk {file_path}: {e}")
         return []
 
-def extract_python_chunks(source: str, file_path: str) -> List[Dict]:
+def extract_python_chunks(source: str, file_path: str, lines: LineIndex = None) -> List[Dict]:
     """
     Extract classes and functions from Python source using AST, with added line overlaps.
     """
+    chunks = []
     try:
-        chunks = []
-        tree = ast.parse(source, filename=file_path)
+        lines = lines or LineIndex(source)
+        with _ast_lock:
+            tree = ast.parse(source, filename=file_path)
         for node in ast.walk(tree):
             if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
                 start_line = node.lineno
                 end_line = getattr(node, "end_lineno", node.lineno)
                 # Add overlap: include 5 lines before/after for context
                 overlap_start = max(1, start_line - 5)
-                overlap_end = min(len(source.splitlines()), end_line + 5)
-                snippet = '\n'.join(source.splitlines()[overlap_start-1:overlap_end])
+                overlap_end = min(len(lines), end_line + 5)
                 chunks.append({
-                    'code': snippet.strip(),
+                    'code': lines.slice(overlap_start, overlap_end).strip(),
                     'type': 'class' if isinstance(node, ast.ClassDef) else 'function',
                     'name': node.name,
                     'start_line': overlap_start,
@@ -71,14 +160,13 @@ def extract_python_chunks(source: str, file_path: str) -> List[Dict]:
         logger.warning(f"extract_python_chunks failed for {file_path}: {e}")
     return chunks
 
-def extract_treesitter_chunks(source: str, language: str, file_path: str) -> List[Dict]:
+def extract_treesitter_chunks(source: str, language: str, file_path: str, lines: LineIndex = None) -> List[Dict]:
     """
     Basic tree-sitter extraction for supported languages.
     """
+    lines = lines or LineIndex(source)
     try:
-        lang = tree_sitter_languages.get_language(language)
-        parser = Parser()
-        parser.set_language(lang)
+        parser = _get_parser(language)
         tree = parser.parse(bytes(source, "utf-8"))
         chunks = []
         # Simple traversal for functions/classes (expand as needed)
@@ -86,33 +174,41 @@ def extract_treesitter_chunks(source: str, language: str, file_path: str) -> Lis
             if node.type in ['function_definition', 'class_definition', 'method_definition']:
                 start_line = node.start_point[0] + 1
                 end_line = node.end_point[0] + 1
-                snippet = source[node.start_byte:node.end_byte]
                 chunks.append({
-                    'code': snippet.strip(),
-                    'type': 'class' if isinstance(node, ast.ClassDef) else 'function',
-                    'name': node.name,
-                    'start_line': start_line,  # Ensure comma after each pair except possibly the last
-                    'end_line': end_line,      # Trailing comma is optional but recommended
-            })
+                    'code': lines.slice(start_line, end_line).strip(),
+                    'type': 'class' if node.type == 'class_definition' else 'function',
+                    'name': _node_name(node) or f"{node.type}_{start_line}",
+                    'start_line': start_line,
+                    'end_line': end_line,
+                })
         return chunks
     except Exception as e:
         logger.warning(f"Tree-sitter failed for {file_path}: {e}")
-        return extract_generic_chunks(source, file_path)  # Fallback
+        return extract_generic_chunks(source, file_path, lines)  # Fallback
+
+def _node_name(node) -> str:
+    name_node = node.child_by_field_name('name')
+    if name_node is None:
+        # C/C++ nest the identifier inside (function/pointer) declarators
+        name_node = node.child_by_field_name('declarator')
+        while name_node is not None and name_node.child_by_field_name('declarator') is not None:
+            name_node = name_node.child_by_field_name('declarator')
+    return name_node.text.decode('utf-8', errors='replace') if name_node is not None else None
 
-def extract_generic_chunks(source: str, file_path: str) -> List[Dict]:
+def extract_generic_chunks(source: str, file_path: str, lines: LineIndex = None) -> List[Dict]:
     """
     Fallback: split into overlapping chunks of 100 lines.
     """
-    lines = source.splitlines()
+    lines = lines or LineIndex(source)
     chunk_size = 100
     chunks = []
     for i in range(0, len(lines), chunk_size // 2):
-        chunk_lines = lines[i:i + chunk_size]
+        end_line = min(i + chunk_size, len(lines))
         chunks.append({
-            'code': '\n'.join(chunk_lines).strip(),
+            'code': lines.slice(i + 1, end_line).strip(),
             'type': 'generic',
             'name': f"chunk_{i}",
             'start_line': i + 1,
-            'end_line': i + len(chunk_lines)
+            'end_line': end_line
         })
     return chunks
@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from app.core.logger import logger
+
+CHARS_PER_TOKEN = 4  # Rough ratio for code when no tokenizer is available
+
+
+def approx_token_count(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+@dataclass
+class ContextBlock:
+    """A contiguous line range of one file, built from one or more overlapping hits."""
+    path: str
+    start_line: int
+    end_line: int
+    score: float
+    lines: List[str]
+    names: List[str] = field(default_factory=list)
+    type: str = "unknown"
+
+    def render(self, lines: Sequence[str] = None) -> str:
+        """Context text for the block, or for only its first lines if `lines` is given."""
+        end_line = self.end_line if lines is None else self.start_line + len(lines) - 1
+        lines = self.lines if lines is None else lines
+        header = f"=== From {self.path} (lines {self.start_line}-{end_line}) ===\n"
+        header += f"Type: {self.type}, Name: {', '.join(self.names) or 'unknown'}\n\n"
+        return header + "\n".join(lines).strip() + "\n\n"
+
+
+def _join_lines(first: List[str], second: List[str]) -> List[str]:
+    """Append `second` to `first`, dropping the longest prefix of it that repeats first's tail."""
+    # Chunk text is stripped, so the first line may have lost its indentation
+    tail = [line.strip() for line in first]
+    head = [line.strip() for line in second]
+    for overlap in range(min(len(first), len(second)), 0, -1):
+        if tail[-overlap:] == head[:overlap]:
+            return first + second[overlap:]
+    return first + second
+
+
+def merge_hits(hits: Sequence[Tuple[float, dict, str]]) -> List[ContextBlock]:
+    """
+    Merge (score, metadata, text) hits of the same file whose line ranges overlap or touch.
+    Ranges inside another hit (e.g. a method within its class) add nothing but their score.
+
+    Returns:
+        Blocks scored by their best hit, in no particular order
+    """
+    by_path: Dict[str, List[Tuple[float, dict, str]]] = {}
+    for hit in hits:
+        by_path.setdefault(hit[1]["path"], []).append(hit)
+
+    blocks = []
+    for path, file_hits in by_path.items():
+        # Widest range first among equal starts, so contained ranges are folded into it
+        file_hits.sort(key=lambda h: (h[1]["start_line"], -h[1]["end_line"]))
+        current: Optional[ContextBlock] = None
+        for score, meta, text in file_hits:
+            start, end = meta["start_line"], meta["end_line"]
+            name = meta.get("name")
+            if current is not None and start <= current.end_line + 1:
+                if end > current.end_line:
+                    current.lines = _join_lines(current.lines, text.splitlines())
+                    current.end_line = end
+                current.score = max(current.score, score)
+                if name and name not in current.names:
+                    current.names.append(name)
+                continue
+            current = ContextBlock(path, start, end, score, text.splitlines(), [name] if name else [],
+                                   meta.get("type", "unknown"))
+            blocks.append(current)
+    return blocks
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into a token budget for the LLM prompt.
+
+    Overlapping hits of a file are merged so shared lines are sent once. The best-scoring
+    block is always included (cut to the budget if needed); the remaining budget goes to
+    blocks in order of score per token, skipping any that no longer fit.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int] = approx_token_count, max_tokens: int = 768):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+
+    def build(self, hits: Sequence[Tuple[float, dict, str]]) -> str:
+        """
+        Args:
+            hits: (score, metadata, chunk text) triples
+
+        Returns:
+            The context string, blocks ordered best first
+        """
+        blocks = merge_hits(hits)
+        if not blocks:
+            return ""
+        texts = [block.render() for block in blocks]
+        costs = [self.count_tokens(text) for text in texts]
+
+        best = max(range(len(blocks)), key=lambda i: blocks[i].score)
+        if costs[best] > self.max_tokens:
+            texts[best], costs[best] = self._truncate(blocks[best])
+        chosen = [best]
+        used = costs[best]
+        for i in sorted(range(len(blocks)), key=lambda i: blocks[i].score / costs[i], reverse=True):
+            if i != best and used + costs[i] <= self.max_tokens:
+                chosen.append(i)
+                used += costs[i]
+
+        chosen.sort(key=lambda i: blocks[i].score, reverse=True)
+        logger.info(f"Packed {len(chosen)} of {len(blocks)} context blocks ({len(hits)} hits) "
+                    f"into {used}/{self.max_tokens} tokens")
+        return "".join(texts[i] for i in chosen)
+
+    def _truncate(self, block: ContextBlock) -> Tuple[str, int]:
+        """Longest leading part of the block that fits the budget (binary search on lines)."""
+        low, high = 0, len(block.lines)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(block.render(block.lines[:middle])) <= self.max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        text = block.render(block.lines[:low])
+        return text, self.count_tokens(text)
@@ -1,4 +1,8 @@
 import os
+import re
+import stat
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from app.core.config import settings
 from app.core.logger import logger
 
 # Directories to exclude
@@ -18,71 +22,227 @@ EXTENSION_LANGUAGE_MAP = {
     '.go': 'Go'
 }
 
-def is_text_file(filepath):
+
+class CodeFile(NamedTuple):
+    path: str
+    language: str
+    stat: os.stat_result  # lstat taken during the walk; reused by change detection
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob (*, ?, [...], **) to a regex over '/'-separated paths."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRule(NamedTuple):
+    base: str  # Repo-relative directory the rule was declared in ("" for the root)
+    regex: "re.Pattern"
+    negate: bool
+    dir_only: bool
+    anchored: bool  # Matched against the path below `base`, else against the name alone
+
+
+def parse_ignore_patterns(lines: Iterable[str], base: str = "") -> List[IgnoreRule]:
+    """Parse .gitignore-style lines declared in repo-relative directory `base`."""
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if line:
+            rules.append(IgnoreRule(base, re.compile(_glob_to_regex(line)), negate, dir_only, anchored))
+    return rules
+
+
+def is_ignored(rules: List[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    """Whether the last rule matching rel_path ignores it (later and deeper rules win)."""
+    ignored = False
+    name = rel_path.rsplit("/", 1)[-1]
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        if rule.base:
+            if not rel_path.startswith(rule.base + "/"):
+                continue
+            sub_path = rel_path[len(rule.base) + 1:]
+        else:
+            sub_path = rel_path
+        if rule.regex.fullmatch(sub_path if rule.anchored else name):
+            ignored = not rule.negate
+    return ignored
+
+
+def _read_gitignore(dir_path: str, base: str) -> List[IgnoreRule]:
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            f.read(1024)
-        return True
-    except Exception:
-        return False
+        with open(os.path.join(dir_path, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+            return parse_ignore_patterns(f, base)
+    except OSError:
+        return []
 
-def collect_code_files(root_dir, extensions=None, verbose=False, skip_hidden=True):
+
+def iter_code_files(root_dir, extensions=None, skip_hidden=True, exclude: Optional[Iterable[str]] = None,
+                    respect_gitignore: bool = None) -> Iterator[CodeFile]:
     """
-    Crawl the directory and collect source code files.
+    Walk the directory with os.scandir and yield source files as they are found, so
+    downstream stages can start before the walk finishes.
 
-    Args:
-        root_dir (str): Path to the codebase root
-        extensions (set): Allowed extensions, defaults to EXTENSION_LANGUAGE_MAP
-        verbose (bool): Print collected files
-        skip_hidden (bool): Skip hidden files and directories
+    Directories are pruned by EXCLUDE_DIRS, hidden names, `.gitignore` files (root and
+    nested) and `exclude` globs (gitignore syntax, relative to the root). Symlinks are
+    never followed. Each file costs one lstat through its DirEntry and is not opened:
+    whether it is really text is decided by the chunker when it reads the file.
 
-    Returns:
-        list of tuples: (full_path, language)
+    Args:
+        exclude: Extra ignore globs (default CRAWL_EXCLUDE_GLOBS)
+        respect_gitignore: Apply .gitignore files (default CRAWL_RESPECT_GITIGNORE)
     """
-    # Sanitize and validate root_dir
     root_dir = os.path.abspath(root_dir)
     if not os.path.isdir(root_dir):
         raise ValueError("Invalid root directory")
 
     if extensions is None:
         extensions = set(EXTENSION_LANGUAGE_MAP.keys())
+    exclude = settings.CRAWL_EXCLUDE_GLOBS if exclude is None else exclude
+    respect_gitignore = settings.CRAWL_RESPECT_GITIGNORE if respect_gitignore is None else respect_gitignore
 
-    code_files = []
-
-    for dirpath, dirnames, filenames in os.walk(root_dir, followlinks=False):
-        dirpath = os.path.abspath(dirpath)
-        # Prevent path traversal: ensure dirpath is within root_dir
-        if not dirpath.startswith(root_dir):
-            logger.warning(f"Path traversal attempt detected: {dirpath}")
+    root_rules = parse_ignore_patterns(exclude)
+    stack: List[Tuple[str, str, List[IgnoreRule]]] = [(root_dir, "", root_rules)]
+    while stack:
+        dir_path, rel_dir, rules = stack.pop()
+        if respect_gitignore:
+            rules = rules + _read_gitignore(dir_path, rel_dir)
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Skipped directory {dir_path}: {e}")
             continue
 
-        # Exclude unwanted and hidden directories
-        dirnames[:] = [
-            d for d in dirnames
-            if d not in EXCLUDE_DIRS and (not skip_hidden or not d.startswith('.'))
-        ]
-
-        for file in filenames:
-            if skip_hidden and file.startswith('.'):
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if skip_hidden and name.startswith('.'):
                 continue
-            ext = os.path.splitext(file)[1].lower()
-            if ext in extensions:
-                full_path = os.path.abspath(os.path.join(dirpath, file))
-                # Prevent path traversal: ensure full_path is within root_dir
-                if not full_path.startswith(root_dir):
-                    logger.warning(f"Path traversal attempt detected: {full_path}")
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            try:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in EXCLUDE_DIRS and not is_ignored(rules, rel_path, True):
+                        subdirs.append((entry.path, rel_path, rules))
                     continue
-                # Skip symlinks
-                if os.path.islink(full_path):
+                ext = os.path.splitext(name)[1].lower()
+                if ext not in extensions or is_ignored(rules, rel_path, False):
                     continue
-                try:
-                    if os.path.getsize(full_path) <= MAX_FILE_SIZE and is_text_file(full_path):
-                        language = EXTENSION_LANGUAGE_MAP.get(ext, 'Unknown')
-                        code_files.append((full_path, language))
-                        if verbose:
-                            logger.info(f"Collected: {full_path} [{language}]")
-                except Exception as e:
-                    logger.warning(f"Skipped {full_path}: {e}")
+                st = entry.stat(follow_symlinks=False)
+            except OSError as e:
+                logger.warning(f"Skipped {entry.path}: {e}")
+                continue
+            if st.st_size <= MAX_FILE_SIZE:
+                yield CodeFile(entry.path, EXTENSION_LANGUAGE_MAP.get(ext, 'Unknown'), st)
+
+        # Depth-first in name order, so the file order (and thus vector IDs) is reproducible
+        stack.extend(reversed(subdirs))
+
+
+def crawl_file(root_dir, file_path, extensions=None, skip_hidden=True, exclude: Optional[Iterable[str]] = None,
+               respect_gitignore: bool = None) -> Optional[CodeFile]:
+    """
+    The CodeFile for a single path if a walk of root_dir would collect it, else None
+    (missing, not a source file, excluded, ignored, behind a symlink or too large).
+    Used to re-index individual files without walking the whole repo.
+    """
+    root_dir = os.path.abspath(root_dir)
+    rel = os.path.relpath(os.path.abspath(file_path), root_dir)
+    if rel == "." or rel.startswith(".."):
+        return None
+    if extensions is None:
+        extensions = set(EXTENSION_LANGUAGE_MAP.keys())
+    exclude = settings.CRAWL_EXCLUDE_GLOBS if exclude is None else exclude
+    respect_gitignore = settings.CRAWL_RESPECT_GITIGNORE if respect_gitignore is None else respect_gitignore
+
+    parts = rel.split(os.sep)
+    ext = os.path.splitext(parts[-1])[1].lower()
+    if ext not in extensions:
+        return None
+    rules = parse_ignore_patterns(exclude)
+    dir_path, rel_dir = root_dir, ""
+    for depth, name in enumerate(parts):
+        is_dir = depth < len(parts) - 1
+        if respect_gitignore:
+            rules = rules + _read_gitignore(dir_path, rel_dir)
+        rel_path = f"{rel_dir}/{name}" if rel_dir else name
+        if (skip_hidden and name.startswith('.')) or (is_dir and name in EXCLUDE_DIRS):
+            return None
+        if is_ignored(rules, rel_path, is_dir):
+            return None
+        dir_path, rel_dir = os.path.join(dir_path, name), rel_path
+        if is_dir and os.path.islink(dir_path):
+            return None
+
+    try:
+        st = os.lstat(dir_path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode) or st.st_size > MAX_FILE_SIZE:
+        return None
+    return CodeFile(dir_path, EXTENSION_LANGUAGE_MAP.get(ext, 'Unknown'), st)
+
+
+def collect_code_files(root_dir, extensions=None, verbose=False, skip_hidden=True, **kwargs) -> List[CodeFile]:
+    """
+    Crawl the directory and collect source code files.
+
+    Args:
+        root_dir (str): Path to the codebase root
+        extensions (set): Allowed extensions, defaults to EXTENSION_LANGUAGE_MAP
+        verbose (bool): Print collected files
+        skip_hidden (bool): Skip hidden files and directories
+        **kwargs: `exclude` / `respect_gitignore`, see iter_code_files
+
+    Returns:
+        list of CodeFile tuples: (full_path, language, stat)
+    """
+    code_files = []
+    for code_file in iter_code_files(root_dir, extensions, skip_hidden=skip_hidden, **kwargs):
+        code_files.append(code_file)
+        if verbose:
+            logger.info(f"Collected: {code_file.path} [{code_file.language}]")
 
     logger.info(f"Total files collected: {len(code_files)}")
     return code_files
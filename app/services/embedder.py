@@ -2,25 +2,66 @@
 
 import os
 import logging
+import threading
 from typing import List
-from sentence_transformers import SentenceTransformer
-try:
-    import openai
-except ImportError:
-    openai = None  # Safe fallback if OpenAI package not installed
+import numpy as np
+from app.services.query_cache import QueryEmbeddingCache, normalize_query
+from app.utils.lazy_import import lazy_module
+
+# Both are imported on first use; importing this module stays cheap
+sentence_transformers = lazy_module("sentence_transformers")
+SentenceTransformer = None  # Model class; None means sentence_transformers.SentenceTransformer
+openai = lazy_module("openai", optional=True)  # None if the OpenAI package is not installed
 
 logger = logging.getLogger(__name__)
 
+# BGE v1.5 retrieval models expect this prefix on queries (not on passages)
+BGE_QUERY_INSTRUCTION = "Represent this sentence for searching relevant passages: "
+
+def default_query_instruction(model_name: str) -> str:
+    """Query prefix the given embedding model was trained with, if any."""
+    name = (model_name or "").lower()
+    if "bge" in name and "-en" in name:
+        return BGE_QUERY_INSTRUCTION
+    return ""
+
 class Embedder:
-    def __init__(self, backend="huggingface", hf_model=None, openai_model="text-embedding-3-small", openai_api_key=None):
+    def __init__(
+        self,
+        backend="huggingface",
+        hf_model=None,
+        openai_model="text-embedding-3-small",
+        openai_api_key=None,
+        normalize=False,
+        query_instruction=None,
+        query_cache: QueryEmbeddingCache = None,
+    ):
+        """
+        Args:
+            normalize (bool): L2-normalize vectors so inner product equals cosine similarity
+            query_instruction (str): Prefix for search queries; None picks the model's default
+            query_cache (QueryEmbeddingCache): Optional cache consulted by embed_query
+        """
         self.backend = backend.lower()
+        self.normalize = normalize
+        self.model_name = hf_model if self.backend == "huggingface" else openai_model
+        self.query_instruction = (
+            default_query_instruction(self.model_name) if query_instruction is None else query_instruction
+        )
+        self.query_cache = query_cache
+        self.query_batcher = None  # Optional EmbeddingBatcher coalescing concurrent queries
+        # Everything besides the input text that determines a passage vector / a query vector
+        self.model_key = f"{self.backend}:{self.model_name}:{int(normalize)}"
+        self.cache_namespace = f"{self.model_key}:{self.query_instruction}"
+
+        self._model = None
+        self._dim = None
+        self._load_lock = threading.Lock()
 
         if self.backend == "huggingface":
             if not hf_model:
                 raise ValueError("hf_model must be provided for HuggingFace backend (set EMBEDDING_MODEL_NAME in .env)")
-            self.model = SentenceTransformer(hf_model)
-            self.dim = self.model.get_sentence_embedding_dimension()
-            logger.info(f"Loaded HuggingFace model: {hf_model} with dimension {self.dim}")
+            # The model is loaded by load(): at start-up warm-up or on first use
 
         elif self.backend == "openai":
             if openai is None:
@@ -32,21 +73,54 @@ class Embedder:
 
             # Adjusted dimension handling for OpenAI models
             if "text-embedding-3" in openai_model:
-                self.dim = 1536
+                self._dim = 1536
             else:
-                self.dim = 768
+                self._dim = 768
 
             logger.info(f"Using OpenAI model: {openai_model} with dimension {self.dim}")
 
         else:
             raise ValueError("Unsupported backend. Use 'huggingface' or 'openai'.")
 
-    def embed(self, texts: List[str]) -> List[List[float]]:
+    @property
+    def loaded(self) -> bool:
+        return self.backend != "huggingface" or self._model is not None
+
+    def load(self):
+        """Load the HuggingFace model if it is not loaded yet (concurrent callers wait for one load)."""
+        if self.loaded:
+            return
+        with self._load_lock:
+            if self._model is None:
+                model_cls = SentenceTransformer or sentence_transformers.SentenceTransformer
+                model = model_cls(self.model_name)
+                self._dim = model.get_sentence_embedding_dimension()
+                self._model = model
+                logger.info(f"Loaded HuggingFace model: {self.model_name} with dimension {self._dim}")
+
+    @property
+    def model(self):
+        self.load()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+        self._dim = None
+
+    @property
+    def dim(self) -> int:
+        if self._dim is None:
+            self._dim = self.model.get_sentence_embedding_dimension()
+        return self._dim
+
+    def embed(self, texts: List[str], batch_size: int = None) -> List[List[float]]:
         """
         Generate embeddings for a list of texts.
 
         Args:
             texts (List[str]): Input texts/snippets
+            batch_size (int): Texts per forward pass (HuggingFace only); defaults to the model's own
 
         Returns:
             List of embedding vectors
@@ -55,7 +129,10 @@ class Embedder:
             RuntimeError on failure to generate embeddings
         """
         if self.backend == "huggingface":
-            return self.model.encode(texts, show_progress_bar=False, convert_to_numpy=True).tolist()
+            encode_kwargs = {"batch_size": batch_size} if batch_size else {}
+            if self.normalize:
+                encode_kwargs["normalize_embeddings"] = True
+            return self.model.encode(texts, show_progress_bar=False, convert_to_numpy=True, **encode_kwargs).tolist()
 
         elif self.backend == "openai":
             try:
@@ -63,8 +140,49 @@ class Embedder:
                     model=self.openai_model,
                     input=texts
                 )
-                return [e["embedding"] for e in response["data"]]
+                vectors = [e["embedding"] for e in response["data"]]
+                if self.normalize:
+                    array = np.array(vectors, dtype="float32")
+                    norms = np.linalg.norm(array, axis=1, keepdims=True)
+                    vectors = (array / np.maximum(norms, 1e-12)).tolist()
+                return vectors
 
             except Exception as e:
                 logger.error(f"OpenAI embedding error: {e}")
                 raise RuntimeError(f"Failed to generate embeddings via OpenAI: {e}") from e
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a single search query, applying the model's query instruction."""
+        if self.query_cache is None:
+            return self._embed_query_text(self.query_instruction + query)
+        query = normalize_query(query)
+        vector = self.query_cache.get(self.cache_namespace, query)
+        if vector is None:
+            vector = self._embed_query_text(self.query_instruction + query)
+            self.query_cache.put(self.cache_namespace, query, vector)
+        return vector
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed many search queries at once: cached ones are reused and the rest
+        go through the model in a single batch.
+        """
+        keys = [normalize_query(q) for q in queries] if self.query_cache is not None else list(queries)
+        vectors = [
+            self.query_cache.get(self.cache_namespace, key) if self.query_cache is not None else None
+            for key in keys
+        ]
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            embedded = self.embed([self.query_instruction + key for key in missing], batch_size=len(missing))
+            fresh = dict(zip(missing, embedded))
+            if self.query_cache is not None:
+                for key, vector in fresh.items():
+                    self.query_cache.put(self.cache_namespace, key, vector)
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def _embed_query_text(self, text: str) -> List[float]:
+        if self.query_batcher is not None:
+            return self.query_batcher.embed(text)
+        return self.embed([text])[0]
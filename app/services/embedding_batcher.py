@@ -0,0 +1,98 @@
+import time
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, List
+from app.core.logger import logger
+
+_STOP = object()
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding calls into one batched model call.
+
+    Callers block in `embed(text)`. A background thread takes the first waiting text,
+    keeps collecting for up to `window_ms` (or until `max_batch_size` texts), runs
+    `embed_fn` once on the whole batch and hands each caller its own vector.
+    """
+
+    def __init__(self, embed_fn: Callable[..., List[List[float]]], max_batch_size: int = 32, window_ms: float = 5.0):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._histogram: Counter = Counter()  # Batch size (distinct texts) -> number of model calls
+        self.queries = 0  # Callers served, including duplicates that shared a text
+        self.texts = 0  # Distinct texts sent to the model
+        self._thread = threading.Thread(target=self._run, name="codeatlas-query-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one text, sharing a model call with whatever arrives in the same window."""
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._process(batch)
+                    return
+                batch.append(item)
+            self._process(batch)
+
+    def _process(self, batch):
+        # Identical queries in one window are embedded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = self.embed_fn(texts, batch_size=len(texts))
+        except Exception as e:
+            logger.error(f"Batched query embedding failed for {len(batch)} queries: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            future.set_result(by_text[text])
+        with self._lock:
+            self._histogram[len(texts)] += 1
+            self.queries += len(batch)
+            self.texts += len(texts)
+
+    def stats(self) -> dict:
+        """
+        Batch sizes (histogram and mean_batch_size) count the distinct texts per model
+        call; mean_queries_per_call counts callers, so duplicates raise only the latter.
+        """
+        with self._lock:
+            batches = sum(self._histogram.values())
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch_size": self.max_batch_size,
+                "queries": self.queries,
+                "texts": self.texts,
+                "batches": batches,
+                "mean_batch_size": self.texts / batches if batches else 0.0,
+                "mean_queries_per_call": self.queries / batches if batches else 0.0,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self._histogram.items())},
+            }
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
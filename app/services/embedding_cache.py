@@ -0,0 +1,133 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Optional, Sequence
+import numpy as np
+from app.core.config import settings
+from app.core.logger import logger
+
+EVICT_TARGET_RATIO = 0.9  # Evict down to this fraction of max_bytes so eviction runs in bursts
+EVICT_BATCH = 1000
+
+
+def chunk_key(namespace: str, text: str) -> bytes:
+    """Content address of a chunk for one embedding model."""
+    return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).digest()
+
+
+class ChunkEmbeddingCache:
+    """
+    Persistent, content-addressed cache of chunk embeddings.
+
+    Keys are sha256(model namespace + chunk text), so identical code in forks, vendored
+    copies and re-index runs is embedded once. Entries live in a local SQLite file and
+    the least recently used ones are evicted once stored vectors exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, namespace: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vector for each text, or None where it has not been embedded yet."""
+        keys = [chunk_key(namespace, text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(time.time(), key) for key in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return [
+            np.frombuffer(found[key], dtype="float32").tolist() if key in found else None
+            for key in keys
+        ]
+
+    def put_many(self, namespace: str, texts: Sequence[str], vectors):
+        now = time.time()
+        rows = [
+            (chunk_key(namespace, text), np.asarray(vector, dtype="float32").tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            with self._conn:
+                for key, blob, used in rows:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                        (key, blob, used),
+                    )
+                    self._total_bytes += len(blob) * cursor.rowcount
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries down to the target size. Caller holds the lock."""
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        evicted = 0
+        with self._conn:
+            while self._total_bytes > target:
+                rows = self._conn.execute(
+                    "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT ?", (EVICT_BATCH,)
+                ).fetchall()
+                if not rows:
+                    self._total_bytes = 0
+                    break
+                for key, size in rows:
+                    if self._total_bytes <= target:
+                        break
+                    self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                    self._total_bytes -= size
+                    evicted += 1
+        logger.info(f"Evicted {evicted} entries from embedding cache {self.path}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": self.path,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_embedding_cache() -> Optional[ChunkEmbeddingCache]:
+    """The cache configured by EMBEDDING_CACHE_PATH / EMBEDDING_CACHE_MAX_BYTES, or None if disabled."""
+    if settings.EMBEDDING_CACHE_MAX_BYTES <= 0:
+        return None
+    path = settings.EMBEDDING_CACHE_PATH or os.path.join(settings.VECTOR_STORE_DIR, "embedding_cache.sqlite")
+    return ChunkEmbeddingCache(path, max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES)
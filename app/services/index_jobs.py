@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Set
+from app.core.logger import logger
+
+JOB_STATES = ("queued", "running", "ready", "failed")
+
+
+@dataclass
+class IndexJob:
+    repo_name: str
+    repo_path: str
+    full_rebuild: bool = False
+    state: str = "queued"
+    files_done: int = 0
+    files_total: int = 0  # Files being (re-)indexed by this run, known once it starts indexing
+    reindexed: Optional[bool] = None  # False when the repo turned out to be unchanged
+    error: Optional[str] = None
+    paths: Optional[Set[str]] = None  # Files reported as changed (e.g. by the watcher); None = whole repo
+    queued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        if self.state == "ready":
+            return 1.0
+        return self.files_done / self.files_total if self.files_total else 0.0
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["paths"] = len(self.paths) if self.paths is not None else None
+        return {**data, "progress": self.progress}
+
+
+class IndexJobRunner:
+    """
+    Runs repository indexing in background threads so the API never waits for it.
+
+    One job per repo is tracked (queued -> running -> ready / failed, with file progress).
+    Submitting a repo that already has a queued job folds the request into that job; while
+    one is running, a follow-up job is queued, since files may have changed after the
+    running job looked at them. Jobs of the same repo never run concurrently.
+    Searches keep using the previous index until the new one is saved, at which point
+    the index registry hot-swaps it.
+    """
+
+    def __init__(self, index_fn: Callable[..., bool], max_workers: int = 1):
+        """
+        Args:
+            index_fn: index_fn(repo_path, full_rebuild=..., progress=..., [paths=...]) -> bool (True if re-indexed)
+            max_workers: Repos indexed concurrently
+        """
+        self.index_fn = index_fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="codeatlas-index-job")
+        self._jobs: Dict[str, IndexJob] = {}
+        self._repo_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, repo_path: str, full_rebuild: bool = False, paths: Iterable[str] = None) -> IndexJob:
+        """
+        Queue indexing of a repo; `paths` limits change detection to those files
+        (absolute or repo-relative).
+        """
+        repo_name = os.path.basename(os.path.abspath(repo_path))
+        paths = set(paths) if paths is not None else None
+        with self._lock:
+            job = self._jobs.get(repo_name)
+            if job is not None and job.state == "queued":
+                job.full_rebuild = job.full_rebuild or full_rebuild
+                job.paths = None if job.paths is None or paths is None else job.paths | paths
+                return job
+            job = self._jobs[repo_name] = IndexJob(repo_name, str(repo_path), full_rebuild, paths=paths)
+            repo_lock = self._repo_locks.setdefault(repo_name, threading.Lock())
+        self._executor.submit(self._run, job, repo_lock)
+        logger.info(f"[{repo_name}] Indexing job queued")
+        return job
+
+    def submit_all(self, repo_paths: Iterable[str], full_rebuild: bool = False) -> Dict[str, IndexJob]:
+        return {job.repo_name: job for job in (self.submit(path, full_rebuild) for path in repo_paths)}
+
+    def _run(self, job: IndexJob, repo_lock: threading.Lock):
+        with repo_lock:
+            self._run_locked(job)
+
+    def _run_locked(self, job: IndexJob):
+        with self._lock:
+            job.state = "running"
+            job.started_at = time.time()
+            kwargs = {"paths": sorted(job.paths)} if job.paths is not None else {}
+
+        def progress(files_done: int, files_total: int):
+            job.files_done, job.files_total = files_done, files_total
+
+        try:
+            reindexed = self.index_fn(job.repo_path, full_rebuild=job.full_rebuild, progress=progress, **kwargs)
+        except Exception as e:
+            logger.error(f"[{job.repo_name}] Indexing job failed: {e}", exc_info=True)
+            with self._lock:
+                job.state = "failed"
+                job.error = str(e)
+                job.finished_at = time.time()
+            return
+        with self._lock:
+            job.state = "ready"
+            job.reindexed = bool(reindexed)
+            job.finished_at = time.time()
+        logger.info(f"[{job.repo_name}] Indexing job finished in {job.finished_at - job.started_at:.1f}s")
+
+    def get(self, repo_name: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(repo_name)
+            return job.to_dict() if job is not None else None
+
+    def jobs(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: job.to_dict() for name, job in sorted(self._jobs.items())}
+
+    def shutdown(self):
+        # A running job is left to finish in its thread; queued ones are dropped
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,154 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.core.logger import logger
+from app.services.indexer import CodeIndexer, should_mmap
+from app.utils.repo_utils import get_index_paths
+
+
+class _Entry:
+    def __init__(self, indexer: CodeIndexer, version: Tuple, size_bytes: int):
+        self.indexer = indexer  # size_bytes excludes memory-mapped vectors (they live in the page cache)
+        self.version = version
+        self.size_bytes = size_bytes
+
+
+class IndexRegistry:
+    """
+    Process-wide cache of loaded per-repo indexes.
+
+    Indexes are loaded once per on-disk version and shared by every request.
+    When the files written by the pipeline change, the next lookup reloads them
+    (hot-swap). Total size is bounded by `max_bytes`, evicting least recently
+    used repos first.
+
+    Indexes selected by `mmap_mode` / `mmap_min_bytes` are memory-mapped read-only,
+    so their vectors are shared by every worker process instead of copied into each.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        vector_store_dir: str,
+        max_bytes: int,
+        mmap_mode: str = "never",
+        mmap_min_bytes: int = 0,
+    ):
+        self.dim = dim
+        self.vector_store_dir = vector_store_dir
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode
+        self.mmap_min_bytes = mmap_min_bytes
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _version(self, repo_name: str) -> Optional[Tuple]:
+        """(mtime_ns, size) of the index files, or None if the repo is not indexed."""
+        index_path, metadata_path = get_index_paths(repo_name, self.vector_store_dir)
+        try:
+            index_stat = os.stat(index_path)
+            metadata_stat = os.stat(metadata_path)
+        except FileNotFoundError:
+            return None
+        return (index_stat.st_mtime_ns, index_stat.st_size, metadata_stat.st_mtime_ns, metadata_stat.st_size)
+
+    def version(self, repo_name: str) -> Optional[Tuple]:
+        """Current on-disk version of a repo's index (changes whenever it is re-indexed), or None."""
+        return self._version(repo_name)
+
+    def available_repos(self) -> List[str]:
+        """Repos with a complete index on disk, sorted by name."""
+        if not os.path.isdir(self.vector_store_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.vector_store_dir)
+            if os.path.isdir(os.path.join(self.vector_store_dir, name)) and self._version(name) is not None
+        )
+
+    def get(self, repo_name: str) -> CodeIndexer:
+        """
+        Return the loaded indexer for a repo, loading or reloading it if needed.
+
+        Raises:
+            FileNotFoundError if the repo has no index on disk
+            RuntimeError if the index exists but cannot be loaded
+        """
+        version = self._version(repo_name)
+        if version is None:
+            raise FileNotFoundError(f"Index file not found for repo '{repo_name}' in {self.vector_store_dir}")
+
+        with self._lock:
+            entry = self._entries.get(repo_name)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(repo_name)
+                self.hits += 1
+                return entry.indexer
+            load_lock = self._load_locks.setdefault(repo_name, threading.Lock())
+
+        # Load outside the registry lock so other repos keep being served
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(repo_name)
+                if entry is not None and entry.version == version:
+                    self._entries.move_to_end(repo_name)
+                    self.hits += 1
+                    return entry.indexer
+                self.misses += 1
+
+            indexer = self._load(repo_name, index_size=version[1])
+            size_bytes = version[3] if indexer.mmapped else version[1] + version[3]
+
+            with self._lock:
+                previous = self._entries.pop(repo_name, None)
+                self._entries[repo_name] = _Entry(indexer, version, size_bytes)
+                if previous is not None:
+                    logger.info(f"Hot-swapped index for repo '{repo_name}' to newer version on disk")
+                self._evict(keep=repo_name)
+            return indexer
+
+    def _load(self, repo_name: str, index_size: int) -> CodeIndexer:
+        index_path, metadata_path = get_index_paths(repo_name, self.vector_store_dir)
+        indexer = CodeIndexer(dim=self.dim, index_path=index_path, metadata_path=metadata_path, autoload=False)
+        if not indexer.load(mmap=should_mmap(index_size, self.mmap_mode, self.mmap_min_bytes)):
+            raise RuntimeError(f"Index load failed for repo '{repo_name}'")
+        logger.info(f"Loaded index for repo '{repo_name}' with {len(indexer.metadata)} items")
+        return indexer
+
+    def _evict(self, keep: str):
+        """Drop least recently used repos until the memory budget is met. Caller holds the lock."""
+        total = sum(e.size_bytes for e in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            name = next(iter(self._entries))
+            if name == keep:
+                self._entries.move_to_end(name)
+                continue
+            entry = self._entries.pop(name)
+            total -= entry.size_bytes
+            self.evictions += 1
+            logger.info(f"Evicted index for repo '{name}' from memory ({entry.size_bytes} bytes)")
+
+    def evict(self, repo_name: str):
+        with self._lock:
+            self._entries.pop(repo_name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "repos": list(self._entries.keys()),
+                "mmapped": [name for name, e in self._entries.items() if e.indexer.mmapped],
+                "memory_bytes": sum(e.size_bytes for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
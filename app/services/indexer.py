@@ -1,86 +1,423 @@
-import faiss
 import numpy as np
 import os
-import pickle
+import json
+import math
 import logging
+from app.services.metadata_store import ColumnarMetadata, write_metadata
+from app.services.lexical_index import LexicalIndex, lexical_path_for
+from app.services.chunk_store import ChunkTextStore, chunk_store_path_for
+from app.utils.lazy_import import lazy_module
+
+faiss = lazy_module("faiss")
 
 logger = logging.getLogger(__name__)
 
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "opq_ivf_pq")
+
+# Corpus sizes at which "auto" switches to an approximate index
+AUTO_IVF_MIN_VECTORS = 50_000
+AUTO_PQ_MIN_VECTORS = 1_000_000
+
+# Training needs ~39 points per centroid; PQ codebooks have 256 centroids each
+MIN_POINTS_PER_CENTROID = 39
+PQ_MIN_TRAIN_VECTORS = 256 * MIN_POINTS_PER_CENTROID
+
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+DEFAULT_TRAIN_SAMPLE = 100_000
+
+# "cosine" stores L2-normalized vectors in an inner-product index; "l2" ranks by Euclidean distance
+METRICS = {"l2": "METRIC_L2", "cosine": "METRIC_INNER_PRODUCT"}  # faiss attribute names
+
+# "auto" memory-maps indexes above a size threshold; mapped vectors live in the shared page cache
+MMAP_MODES = ("auto", "always", "never")
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """Pick an index type for a corpus of the given size."""
+    if num_vectors < AUTO_IVF_MIN_VECTORS:
+        return "flat"
+    if num_vectors < AUTO_PQ_MIN_VECTORS:
+        return "ivf_flat"
+    return "opq_ivf_pq"
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest divisor of dim that is <= 64 and leaves at least 8 dims per sub-quantizer."""
+    for m in range(min(64, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def index_factory_string(index_type: str, dim: int, num_vectors: int) -> str:
+    """FAISS factory string for an ID-mapped index of the given type and corpus size."""
+    nlist = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // MIN_POINTS_PER_CENTROID))
+    m = _pq_subquantizers(dim)
+    factories = {
+        "flat": "IDMap2,Flat",
+        "ivf_flat": f"IDMap2,IVF{nlist},Flat",
+        "ivf_pq": f"IDMap2,IVF{nlist},PQ{m}",
+        "hnsw": "IDMap2,HNSW32,Flat",
+        "opq_ivf_pq": f"IDMap2,OPQ{m},IVF{nlist},PQ{m}",
+    }
+    return factories[index_type]
+
+
+def should_mmap(index_size: int, mode: str, min_bytes: int) -> bool:
+    """Whether an index file of the given size should be memory-mapped rather than read into RAM."""
+    if mode not in MMAP_MODES:
+        raise ValueError(f"Unsupported mmap mode '{mode}'. Use one of {MMAP_MODES}")
+    return mode == "always" or (mode == "auto" and index_size >= min_bytes)
+
+
+def resolve_index_type(index_type: str, num_vectors: int) -> str:
+    """Turn a requested type (possibly "auto") into one that can be trained on num_vectors."""
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type '{index_type}'. Use 'auto' or one of {INDEX_TYPES}")
+    if index_type in ("ivf_pq", "opq_ivf_pq") and num_vectors < PQ_MIN_TRAIN_VECTORS:
+        logger.warning(f"Only {num_vectors} vectors; too few to train '{index_type}', using 'ivf_flat'")
+        index_type = "ivf_flat"
+    if index_type == "ivf_flat" and num_vectors < MIN_POINTS_PER_CENTROID:
+        logger.warning(f"Only {num_vectors} vectors; too few to train 'ivf_flat', using 'flat'")
+        index_type = "flat"
+    return index_type
+
 
 class CodeIndexer:
-    def __init__(self, dim: int, index_path="faiss.index", metadata_path="metadata.pkl"):
+    def __init__(
+        self,
+        dim: int,
+        index_path="faiss.index",
+        metadata_path="metadata.bin",
+        autoload=True,
+        index_type="flat",
+        train_sample=DEFAULT_TRAIN_SAMPLE,
+        metric="l2",
+    ):
         """
         Args:
             dim (int): Dimension of your embeddings (e.g., 384 for MiniLM)
             index_path (str): Path to save/load FAISS index
-            metadata_path (str): Path to store associated metadata
+            metadata_path (str): Path to the columnar metadata file
+            autoload (bool): Load an existing index from disk on construction
+            index_type (str): "auto" or one of INDEX_TYPES; used when (re)building the index
+            train_sample (int): Max vectors sampled to train IVF/PQ/OPQ indexes
+            metric (str): "l2" or "cosine"; used when (re)building the index
         """
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric '{metric}'. Use one of {tuple(METRICS)}")
         self.dim = dim
         self.index_path = index_path
         self.metadata_path = metadata_path
+        self.info_path = f"{index_path}.json"  # Persisted index type next to the index
+        self.lexical_path = lexical_path_for(index_path)
+        self.chunk_store_path = chunk_store_path_for(index_path)
+        self.requested_type = index_type
+        # Type requested when the saved index was built; index_type may be a downgrade of it
+        self.built_requested_type = None
+        self.train_sample = train_sample
+        self.metric = metric
 
-        self.index = faiss.IndexFlatL2(dim)
-        self.metadata = []  # List of dicts (chunk info per vector)
+        self.reset()
 
-        if os.path.exists(index_path) and os.path.exists(metadata_path):
+        if autoload and os.path.exists(index_path) and os.path.exists(metadata_path):
             self.load()
 
-    def add_embeddings(self, embeddings, metadata_list):
+    def reset(self):
+        """Drop all vectors and metadata."""
+        self.metadata = {}  # Vector ID -> dict (chunk info per vector)
+        self.lexical = LexicalIndex()  # BM25 over chunk identifiers, keyed by vector ID
+        self.chunk_texts = ChunkTextStore(self.chunk_store_path)  # Compressed chunk source, keyed by vector ID
+        self.next_id = 0
+        self.mmapped = False
+        self._pending = []  # (vectors, ids) buffered until a trained index type can be built
+        if self.requested_type == "flat":
+            self.index_type = "flat"
+            self.index = self._new_index(index_factory_string("flat", self.dim, 0))
+        else:
+            # Type and training depend on corpus size, so build once all vectors are known
+            self.index_type = None
+            self.index = None
+
+    @property
+    def ntotal(self) -> int:
+        if self.index is not None:
+            return self.index.ntotal
+        return sum(len(ids) for _, ids in self._pending)
+
+    @property
+    def supports_removal(self) -> bool:
+        """HNSW graphs cannot drop vectors; changed files then require a full rebuild."""
+        return self.index_type != "hnsw"
+
+    def add_embeddings(self, embeddings, metadata_list, texts=None):
         """
         Add vectors and corresponding metadata.
 
         Args:
             embeddings (List[List[float]]): Vectors to index
             metadata_list (List[dict]): Metadata for each vector
+            texts (List[str]): Chunk source per vector; when given, it is stored and indexed lexically
+
+        Returns:
+            List[int]: Vector IDs assigned to the added embeddings
         """
         if len(embeddings) != len(metadata_list):
             raise ValueError("Embeddings and metadata size mismatch")
+        if len(embeddings) == 0:
+            return []
 
-        vectors = np.array(embeddings).astype('float32')
-        self.index.add(vectors)
-        self.metadata.extend(metadata_list)
+        self._ensure_writable()
+        vectors = self._prepare(embeddings)
+        ids = np.arange(self.next_id, self.next_id + len(vectors), dtype='int64')
+        if self.index is None:
+            self._pending.append((vectors, ids))
+        else:
+            self.index.add_with_ids(vectors, ids)
+        metadata = self._mutable_metadata()
+        for vector_id, meta in zip(ids.tolist(), metadata_list):
+            metadata[vector_id] = {**meta, "id": vector_id}
+        if texts is not None:
+            self.chunk_texts.add(ids.tolist(), texts)
+            self.lexical.add(ids.tolist(), texts, [meta.get("name", "") for meta in metadata_list])
+        self.next_id += len(vectors)
         logger.info(f"Added {len(vectors)} vectors to index")
+        return ids.tolist()
+
+    def remove_ids(self, ids):
+        """
+        Remove vectors (and their metadata) by ID.
+
+        Args:
+            ids (Iterable[int]): Vector IDs to remove
+
+        Returns:
+            int: Number of vectors removed
+        """
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        id_array = np.array(ids, dtype='int64')
+        if self.index is None:
+            before = self.ntotal
+            self._pending = [
+                (vectors[keep], pending_ids[keep])
+                for vectors, pending_ids in self._pending
+                for keep in [~np.isin(pending_ids, id_array)]
+            ]
+            removed = before - self.ntotal
+        else:
+            if not self.supports_removal:
+                raise RuntimeError(f"Index type '{self.index_type}' does not support removing vectors")
+            self._ensure_writable()
+            removed = self.index.remove_ids(id_array)
+        metadata = self._mutable_metadata()
+        for vector_id in ids:
+            metadata.pop(vector_id, None)
+        self.lexical.remove(ids)
+        self.chunk_texts.remove(ids)
+        logger.info(f"Removed {removed} vectors from index")
+        return removed
+
+    def _ensure_writable(self):
+        """Memory-mapped indexes are read-only views of the file; reload into RAM before changing them."""
+        if self.mmapped:
+            self.index = faiss.read_index(self.index_path)
+            self.mmapped = False
+
+    def _mutable_metadata(self) -> dict:
+        """Materialize loaded (memory-mapped, read-only) metadata into a dict before changing it."""
+        if not isinstance(self.metadata, dict):
+            self.metadata = dict(self.metadata.items())
+        return self.metadata
+
+    def build(self):
+        """Choose the index type for the buffered vectors, train it on a sample and add them."""
+        if self.index is not None:
+            return
+        if self._pending:
+            vectors = np.concatenate([v for v, _ in self._pending])
+            ids = np.concatenate([i for _, i in self._pending])
+        else:
+            vectors = np.zeros((0, self.dim), dtype='float32')
+            ids = np.zeros(0, dtype='int64')
+
+        self.index_type = resolve_index_type(self.requested_type, len(vectors))
+        factory = index_factory_string(self.index_type, self.dim, len(vectors))
+        index = self._new_index(factory)
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > self.train_sample:
+                # Fixed seed keeps rebuilds of the same corpus reproducible
+                rows = np.random.default_rng(0).choice(len(vectors), self.train_sample, replace=False)
+                sample = vectors[np.sort(rows)]
+            logger.info(f"Training '{factory}' index on {len(sample)} of {len(vectors)} vectors")
+            index.train(sample)
+        self._set_search_defaults(index)
+        index.add_with_ids(vectors, ids)
 
-    def search(self, query_vector, top_k=5):
+        self.index = index
+        self._pending = []
+        logger.info(f"Built '{self.index_type}' index with {index.ntotal} vectors")
+
+    def _new_index(self, factory: str):
+        # Always ID-mapped so vectors of a single file can be removed and replaced in place
+        return faiss.index_factory(self.dim, factory, getattr(faiss, METRICS[self.metric]))
+
+    def _prepare(self, vectors) -> np.ndarray:
+        """float32 matrix, L2-normalized for cosine indexes."""
+        vectors = np.array(vectors, dtype='float32')
+        if self.metric == "cosine":
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def to_score(self, raw: float) -> float:
+        """Map a raw FAISS result to a 0-1 similarity (higher is better)."""
+        if self.metric == "cosine":
+            return float(min(1.0, max(0.0, raw)))
+        return float(1.0 / (1.0 + max(0.0, raw)))
+
+    @staticmethod
+    def _set_search_defaults(index):
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(DEFAULT_NPROBE, ivf.nlist)
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = DEFAULT_EF_SEARCH
+
+    def _search_params(self, nprobe=None, ef_search=None):
+        """Per-call search parameters, so concurrent searches never share mutable knobs."""
+        inner = faiss.downcast_index(self.index.index)
+        if nprobe and faiss.try_extract_index_ivf(self.index) is not None:
+            params = faiss.SearchParametersIVF(nprobe=nprobe)
+            if isinstance(inner, faiss.IndexPreTransform):
+                params = faiss.SearchParametersPreTransform(index_params=params)
+            return params
+        if ef_search and isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=ef_search)
+        return None
+
+    def search(self, query_vector, top_k=5, nprobe=None, ef_search=None):
         """
         Search for nearest neighbors.
 
         Args:
             query_vector (List[float])
             top_k (int): Number of results
+            nprobe (int): IVF lists to visit (IVF index types only)
+            ef_search (int): HNSW search breadth (HNSW only)
 
         Returns:
-            List of (score, metadata) tuples
+            List of (score, metadata) tuples, score in 0-1 with higher meaning more similar
         """
-        query = np.array([query_vector]).astype('float32')
-        distances, indices = self.index.search(query, top_k)
+        return self.search_batch([query_vector], top_k, nprobe=nprobe, ef_search=ef_search)[0]
 
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx < len(self.metadata):
-                results.append((dist, self.metadata[idx]))
+    def search_batch(self, query_vectors, top_k=5, nprobe=None, ef_search=None):
+        """
+        Search many queries with one vectorized FAISS call over the whole query matrix.
+
+        Returns:
+            One list of (score, metadata) tuples per query, in input order
+        """
+        self.build()
+        if len(query_vectors) == 0:
+            return []
+        queries = self._prepare(query_vectors)
+        distances, indices = self.index.search(queries, top_k, params=self._search_params(nprobe, ef_search))
 
+        # Only the top-k hits are materialized from the columnar metadata
+        results = []
+        for row_distances, row_indices in zip(distances, indices):
+            hits = []
+            for dist, idx in zip(row_distances, row_indices):
+                if idx < 0:
+                    continue
+                meta = self.metadata.get(int(idx))
+                if meta is not None:
+                    hits.append((self.to_score(dist), meta))
+            results.append(hits)
         return results
 
     def save(self):
+        # Write to temp files and rename so readers never observe a half-written index
         try:
-            faiss.write_index(self.index, self.index_path)
-            with open(self.metadata_path, "wb") as f:
-                pickle.dump(self.metadata, f)
+            self.build()
+            tmp_info_path = f"{self.info_path}.tmp"
+            tmp_index_path = f"{self.index_path}.tmp"
+            tmp_metadata_path = f"{self.metadata_path}.tmp"
+            tmp_lexical_path = f"{self.lexical_path}.tmp"
+            with open(tmp_info_path, "w", encoding="utf-8") as f:
+                json.dump({"index_type": self.index_type, "requested_type": self.requested_type,
+                           "metric": self.metric, "dim": self.dim}, f)
+            faiss.write_index(self.index, tmp_index_path)
+            write_metadata(tmp_metadata_path, self.metadata)
+            self.lexical.save(tmp_lexical_path)
+            self.chunk_texts.save()
+            os.replace(tmp_info_path, self.info_path)
+            os.replace(tmp_metadata_path, self.metadata_path)
+            os.replace(tmp_lexical_path, self.lexical_path)
+            os.replace(tmp_index_path, self.index_path)
             logger.info(f"Index and metadata saved to disk")
         except Exception as e:
             logger.error(f"Failed to save index or metadata: {e}")
             raise RuntimeError(f"Saving index failed: {e}") from e
 
-    def load(self):
+    def _load_chunk_texts(self) -> ChunkTextStore:
+        """The saved chunk text store; empty (callers fall back to reading source files) if unusable."""
+        if os.path.exists(self.chunk_store_path):
+            try:
+                return ChunkTextStore.load(self.chunk_store_path)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable chunk text store {self.chunk_store_path}: {e}")
+        return ChunkTextStore(self.chunk_store_path)
+
+    def load(self, mmap=False):
+        """
+        Load the index and metadata from disk.
+
+        Args:
+            mmap (bool): Memory-map the vector data read-only instead of copying it into RAM,
+                so every process serving this index shares one copy through the page cache
+
+        Returns:
+            bool: True if loaded
+        """
         try:
-            self.index = faiss.read_index(self.index_path)
-            with open(self.metadata_path, "rb") as f:
-                self.metadata = pickle.load(f)
-            logger.info(f"Loaded index with {len(self.metadata)} items")
+            index = None
+            if mmap:
+                try:
+                    index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+                except RuntimeError as e:
+                    logger.warning(f"Cannot memory-map {self.index_path}, reading it into RAM: {e}")
+            mmapped = index is not None
+            if index is None:
+                index = faiss.read_index(self.index_path)
+            metadata = ColumnarMetadata(self.metadata_path)
+            info = {}
+            if os.path.exists(self.info_path):
+                with open(self.info_path, "r", encoding="utf-8") as f:
+                    info = json.load(f)
+            # Indexes built before lexical search have none; hybrid search then stays semantic
+            lexical = LexicalIndex.load(self.lexical_path) if os.path.exists(self.lexical_path) else LexicalIndex()
+            chunk_texts = self._load_chunk_texts()
+            self.index = index
+            self.index_type = info.get("index_type", "flat")
+            self.built_requested_type = info.get("requested_type", self.index_type)
+            self.metric = info.get("metric", "l2")  # Indexes predating the setting are L2
+            self.metadata = metadata
+            self.lexical = lexical
+            self.chunk_texts = chunk_texts
+            self.next_id = metadata.max_id() + 1
+            self.mmapped = mmapped
+            self._pending = []
+            logger.info(f"Loaded '{self.index_type}' ({self.metric}) index with {len(self.metadata)} items"
+                        f"{' (memory-mapped)' if mmapped else ''}")
             return True
         except Exception as e:
             logger.error(f"Failed to load index or metadata: {e}")
-            self.index = faiss.IndexFlatL2(self.dim)
-            self.metadata = []
+            self.reset()
             return False
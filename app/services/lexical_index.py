@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+NAME_BOOST = 3  # A chunk's own name counts this many times, so definitions outrank mere uses
+RRF_K = 60  # Reciprocal-rank fusion damping constant
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_WORD = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# A query that is a single identifier (snake_case, camelCase, dotted or :: path) or has backticked ones
+_IDENTIFIER_QUERY = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*((\.|::)[A-Za-z_][A-Za-z0-9_]*)*$")
+_BACKTICKED = re.compile(r"`([^`]+)`")
+
+
+def lexical_path_for(index_path: str) -> str:
+    """Lexical index file stored next to a FAISS index (faiss.index -> faiss.lexical.npz)."""
+    return f"{os.path.splitext(index_path)[0]}.lexical.npz"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased identifier tokens: each identifier as a whole plus its snake_case /
+    camelCase parts, so `compute_repo_hash` matches both itself and "repo hash".
+    """
+    tokens = []
+    for identifier in _IDENTIFIER.findall(text):
+        whole = identifier.lower()
+        if len(whole) > 1:
+            tokens.append(whole)
+        parts = [word.lower() for piece in identifier.split("_") for word in _WORD.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) > 1)
+    return tokens
+
+
+def identifier_terms(query: str) -> Optional[List[str]]:
+    """
+    Terms for the lexical-only fast path if the query names identifiers, else None.
+
+    Matches a bare identifier that is clearly code (contains "_", ".", "::" or inner
+    capitals) or any query with `backticked` identifiers.
+    """
+    backticked = _BACKTICKED.findall(query)
+    candidates = backticked or [query.strip()]
+    terms = []
+    for candidate in candidates:
+        candidate = candidate.strip().rstrip("()")
+        if not _IDENTIFIER_QUERY.match(candidate):
+            return None
+        code_like = any(c in candidate for c in "_.:") or candidate[1:] != candidate[1:].lower()
+        if not backticked and not code_like:
+            return None
+        for part in re.split(r"\.|::", candidate):
+            terms.append(part.lower())
+    return terms or None
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[float, int]]:
+    """
+    Fuse ranked ID lists with RRF. Scores are scaled to 0-1, where 1 means ranked first
+    by every list.
+
+    Returns:
+        (score, id) pairs, best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    best = len(rankings) / (k + 1)
+    return sorted(((score / best, doc_id) for doc_id, score in fused.items()), key=lambda r: -r[0])
+
+
+class LexicalIndex:
+    """
+    BM25 index over chunk identifiers and tokens.
+
+    Stored as a forward index (per-chunk term IDs and frequencies) in one .npz file;
+    the inverted postings used for scoring are derived from it with a single sort when
+    first searched, and rebuilt lazily after chunks are added or removed.
+    """
+
+    def __init__(self):
+        self.terms: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        # Base columns (as loaded / last compacted)
+        self._doc_ids = np.zeros(0, dtype=np.int64)
+        self._doc_offsets = np.zeros(1, dtype=np.int64)
+        self._term_ids = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        # Changes since then
+        self._added: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._removed = set()
+        self._postings = None
+
+    def __len__(self) -> int:
+        removed = int(np.isin(self._doc_ids, list(self._removed)).sum()) if self._removed else 0
+        return len(self._doc_ids) - removed + len(self._added)
+
+    def add(self, ids: Sequence[int], texts: Sequence[str], names: Sequence[str] = None):
+        """Index chunk texts under their vector IDs; a chunk's name is boosted by NAME_BOOST."""
+        names = names or [""] * len(ids)
+        for doc_id, text, name in zip(ids, texts, names):
+            counts = Counter(tokenize(text))
+            for token in tokenize(name or ""):
+                counts[token] += NAME_BOOST
+            term_ids = np.array([self._term_id(t) for t in counts], dtype=np.int32)
+            self._added[int(doc_id)] = (term_ids, np.array(list(counts.values()), dtype=np.float32))
+            self._removed.discard(int(doc_id))
+        self._postings = None
+
+    def remove(self, ids: Iterable[int]):
+        for doc_id in ids:
+            doc_id = int(doc_id)
+            if self._added.pop(doc_id, None) is None:
+                self._removed.add(doc_id)
+        self._postings = None
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            term_id = self.vocab[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def _columns(self):
+        """Current forward index as (doc_ids, doc_offsets, term_ids, tfs), base and changes merged."""
+        doc_ids, offsets, term_ids, tfs = self._doc_ids, self._doc_offsets, self._term_ids, self._tfs
+        if self._removed:
+            keep = ~np.isin(doc_ids, np.fromiter(self._removed, dtype=np.int64))
+            lengths = np.diff(offsets)
+            entry_keep = np.repeat(keep, lengths)
+            doc_ids, term_ids, tfs = doc_ids[keep], term_ids[entry_keep], tfs[entry_keep]
+            offsets = np.concatenate([[0], np.cumsum(lengths[keep])])
+        if self._added:
+            added = sorted(self._added.items())
+            doc_ids = np.concatenate([doc_ids, np.array([d for d, _ in added], dtype=np.int64)])
+            term_ids = np.concatenate([term_ids] + [t for _, (t, _) in added])
+            tfs = np.concatenate([tfs] + [f for _, (_, f) in added])
+            lengths = np.concatenate([np.diff(offsets), [len(t) for _, (t, _) in added]])
+            offsets = np.concatenate([[0], np.cumsum(lengths)])
+        return doc_ids, offsets.astype(np.int64), term_ids.astype(np.int32), tfs.astype(np.float32)
+
+    def _compact(self):
+        self._doc_ids, self._doc_offsets, self._term_ids, self._tfs = self._columns()
+        self._added.clear()
+        self._removed.clear()
+
+    def _build_postings(self):
+        self._compact()
+        lengths = np.diff(self._doc_offsets)
+        doc_index = np.repeat(np.arange(len(self._doc_ids)), lengths)
+        order = np.argsort(self._term_ids, kind="stable")
+        term_offsets = np.searchsorted(self._term_ids[order], np.arange(len(self.terms) + 1))
+        doc_len = np.bincount(doc_index, weights=self._tfs, minlength=len(self._doc_ids))
+        self._postings = (term_offsets, doc_index[order], self._tfs[order], doc_len)
+
+    def search(self, tokens: Sequence[str], top_k: int = 10) -> List[Tuple[float, int]]:
+        """
+        BM25-rank chunks for the query tokens.
+
+        Returns:
+            (bm25 score, chunk ID) pairs, best first
+        """
+        term_ids = [self.vocab[t] for t in dict.fromkeys(tokens) if t in self.vocab]
+        if not term_ids:
+            return []
+        if self._postings is None:
+            self._build_postings()
+        term_offsets, post_docs, post_tfs, doc_len = self._postings
+        num_docs = len(self._doc_ids)
+        if num_docs == 0:
+            return []
+        avg_len = float(doc_len.mean()) or 1.0
+
+        scores = np.zeros(num_docs, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = term_offsets[term_id], term_offsets[term_id + 1]
+            if start == end:
+                continue
+            docs, tf = post_docs[start:end], post_tfs[start:end]
+            df = end - start
+            idf = math.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * doc_len[docs] / avg_len)
+            scores[docs] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(float(scores[i]), int(self._doc_ids[i])) for i in matched]
+
+    def save(self, path: str):
+        doc_ids, offsets, term_ids, tfs = self._columns()
+        with open(path, "wb") as f:
+            np.savez(f, doc_ids=doc_ids, doc_offsets=offsets, term_ids=term_ids, tfs=tfs,
+                     terms=np.frombuffer(json.dumps(self.terms).encode("utf-8"), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        index = cls()
+        with np.load(path, allow_pickle=False) as data:
+            index.terms = json.loads(data["terms"].tobytes().decode("utf-8"))
+            index._doc_ids = data["doc_ids"]
+            index._doc_offsets = data["doc_offsets"]
+            index._term_ids = data["term_ids"]
+            index._tfs = data["tfs"]
+        index.vocab = {term: i for i, term in enumerate(index.terms)}
+        return index
@@ -1,66 +1,110 @@
 # app/services/llm_huggingface.py (simple, fast version)
 
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+import threading
+from typing import Iterable, Iterator
 from app.core.config import settings
 from app.core.logger import logger
-import torch
+from app.utils.lazy_import import lazy_module
+
+# Imported when the model is loaded (warm-up or first chat), not when the app starts
+torch = lazy_module("torch")
+transformers = lazy_module("transformers")
+
+END_MARKER = "[END_OF_ANSWER]"
+PROMPT_VERSION = 1  # Bump when build_prompt changes so cached answers are not reused
+STREAM_TOKEN_TIMEOUT = 120.0  # Seconds to wait for the next streamed token before giving up
+
+
+def _stop_on_event(event: threading.Event):
+    """StoppingCriteria that stops generate() once the streaming consumer is done (end marker seen or client gone)."""
+
+    class _StopOnEvent(transformers.StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            return event.is_set()
+
+    return _StopOnEvent()
+
+
+def until_end_marker(pieces: Iterable[str], marker: str = END_MARKER) -> Iterator[str]:
+    """
+    Pass streamed text through up to the end marker, which may be split across pieces.
+    A marker-length tail is held back until it is known not to start the marker.
+    """
+    buffer = ""
+    started = False
+    for piece in pieces:
+        buffer += piece
+        if not started:
+            buffer = buffer.lstrip()
+            started = bool(buffer)
+        if marker in buffer:
+            head = buffer.split(marker, 1)[0].rstrip()
+            if head:
+                yield head
+            return
+        keep = len(marker) - 1
+        if len(buffer) > keep:
+            yield buffer[:-keep]
+            buffer = buffer[-keep:]
+    if buffer.strip():
+        yield buffer.rstrip()
 
 class HuggingFaceChat:
     def __init__(self):
         print(f"LLM model name is: {settings.LLM_MODEL_NAME}")
-        model_name = settings.LLM_MODEL_NAME
+        self.model_name = settings.LLM_MODEL_NAME
+        self.loaded = False
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Load tokenizer, model and pipeline once; called by start-up warm-up or the first request."""
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self._load()
+                self.loaded = True
+
+    def _load(self):
+        model_name = self.model_name
         logger.info(f"Loading HuggingFace model: {model_name}")
 
         device = "mps" if torch.backends.mps.is_available() else "cpu"
         logger.info(f"Using device: {device} for HuggingFace model.")
 
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
         self.tokenizer.pad_token = self.tokenizer.eos_token
 
         use_device_map = False
         try:
             from accelerate import Accelerator
-            self.model = AutoModelForCausalLM.from_pretrained(
+            self.model = transformers.AutoModelForCausalLM.from_pretrained(
                 model_name,
                 device_map="auto"
             )
             use_device_map = True
         except ImportError:
             logger.warning("Accelerate not installed. Falling back to basic loading without device_map.")
-            self.model = AutoModelForCausalLM.from_pretrained(model_name)
+            self.model = transformers.AutoModelForCausalLM.from_pretrained(model_name)
             self.model.to(device)
 
         pipeline_kwargs = {}
         if not use_device_map:
             pipeline_kwargs["device"] = device
 
-        self.pipe = pipeline(
+        self.pipe = transformers.pipeline(
             "text-generation",
             model=self.model,
             tokenizer=self.tokenizer,
             **pipeline_kwargs
         )
 
-    def chat(self, question: str, context: str, strict: bool = True) -> dict:
-        """
-        Generate a concise, developer-friendly, structured explanation for the given question + context.
-
-        Returns a dict:
-        {
-            "answer": <cleaned explanation>,
-            "tokens_used": <approx word count>
-        }
-        """
-
-        import re
-
+    def build_prompt(self, question: str, context: str) -> str:
         # configurable word bounds (fallback to defaults)
         TARGET_MIN_WORDS = getattr(settings, "LLM_MIN_WORDS", 200)
         TARGET_MAX_WORDS = getattr(settings, "LLM_MAX_WORDS", 300)
 
-        max_new_tokens = getattr(settings, "LLM_MAX_TOKENS", 600)
-
-        prompt = f"""You are CodeAtlas, an expert technical assistant for developers.
+        return f"""You are CodeAtlas, an expert technical assistant for developers.
 
             Answer every question in a **developer-friendly tone**:
             - concise, practical, no fluff
@@ -88,6 +132,25 @@ class HuggingFaceChat:
             Answer:
             """
 
+    @property
+    def cache_version(self) -> str:
+        """What shapes an answer besides question and context: model, prompt and decoding."""
+        return f"huggingface:{settings.LLM_MODEL_NAME}:prompt-v{PROMPT_VERSION}:{self._generation_kwargs()['max_new_tokens']}"
+
+    def count_tokens(self, text: str) -> int:
+        self.load()
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def context_token_limit(self, question: str) -> int:
+        """Tokens left for retrieved code once the prompt template, question and answer are accounted for."""
+        self.load()
+        window = getattr(self.model.config, "max_position_embeddings", None) or self.tokenizer.model_max_length
+        prompt = self.count_tokens(self.build_prompt(question, ""))
+        return max(0, window - prompt - self._generation_kwargs()["max_new_tokens"])
+
+    def _generation_kwargs(self) -> dict:
+        max_new_tokens = getattr(settings, "LLM_MAX_TOKENS", 600)
+
         gen_kwargs = {
             "max_new_tokens": max_new_tokens,
             "do_sample": False,
@@ -98,6 +161,24 @@ class HuggingFaceChat:
                 gen_kwargs["pad_token_id"] = self.tokenizer.eos_token_id
         except Exception:
             pass
+        return gen_kwargs
+
+    def chat(self, question: str, context: str, strict: bool = True) -> dict:
+        """
+        Generate a concise, developer-friendly, structured explanation for the given question + context.
+
+        Returns a dict:
+        {
+            "answer": <cleaned explanation>,
+            "tokens_used": <approx word count>
+        }
+        """
+
+        import re
+
+        self.load()
+        prompt = self.build_prompt(question, context)
+        gen_kwargs = self._generation_kwargs()
 
         logger.info("Calling HuggingFace model with max_new_tokens=%s", gen_kwargs["max_new_tokens"])
         result = self.pipe(prompt, **gen_kwargs)
@@ -116,17 +197,10 @@ class HuggingFaceChat:
         else:
             generated = re.sub(r"^.*Answer:\s*", "", generated, flags=re.DOTALL)
 
-        # ---- Step 3: Normalize formatting ----
-        text = generated.strip()
-        lines = [ln.lstrip() for ln in text.splitlines()]
-        text = "\n".join(lines)
-        text = re.sub(r"\n{3,}", "\n\n", text).strip()
-
-        # ---- Step 4: Enforce end marker if strict ----
-        if "[END_OF_ANSWER]" in text:
-            text = text.split("[END_OF_ANSWER]", 1)[0].strip()
-        elif strict:
+        # ---- Steps 3-4: Normalize formatting, cut at the end marker ----
+        if strict and END_MARKER not in generated:
             logger.warning("Strict mode enabled but marker not found; using truncated output.")
+        text = self.normalize_answer(generated)
 
         if not text:
             fallback = "I couldn't produce an explanation. Please try again with a shorter context."
@@ -135,16 +209,42 @@ class HuggingFaceChat:
 
         return text
 
+    @staticmethod
+    def normalize_answer(text: str) -> str:
+        """
+        The formatting chat() gives generated text: lines left-stripped, runs of blank
+        lines collapsed, cut at the end marker. Streamed answers get it before caching.
+        """
+        import re
 
+        lines = [ln.lstrip() for ln in text.strip().splitlines()]
+        text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+        return text.split(END_MARKER, 1)[0].strip()
 
+    def stream_chat(self, question: str, context: str) -> Iterator[str]:
+        """
+        Same prompt as chat(), but yields answer text as the model generates it.
+        Generation runs in a background thread and stops at the end marker or when
+        the consumer stops iterating.
+        """
+        self.load()
+        prompt = self.build_prompt(question, context)
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        streamer = transformers.TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=STREAM_TOKEN_TIMEOUT
+        )
+        stop = threading.Event()
+        gen_kwargs = {
+            **self._generation_kwargs(),
+            **inputs,
+            "streamer": streamer,
+            "stopping_criteria": transformers.StoppingCriteriaList([_stop_on_event(stop)]),
+        }
 
-
-
-
-
-
-
-
-
-
-
+        logger.info("Streaming HuggingFace generation with max_new_tokens=%s", gen_kwargs["max_new_tokens"])
+        thread = threading.Thread(target=self.model.generate, kwargs=gen_kwargs, daemon=True)
+        thread.start()
+        try:
+            yield from until_end_marker(streamer)
+        finally:
+            stop.set()
@@ -1,25 +1,73 @@
 # app/llms/llm_openai.py
 
-import openai
+from typing import Iterator
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.context_builder import approx_token_count
+from app.utils.lazy_import import lazy_module
+
+openai = lazy_module("openai")
+tiktoken = lazy_module("tiktoken", optional=True)  # None: token counts are estimated from characters instead
+
+PROMPT_VERSION = 1  # Bump when _messages changes so cached answers are not reused
 
 class OpenAIChat:
     def __init__(self):
         openai.api_key = settings.OPENAI_API_KEY
         self.model_name = settings.DEFAULT_LLM_MODEL
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(self.model_name)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
 
-    def chat(self, question: str, context: str) -> str:
-        logger.info(f"Calling OpenAI with model={self.model_name}")
-        messages = [
+    @property
+    def cache_version(self) -> str:
+        return f"openai:{self.model_name}:prompt-v{PROMPT_VERSION}:t{settings.OPENAI_TEMPERATURE}"
+
+    @property
+    def deterministic(self) -> bool:
+        """Whether a question and context always get the same answer, so it may be cached."""
+        return settings.OPENAI_TEMPERATURE == 0
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            return approx_token_count(text)
+        return len(self._encoding.encode(text))
+
+    def _messages(self, question: str, context: str) -> list:
+        return [
             {"role": "system", "content": "You are a helpful code assistant."},
             {"role": "user", "content": f"Context:\n{context}\n\nQuestion:\n{question}"}
         ]
 
+    def chat(self, question: str, context: str) -> str:
+        logger.info(f"Calling OpenAI with model={self.model_name}")
+        response = openai.ChatCompletion.create(
+            model=self.model_name,
+            messages=self._messages(question, context),
+            max_tokens=512,
+            temperature=settings.OPENAI_TEMPERATURE
+        )
+        return self.normalize_answer(response.choices[0].message.content)
+
+    @staticmethod
+    def normalize_answer(text: str) -> str:
+        """The formatting chat() gives a completion; streamed answers get it before caching."""
+        return text.strip()
+
+    def stream_chat(self, question: str, context: str) -> Iterator[str]:
+        """Yield answer text deltas as OpenAI streams them."""
+        logger.info(f"Streaming OpenAI completion with model={self.model_name}")
         response = openai.ChatCompletion.create(
             model=self.model_name,
-            messages=messages,
+            messages=self._messages(question, context),
             max_tokens=512,
-            temperature=0.7
+            temperature=settings.OPENAI_TEMPERATURE,
+            stream=True,
         )
-        return response.choices[0].message.content.strip()
+        for chunk in response:
+            token = chunk["choices"][0].get("delta", {}).get("content")
+            if token:
+                yield token
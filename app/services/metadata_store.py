@@ -0,0 +1,165 @@
+import os
+import json
+import struct
+from collections.abc import Mapping
+from typing import Dict, Iterator
+import numpy as np
+
+# File layout: MAGIC | uint64 header length | JSON header | 64-byte aligned column blobs.
+# A single file so saves are one atomic rename and readers can mmap each column in place.
+MAGIC = b"CATLMETA"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Common chunk types get stable enum codes; any other type is appended to the file's type table
+DEFAULT_TYPES = ["function", "class", "overview", "generic", "unknown"]
+
+COLUMN_DTYPES = {
+    "ids": "<i8",
+    "path_idx": "<i4",
+    "start_line": "<i4",
+    "end_line": "<i4",
+    "type": "u1",
+    "name_offsets": "<i8",
+    "names": "u1",
+}
+
+
+def write_metadata(path: str, metadata: Mapping):
+    """
+    Write chunk metadata (vector ID -> dict) in the columnar format.
+
+    Paths are interned into a table, line numbers stored as int32 and types as uint8 codes.
+    Only path, name, type, start_line and end_line are persisted.
+    """
+    ids = np.array(sorted(metadata), dtype=np.int64)
+    count = len(ids)
+    path_table: Dict[str, int] = {}
+    type_table: Dict[str, int] = {name: code for code, name in enumerate(DEFAULT_TYPES)}
+
+    path_idx = np.empty(count, dtype=np.int32)
+    start_line = np.empty(count, dtype=np.int32)
+    end_line = np.empty(count, dtype=np.int32)
+    types = np.empty(count, dtype=np.uint8)
+    name_offsets = np.empty(count + 1, dtype=np.int64)
+    names = bytearray()
+
+    name_offsets[0] = 0
+    for row, vector_id in enumerate(ids.tolist()):
+        meta = metadata[vector_id]
+        path_idx[row] = path_table.setdefault(str(meta.get("path", "")), len(path_table))
+        chunk_type = str(meta.get("type", "unknown"))
+        if chunk_type not in type_table:
+            if len(type_table) > 255:
+                raise ValueError("Too many distinct chunk types for a uint8 column")
+            type_table[chunk_type] = len(type_table)
+        types[row] = type_table[chunk_type]
+        start_line[row] = meta.get("start_line", 0)
+        end_line[row] = meta.get("end_line", 0)
+        names += str(meta.get("name", "")).encode("utf-8")
+        name_offsets[row + 1] = len(names)
+
+    arrays = {
+        "ids": ids,
+        "path_idx": path_idx,
+        "start_line": start_line,
+        "end_line": end_line,
+        "type": types,
+        "name_offsets": name_offsets,
+        "names": np.frombuffer(bytes(names), dtype=np.uint8),
+    }
+
+    # Two passes: the header size depends on the offsets, which depend on the header size
+    columns = {}
+    header = b""
+    for _ in range(2):
+        offset = _align(len(MAGIC) + 8 + len(header))
+        for name, array in arrays.items():
+            columns[name] = {"dtype": COLUMN_DTYPES[name], "offset": offset, "length": len(array)}
+            offset = _align(offset + array.nbytes)
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "count": count,
+            "paths": list(path_table),
+            "types": list(type_table),
+            "columns": columns,
+        }).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b"\0" * (columns[name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(array, dtype=COLUMN_DTYPES[name]).tobytes())
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class ColumnarMetadata(Mapping):
+    """
+    Read-only, memory-mapped view of a metadata file: vector ID -> metadata dict.
+
+    Columns are mapped read-only, so every process serving the same index shares the
+    same page-cache pages. Dicts are only materialized for the IDs actually looked up.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a CodeAtlas metadata file")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported metadata format version {header['version']}")
+
+        self.paths = header["paths"]
+        self.types = header["types"]
+        self._columns = {}
+        for name, spec in header["columns"].items():
+            if spec["length"] == 0:
+                self._columns[name] = np.empty(0, dtype=spec["dtype"])
+            else:
+                self._columns[name] = np.memmap(
+                    path, dtype=spec["dtype"], mode="r", offset=spec["offset"], shape=(spec["length"],)
+                )
+        self._ids = self._columns["ids"]
+
+    def _row(self, vector_id) -> int:
+        row = int(np.searchsorted(self._ids, vector_id))
+        if row >= len(self._ids) or self._ids[row] != vector_id:
+            return -1
+        return row
+
+    def __getitem__(self, vector_id) -> dict:
+        row = self._row(vector_id)
+        if row < 0:
+            raise KeyError(vector_id)
+        c = self._columns
+        name_start, name_end = c["name_offsets"][row], c["name_offsets"][row + 1]
+        return {
+            "id": int(self._ids[row]),
+            "path": self.paths[c["path_idx"][row]],
+            "name": bytes(c["names"][name_start:name_end]).decode("utf-8"),
+            "type": self.types[c["type"][row]],
+            "start_line": int(c["start_line"][row]),
+            "end_line": int(c["end_line"][row]),
+        }
+
+    def __contains__(self, vector_id) -> bool:
+        return self._row(vector_id) >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def max_id(self) -> int:
+        return int(self._ids[-1]) if len(self._ids) else -1
+
+    def nbytes(self) -> int:
+        return os.path.getsize(self.path)
@@ -0,0 +1,292 @@
+import queue
+import threading
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Iterable, List, Set, Tuple
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.chunker import extract_file_records, init_worker
+from app.services.embedder import Embedder
+from app.services.embedding_cache import ChunkEmbeddingCache
+from app.services.indexer import CodeIndexer
+
+_DONE = object()  # End-of-stream marker passed between stages
+
+PROGRESS_LOG_INTERVAL = 10.0  # Seconds between throughput log lines
+
+
+@dataclass
+class PipelineStats:
+    files: int = 0
+    chunks: int = 0
+    cached_chunks: int = 0  # Chunks whose vectors came from the embedding cache
+    batches: int = 0
+    failed_files: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class PipelineResult:
+    ids: Dict[Hashable, List[int]]  # File key -> vector IDs of its chunks
+    hashes: Dict[Hashable, str]  # File key -> sha256 of the bytes that were chunked (None if unreadable)
+    failed: Set[Hashable]  # File keys whose chunks could not be embedded (nothing left in the index)
+    stats: PipelineStats
+
+
+def _ordered_map(executor, fn, items, window: int):
+    """
+    Like executor.map over (file_path, language, key) items, with at most `window` tasks in
+    flight. Yields (item, result) in input order.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(fn, item[0], item[1])))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+class IndexingPipeline:
+    """
+    Streaming chunk -> embed -> index pipeline.
+
+    Chunker workers feed a bounded queue of per-file chunks. A single embedding stage
+    packs chunks from many files into fixed-size, length-sorted batches, and the index
+    writer (the calling thread) appends each embedded batch as soon as it arrives.
+
+    With `workers > 1` chunk extraction runs in a process pool instead of threads, so
+    AST/tree-sitter parsing uses every core. Results are consumed in input order either
+    way, which keeps vector IDs (and therefore the index) reproducible.
+
+    With an `embedding_cache`, chunks whose text was embedded before (by this or any
+    other repo) skip the model and go straight to the writer.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        indexer: CodeIndexer,
+        chunk_workers: int = None,
+        workers: int = None,
+        file_queue_size: int = None,
+        batch_queue_size: int = None,
+        batch_size: int = None,
+        sort_window: int = None,
+        embedding_cache: ChunkEmbeddingCache = None,
+        on_progress: Callable[[PipelineStats], None] = None,
+    ):
+        self.embedder = embedder
+        self.indexer = indexer
+        self.chunk_workers = chunk_workers or settings.PIPELINE_CHUNK_WORKERS
+        self.workers = settings.CHUNK_PROCESS_WORKERS if workers is None else workers
+        self.file_queue_size = file_queue_size or settings.PIPELINE_FILE_QUEUE_SIZE
+        self.batch_queue_size = batch_queue_size or settings.PIPELINE_BATCH_QUEUE_SIZE
+        self.batch_size = batch_size or settings.EMBED_BATCH_SIZE
+        self.sort_window = sort_window or settings.EMBED_SORT_WINDOW
+        self.embedding_cache = embedding_cache
+        self.on_progress = on_progress  # Called by the writer after every file and batch
+
+    def run(self, files: Iterable[Tuple[str, str, Hashable]]) -> PipelineResult:
+        """
+        Index a stream of files.
+
+        Args:
+            files: (file_path, language, key) tuples; `key` identifies the file in the result
+
+        Returns:
+            PipelineResult with the vector IDs added per file key
+        """
+        self._stop = threading.Event()
+        self._errors = []
+        self._cached_chunks = 0
+        file_queue = queue.Queue(maxsize=self.file_queue_size)
+        batch_queue = queue.Queue(maxsize=self.batch_queue_size)
+
+        start = time.perf_counter()
+        stages = [
+            threading.Thread(target=self._guard, args=(self._chunk_stage, files, file_queue),
+                             name="codeatlas-chunk-stage", daemon=True),
+            threading.Thread(target=self._guard, args=(self._embed_stage, file_queue, batch_queue),
+                             name="codeatlas-embed-stage", daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        try:
+            result = self._write_stage(batch_queue, start)
+        finally:
+            self._stop.set()
+            for stage in stages:
+                stage.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        result.stats.seconds = time.perf_counter() - start
+        result.stats.cached_chunks = self._cached_chunks
+        logger.info(
+            f"Pipeline finished: {result.stats.files} files, {result.stats.chunks} chunks "
+            f"({result.stats.cached_chunks} from cache) in {result.stats.batches} batches, {result.stats.seconds:.1f}s "
+            f"({result.stats.chunks_per_sec:.1f} chunks/sec)"
+        )
+        return result
+
+    # ---- Queue helpers (stop-aware so a failed stage never deadlocks the others) ----
+
+    def _guard(self, target, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            logger.exception(f"Pipeline stage {target.__name__} failed: {e}")
+            self._errors.append(e)
+            self._stop.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    # ---- Stages ----
+
+    def _chunk_executor(self):
+        if self.workers > 1:
+            # spawn, not fork: the parent already runs threads (and possibly torch)
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+            )
+        return ThreadPoolExecutor(max_workers=self.chunk_workers, thread_name_prefix="codeatlas-chunk")
+
+    def _chunk_stage(self, files, file_queue: queue.Queue):
+        with self._chunk_executor() as executor:
+            # Each file is read once by the worker; its hash travels with the chunks. (With spawn,
+            # every pool process re-imports the parent's __main__ and its imports before starting)
+            for (file_path, _, key), (sha256, records) in _ordered_map(executor, extract_file_records, files,
+                                                                       window=self.file_queue_size):
+                if not self._put(file_queue, (key, file_path, sha256, records)):
+                    return
+        self._put(file_queue, _DONE)
+
+    def _embed_stage(self, file_queue: queue.Queue, batch_queue: queue.Queue):
+        pool = []  # (file key, metadata, text) waiting to be batched
+        window = self.batch_size * self.sort_window
+
+        while True:
+            record = self._get(file_queue)
+            if record is _DONE:
+                break
+            key, file_path, sha256, records = record
+            if not self._put(batch_queue, ("file", key, sha256)):
+                return
+            items = [
+                (key, {"path": file_path, "name": name, "type": chunk_type,
+                       "start_line": start_line, "end_line": end_line}, code)
+                for code, chunk_type, name, start_line, end_line in records
+            ]
+            if self.embedding_cache is not None and items:
+                cached = self.embedding_cache.get_many(self.embedder.model_key, [text for _, _, text in items])
+                hits = [(item, vector) for item, vector in zip(items, cached) if vector is not None]
+                if hits:
+                    self._cached_chunks += len(hits)
+                    if not self._put(batch_queue, ("batch", [item for item, _ in hits], [v for _, v in hits])):
+                        return
+                items = [item for item, vector in zip(items, cached) if vector is None]
+            pool.extend(items)
+            if len(pool) >= window and not self._flush(pool, batch_queue, final=False):
+                return
+
+        if self._stop.is_set() or not self._flush(pool, batch_queue, final=True):
+            return
+        self._put(batch_queue, _DONE)
+
+    def _flush(self, pool: list, batch_queue: queue.Queue, final: bool) -> bool:
+        """Embed full batches from the pool (all of it if final), shortest texts first."""
+        pool.sort(key=lambda item: len(item[2]))  # Stable, so batching stays deterministic
+        cut = len(pool) if final else len(pool) - len(pool) % self.batch_size
+        ready = pool[:cut]
+        del pool[:cut]
+
+        for i in range(0, len(ready), self.batch_size):
+            batch = ready[i:i + self.batch_size]
+            try:
+                texts = [text for _, _, text in batch]
+                vectors = self.embedder.embed(texts, batch_size=len(batch))
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(self.embedder.model_key, texts, vectors)
+                message = ("batch", batch, vectors)
+            except Exception as e:
+                keys = {key for key, _, _ in batch}
+                logger.warning(f"Skipping {len(keys)} files due to embedding error: {e}")
+                message = ("failed", keys)
+            if not self._put(batch_queue, message):
+                return False
+        return True
+
+    def _write_stage(self, batch_queue: queue.Queue, start: float) -> PipelineResult:
+        ids: Dict[Hashable, List[int]] = {}
+        hashes: Dict[Hashable, str] = {}
+        failed: Set[Hashable] = set()
+        stats = PipelineStats()
+        last_log = start
+
+        while True:
+            message = self._get(batch_queue)
+            if message is _DONE:
+                break
+            kind = message[0]
+            if kind == "file":
+                ids[message[1]] = []
+                hashes[message[1]] = message[2]
+                stats.files += 1
+            elif kind == "failed":
+                failed.update(message[1])
+            else:
+                _, batch, vectors = message
+                new_ids = self.indexer.add_embeddings(
+                    vectors, [meta for _, meta, _ in batch], texts=[text for _, _, text in batch]
+                )
+                for (key, _, _), vector_id in zip(batch, new_ids):
+                    ids[key].append(vector_id)
+                stats.chunks += len(batch)
+                stats.batches += 1
+
+                now = time.perf_counter()
+                if now - last_log >= PROGRESS_LOG_INTERVAL:
+                    logger.info(f"Pipeline progress: {stats.files} files, {stats.chunks} chunks "
+                                f"({stats.chunks / (now - start):.1f} chunks/sec)")
+                    last_log = now
+            if self.on_progress is not None:
+                self.on_progress(stats)
+
+        if failed:
+            # Drop partially indexed files so the caller can retry them as a whole
+            self.indexer.remove_ids([vector_id for key in failed for vector_id in ids.get(key, [])])
+            for key in failed:
+                ids.pop(key, None)
+            stats.failed_files = len(failed)
+
+        for vector_ids in ids.values():
+            vector_ids.sort()
+        return PipelineResult(ids=ids, hashes=hashes, failed=failed, stats=stats)
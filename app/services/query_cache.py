@@ -0,0 +1,114 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from app.core.logger import logger
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: surrounding and repeated whitespace collapsed."""
+    return " ".join(query.split())
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU cache of query embeddings keyed by (model, normalized query).
+
+    With `persist_path` set, entries are loaded from an .npz file on start-up and
+    written back by `save()`, so popular queries stay warm across restarts.
+    """
+
+    def __init__(self, max_size: int, persist_path: Optional[str] = None):
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if persist_path and os.path.exists(persist_path):
+            self.load()
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        key = (model, normalize_query(query))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector.tolist()
+
+    def put(self, model: str, query: str, vector):
+        if self.max_size <= 0:
+            return
+        key = (model, normalize_query(query))
+        with self._lock:
+            self._entries[key] = np.asarray(vector, dtype="float32")
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def save(self):
+        """Write entries (oldest first) to persist_path atomically."""
+        if not self.persist_path:
+            return
+        with self._lock:
+            items = list(self._entries.items())
+        # Vectors of different models may differ in dimension, so store them flat with lengths
+        models = np.array([model for (model, _), _ in items], dtype=str)
+        queries = np.array([query for (_, query), _ in items], dtype=str)
+        lengths = np.array([len(vector) for _, vector in items], dtype=np.int64)
+        vectors = np.concatenate([vector for _, vector in items]) if items else np.zeros(0, dtype="float32")
+
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, models=models, queries=queries, lengths=lengths, vectors=vectors)
+            os.replace(tmp_path, self.persist_path)
+            logger.info(f"Saved {len(items)} cached query embeddings to {self.persist_path}")
+        except OSError as e:
+            logger.warning(f"Could not save query embedding cache to {self.persist_path}: {e}")
+
+    def load(self):
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                offsets = np.concatenate([[0], np.cumsum(data["lengths"])])
+                vectors = data["vectors"]
+                entries = [
+                    ((str(model), str(query)), vectors[offsets[i]:offsets[i + 1]].copy())
+                    for i, (model, query) in enumerate(zip(data["models"], data["queries"]))
+                ]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable query embedding cache {self.persist_path}: {e}")
+            return
+        with self._lock:
+            for key, vector in entries[-self.max_size:] if self.max_size > 0 else []:
+                self._entries[key] = vector
+        logger.info(f"Loaded {len(self._entries)} cached query embeddings from {self.persist_path}")
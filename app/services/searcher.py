@@ -1,64 +1,339 @@
 # app/services/searcher.py (fixed score interpretation)
 
-import os
-import numpy as np
+import heapq
+import asyncio
+from itertools import islice
+from typing import Dict, List, Optional, Sequence, Tuple
 from app.core.logger import logger
+from app.core.config import settings
+from app.core.executors import AdmissionError, get_executor
 from app.services.indexer import CodeIndexer
+from app.services.lexical_index import identifier_terms, reciprocal_rank_fusion, tokenize
 from app.services.embedder import Embedder
-from app.core.config import settings
+from app.services.index_registry import IndexRegistry
+
+SEARCH_MODES = ("auto", "semantic", "hybrid", "lexical")
 
 class CodeSearcher:
-    def __init__(self, embedder: Embedder, index_path="faiss.index", metadata_path="metadata.pkl"):
+    def __init__(self, embedder: Embedder, registry: IndexRegistry):
+        """
+        Args:
+            embedder (Embedder): Shared query embedder
+            registry (IndexRegistry): Process-wide cache of loaded repo indexes
+        """
         self.embedder = embedder
-        self.vector_store_dir = settings.VECTOR_STORE_DIR
-        self.indexers = {}
-        self.indexer = CodeIndexer(dim=self.embedder.dim, index_path=index_path, metadata_path=metadata_path)
-        loaded = self.indexer.load()
-        if loaded:
-            repo_name = os.path.basename(os.path.dirname(index_path))
-            self.indexers[repo_name] = self.indexer
-            logger.info(f"Loaded index for repo '{repo_name}' with {len(self.indexer.metadata)} items")
-        else:
-            logger.warning("Started with an empty index. Run pipeline first.")
+        self.registry = registry
 
     def _get_indexer(self, repo_name: str) -> CodeIndexer:
-        if repo_name in self.indexers:
-            return self.indexers[repo_name]
-        repo_path = os.path.join(self.vector_store_dir, repo_name)
-        index_path = os.path.join(repo_path, "faiss.index")
-        metadata_path = os.path.join(repo_path, "metadata.pkl")
-        if not os.path.exists(index_path):
-            raise FileNotFoundError(f"Index file not found for repo '{repo_name}' at {index_path}")
-        indexer = CodeIndexer(dim=self.embedder.dim, index_path=index_path, metadata_path=metadata_path)
+        return self.registry.get(repo_name)
+
+    def index_version(self, repo_name: str):
+        """Version of the repo's index on disk; answers derived from an older one are stale."""
+        return self.registry.version(repo_name)
+
+    def _resolve_mode(self, mode: Optional[str]) -> str:
+        mode = mode or settings.SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode '{mode}'. Use one of {SEARCH_MODES}")
+        return mode
+
+    @staticmethod
+    def _wants_lexical(mode: str, query: str) -> bool:
+        """Lexical-only for explicit requests, and in "auto" for identifier-shaped queries."""
+        return mode == "lexical" or (mode == "auto" and identifier_terms(query) is not None)
+
+    def semantic_search(self, repo_name: str, query: str, top_k=10, nprobe=None, ef_search=None, min_score=None,
+                        mode=None, with_text=False):
+        """
+        Args:
+            nprobe (int): IVF lists to visit; overrides FAISS_NPROBE
+            ef_search (int): HNSW search breadth; overrides FAISS_EF_SEARCH
+            min_score (float): Drop vector hits scoring below this (0-1); overrides SEARCH_MIN_SCORE.
+                In hybrid mode a cutoff above 0 also leaves out chunks found only by BM25.
+                Does not apply to lexical-only results (mode "lexical", or "auto" identifier
+                lookups), which are filtered on their raw BM25 score by LEXICAL_MIN_SCORE
+            mode (str): One of SEARCH_MODES; overrides SEARCH_MODE
+            with_text (bool): Add each chunk's indexed source as metadata["text"] (None if not stored)
+
+        Returns:
+            List of (score, metadata) tuples, score in 0-1 with higher meaning more relevant.
+            Hybrid results are ordered by fused rank but keep their vector (or relative BM25) scores
+        """
+        if not isinstance(query, str) or not query.strip():
+            logger.warning("Query must be a non-empty string.")
+            return []
+        mode = self._resolve_mode(mode)
+        if self._wants_lexical(mode, query):
+            # Identifier lookups are answered from the inverted index without embedding the query
+            results = self.lexical_search(repo_name, query, top_k, with_text=with_text)
+            if results or mode == "lexical":
+                return results
         try:
-            loaded = indexer.load()
-            if not loaded:
-                logger.warning(f"No index found for repo '{repo_name}'. Run pipeline first.")
+            query_vec = self.embedder.embed_query(query)
         except Exception as e:
-            logger.error(f"Failed to load index for repo '{repo_name}': {e}")
-            raise RuntimeError(f"Index load failed for repo '{repo_name}'")
-        self.indexers[repo_name] = indexer
-        return indexer
+            logger.error(f"Query embedding failed for repo '{repo_name}': {e}")
+            return []
+        return self.search_embedding(repo_name, query, query_vec, top_k, nprobe, ef_search, min_score,
+                                     hybrid=mode != "semantic", with_text=with_text)
 
-    def semantic_search(self, repo_name: str, query: str, top_k=10):
+    async def semantic_search_async(self, repo_name: str, query: str, top_k=10, mode=None, with_text=False,
+                                    **tuning):
+        """
+        semantic_search with the query embedding and the FAISS search dispatched to their
+        own executors. Raises AdmissionError when either executor is saturated.
+        """
         if not isinstance(query, str) or not query.strip():
             logger.warning("Query must be a non-empty string.")
             return []
+        mode = self._resolve_mode(mode)
+        search = get_executor("search")
+        if self._wants_lexical(mode, query):
+            results = await search.run(self.lexical_search, repo_name, query, top_k, with_text=with_text)
+            if results or mode == "lexical":
+                return results
+        try:
+            query_vec = await get_executor("embedding").run(self.embedder.embed_query, query)
+        except AdmissionError:
+            raise
+        except Exception as e:
+            logger.error(f"Query embedding failed for repo '{repo_name}': {e}")
+            return []
+        return await search.run(self.search_embedding, repo_name, query, query_vec, top_k,
+                                hybrid=mode != "semantic", with_text=with_text, **tuning)
+
+    def search_embedding(self, repo_name: str, query: str, query_vec, top_k=10, nprobe=None, ef_search=None,
+                         min_score=None, hybrid=False, with_text=False):
+        """
+        Search a repo's index with an already embedded query (see semantic_search).
+
+        With `hybrid`, vector hits passing min_score are fused with BM25 hits from the repo's
+        lexical index (when it has one) by reciprocal rank.
+        """
         try:
-            query_vec = self.embedder.embed([query])[0]
             indexer = self._get_indexer(repo_name)
-            results = indexer.search(query_vec, top_k)
-            
-            # Log raw results for debugging
-            logger.info(f"Raw search returned {len(results)} chunks with L2 distances: {[f'{r[0]:.2f}' for r in results]}")
-            
-            # For L2 distance, lower is better. Scores of 20-30 are reasonable for code search
-            # Accept the best results without overly strict filtering
-            filtered_results = results[:10]  # Take top 5 results
+            hybrid = hybrid and len(indexer.lexical) > 0
+            results = indexer.search(
+                query_vec,
+                max(top_k, settings.HYBRID_CANDIDATES) if hybrid else top_k,
+                nprobe=nprobe or settings.FAISS_NPROBE,
+                ef_search=ef_search or settings.FAISS_EF_SEARCH,
+            )
             
+            logger.info(f"Raw search returned {len(results)} chunks with scores: {[f'{r[0]:.3f}' for r in results]}")
+
+            threshold = settings.SEARCH_MIN_SCORE if min_score is None else min_score
+            filtered_results = [r for r in results if r[0] >= threshold]
+            if hybrid:
+                filtered_results = self._fuse(indexer, query, filtered_results, top_k, with_lexical_only=threshold <= 0)
+            filtered_results = filtered_results[:10]
+            if with_text:
+                filtered_results = self._attach_texts(indexer, filtered_results)
+
             logger.info(f"Using top {len(filtered_results)} chunks for query: {query}")
             return filtered_results
             
         except Exception as e:
             logger.error(f"Search failed for repo '{repo_name}': {e}")
             return []
+
+    @staticmethod
+    def _fuse(indexer: CodeIndexer, query: str, vector_hits, top_k, with_lexical_only=True):
+        """
+        Order vector hits and BM25 hits by reciprocal-rank fusion. Each hit keeps its own
+        score: the vector score, or for a lexical-only hit its BM25 score relative to the
+        best one (as in lexical_search). Lexical-only hits have no vector score to check
+        against a min_score cutoff, so they are only added with `with_lexical_only`.
+        """
+        lexical_hits = indexer.lexical.search(tokenize(query), settings.HYBRID_CANDIDATES)
+        lexical_hits = [(score, vector_id) for score, vector_id in lexical_hits if score >= settings.LEXICAL_MIN_SCORE]
+        vector_scores = {meta["id"]: (score, meta) for score, meta in vector_hits}
+        lexical_scores = {vector_id: score / lexical_hits[0][0] for score, vector_id in lexical_hits}
+        rankings = [list(vector_scores), [vector_id for _, vector_id in lexical_hits]]
+        if not with_lexical_only:
+            rankings[1] = [vector_id for vector_id in rankings[1] if vector_id in vector_scores]
+        results = []
+        for _, vector_id in reciprocal_rank_fusion(rankings):
+            if vector_id in vector_scores:
+                results.append(vector_scores[vector_id])
+            else:
+                meta = indexer.metadata.get(vector_id)
+                if meta is None:
+                    continue
+                results.append((lexical_scores[vector_id], meta))
+            if len(results) == top_k:
+                break
+        return results
+
+    def lexical_search(self, repo_name: str, query: str, top_k=10, with_text=False, min_bm25=None):
+        """
+        BM25 search of a repo's lexical index, without embedding the query. Identifiers
+        named in the query (bare or `backticked`) are looked up as whole tokens.
+
+        Args:
+            min_bm25 (float): Drop hits whose raw BM25 score is below this; overrides
+                LEXICAL_MIN_SCORE. The returned scores are relative, so the best hit is
+                always 1.0 and a 0-1 min_score cannot tell strong from weak matches
+
+        Returns:
+            List of (score, metadata) tuples, scores relative to the best hit (0-1]
+        """
+        threshold = settings.LEXICAL_MIN_SCORE if min_bm25 is None else min_bm25
+        try:
+            indexer = self._get_indexer(repo_name)
+            hits = indexer.lexical.search(identifier_terms(query) or tokenize(query), top_k)
+        except Exception as e:
+            logger.error(f"Lexical search failed for repo '{repo_name}': {e}")
+            return []
+        hits = [(score, vector_id) for score, vector_id in hits if score >= threshold]
+        results = [
+            (score / hits[0][0], meta)
+            for score, vector_id in hits
+            for meta in [indexer.metadata.get(vector_id)] if meta is not None
+        ]
+        logger.info(f"Lexical search returned {len(results)} chunks for query: {query}")
+        return self._attach_texts(indexer, results) if with_text else results
+
+    @staticmethod
+    def _attach_texts(indexer: CodeIndexer, results):
+        """Copy each hit's metadata with its chunk source from the index's text store (one pread per hit)."""
+        try:
+            texts = indexer.chunk_texts.get_many([meta["id"] for _, meta in results])
+        except Exception as e:
+            logger.warning(f"Could not read chunk texts: {e}")
+            texts = [None] * len(results)
+        return [(score, {**meta, "text": text}) for (score, meta), text in zip(results, texts)]
+
+    # ---- Batched multi-query search ----
+
+    def search_batch(self, queries: Sequence[Tuple[str, str]], top_k=10, nprobe=None, ef_search=None,
+                     min_score=None) -> List[Optional[list]]:
+        """
+        Search many (repo_name, query) pairs: all queries are embedded in one batch and
+        each repo's index is searched once over its whole query matrix.
+
+        Returns:
+            One result list per query in input order, or None where the repo's index
+            could not be loaded
+        """
+        vectors = self.embedder.embed_queries([query for _, query in queries])
+        groups = self._group_by_repo(queries)
+        per_repo = [
+            self._search_repo_batch(repo_name, [vectors[i] for i in positions], top_k, nprobe, ef_search, min_score)
+            for repo_name, positions in groups.items()
+        ]
+        return self._scatter(len(queries), groups, per_repo)
+
+    async def search_batch_async(self, queries: Sequence[Tuple[str, str]], top_k=10, nprobe=None, ef_search=None,
+                                 min_score=None) -> List[Optional[list]]:
+        """search_batch with embedding and the per-repo searches on their dedicated executors."""
+        vectors = await get_executor("embedding").run(self.embedder.embed_queries, [query for _, query in queries])
+        groups = self._group_by_repo(queries)
+        search = get_executor("search")
+        per_repo = await asyncio.gather(*(
+            search.run(self._search_repo_batch, repo_name, [vectors[i] for i in positions], top_k,
+                       nprobe, ef_search, min_score)
+            for repo_name, positions in groups.items()
+        ))
+        return self._scatter(len(queries), groups, per_repo)
+
+    @staticmethod
+    def _group_by_repo(queries: Sequence[Tuple[str, str]]) -> Dict[str, List[int]]:
+        groups: Dict[str, List[int]] = {}
+        for position, (repo_name, _) in enumerate(queries):
+            groups.setdefault(repo_name, []).append(position)
+        return groups
+
+    @staticmethod
+    def _scatter(count: int, groups: Dict[str, List[int]], per_repo) -> List[Optional[list]]:
+        results: List[Optional[list]] = [None] * count
+        for positions, repo_results in zip(groups.values(), per_repo):
+            if repo_results is None:
+                continue
+            for position, hits in zip(positions, repo_results):
+                results[position] = hits
+        return results
+
+    def _search_repo_batch(self, repo_name: str, vectors, top_k, nprobe=None, ef_search=None,
+                           min_score=None) -> Optional[List[list]]:
+        try:
+            indexer = self._get_indexer(repo_name)
+            results = indexer.search_batch(
+                vectors,
+                top_k,
+                nprobe=nprobe or settings.FAISS_NPROBE,
+                ef_search=ef_search or settings.FAISS_EF_SEARCH,
+            )
+        except Exception as e:
+            logger.error(f"Batch search failed for repo '{repo_name}': {e}")
+            return None
+        threshold = settings.SEARCH_MIN_SCORE if min_score is None else min_score
+        logger.info(f"Batch search over repo '{repo_name}' answered {len(vectors)} queries")
+        return [[r for r in hits if r[0] >= threshold] for hits in results]
+
+    # ---- Federated cross-repo search ----
+
+    async def federated_search(self, query: str, repo_names: Optional[Sequence[str]] = None, top_k=10,
+                               timeout: float = None, parallelism: int = None, total_timeout: float = None,
+                               **tuning):
+        """
+        Search one query across many repos: embed once, search each repo's index in
+        parallel on the search executor, and merge the per-repo hits into a global top-k.
+
+        Args:
+            repo_names: Repos to search; None searches every indexed repo
+            timeout (float): Seconds to wait for each repo; slower repos are left out
+            parallelism (int): Repo searches this request keeps on the search executor at once
+            total_timeout (float): Seconds to wait for all repos together; repos without an
+                answer by then are left out
+
+        Returns:
+            (hits, statuses): hits are (score, metadata) with "repo_name" added to the
+            metadata; statuses map each repo to "ok", "timeout", "rejected" or "error"
+        """
+        if not isinstance(query, str) or not query.strip():
+            logger.warning("Query must be a non-empty string.")
+            return [], {}
+        repo_names = list(dict.fromkeys(repo_names)) if repo_names else self.registry.available_repos()
+        timeout = settings.FEDERATED_REPO_TIMEOUT if timeout is None else timeout
+        total_timeout = settings.FEDERATED_TOTAL_TIMEOUT if total_timeout is None else total_timeout
+        gate = asyncio.Semaphore(parallelism or settings.FEDERATED_PARALLELISM)
+        search = get_executor("search")
+
+        query_vec = await get_executor("embedding").run(self.embedder.embed_query, query)
+
+        async def search_repo(repo_name: str):
+            await gate.acquire()
+            try:
+                future = search.submit(self._search_repo_batch, repo_name, [query_vec], top_k, **tuning)
+            except AdmissionError:
+                gate.release()
+                return "rejected", []
+            # The slot is freed when the executor thread is done, not when this request stops
+            # waiting, so timed-out repos still count against the parallelism
+            future.add_done_callback(lambda _: gate.release())
+            try:
+                hits = await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Federated search skipped repo '{repo_name}' after {timeout:.2f}s")
+                return "timeout", []
+            except AdmissionError:
+                return "rejected", []
+            if hits is None:
+                return "error", []
+            return "ok", [(score, {**meta, "repo_name": repo_name}) for score, meta in hits[0]]
+
+        tasks = [asyncio.ensure_future(search_repo(repo_name)) for repo_name in repo_names]
+        if tasks:
+            _, unfinished = await asyncio.wait(tasks, timeout=total_timeout)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+            if unfinished:
+                logger.warning(f"Federated search left out {len(unfinished)} repos after {total_timeout:.2f}s")
+        outcomes = [("timeout", []) if task.cancelled() else task.result() for task in tasks]
+        statuses = {repo_name: status for repo_name, (status, _) in zip(repo_names, outcomes)}
+        # Each repo's hits are already sorted best-first, so a heap merge yields the global order
+        merged = list(islice(heapq.merge(*(hits for _, hits in outcomes), key=lambda r: -r[0]), top_k))
+        logger.info(f"Federated search over {len(repo_names)} repos returned {len(merged)} hits "
+                    f"({sum(s == 'ok' for s in statuses.values())} repos answered)")
+        return merged, statuses
@@ -0,0 +1,209 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+from app.core.logger import logger
+from app.services.crawler import EXCLUDE_DIRS, EXTENSION_LANGUAGE_MAP, iter_code_files
+
+WATCH_BACKENDS = ("auto", "watchdog", "polling")
+
+# Changing these can change which files are crawled, so the whole repo is re-checked
+CRAWL_CONFIG_FILES = {".gitignore"}
+
+
+class RepoWatcher:
+    """
+    Watches every repository directory under `repo_root` and reports debounced batches
+    of changed source files as on_change(repo_path, paths), where paths are repo-relative
+    (None: re-check the whole repo, e.g. after a directory or .gitignore change).
+
+    Events come from watchdog (inotify on Linux, FSEvents / kqueue elsewhere) when it is
+    installed, otherwise from polling the crawlable files' (mtime, size, inode) every
+    `poll_interval` seconds. A repo is reported once it has been quiet for `debounce`
+    seconds, or after `max_delay` seconds of continuous edits.
+    """
+
+    def __init__(
+        self,
+        repo_root: str,
+        on_change: Callable[[str, Optional[Set[str]]], None],
+        backend: str = "auto",
+        debounce: float = 1.0,
+        max_delay: float = 10.0,
+        poll_interval: float = 2.0,
+    ):
+        if backend not in WATCH_BACKENDS:
+            raise ValueError(f"Unsupported watch backend '{backend}'. Use one of {WATCH_BACKENDS}")
+        self.repo_root = os.path.abspath(repo_root)
+        self.on_change = on_change
+        self.backend = backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+
+        # Repo -> reported paths (None = whole repo), first and last event time
+        self._pending: Dict[str, Optional[Set[str]]] = {}
+        self._first_event: Dict[str, float] = {}
+        self._last_event: Dict[str, float] = {}
+        self._snapshots: Dict[str, Dict[str, Tuple[int, int, int]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+        self.active_backend = None
+
+    # ---- Lifecycle ----
+
+    def start(self):
+        if not os.path.isdir(self.repo_root):
+            logger.error(f"Cannot watch '{self.repo_root}': not a directory")
+            return
+        if self.backend in ("auto", "watchdog") and self._start_watchdog():
+            self.active_backend = "watchdog"
+        elif self.backend == "watchdog":
+            raise ImportError("watchdog is not installed. Run: pip install watchdog")
+        else:
+            self.active_backend = "polling"
+            self.poll()  # Baseline snapshot; changes are reported relative to it
+            self._spawn(self._poll_loop, "codeatlas-watch-poll")
+        self._spawn(self._flush_loop, "codeatlas-watch-flush")
+        logger.info(f"Watching repositories under {self.repo_root} ({self.active_backend})")
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _spawn(self, target, name: str):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _start_watchdog(self) -> bool:
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                watcher.handle_event(event)
+
+        self._observer = Observer()
+        self._observer.schedule(_Handler(), self.repo_root, recursive=True)
+        self._observer.start()
+        return True
+
+    # ---- Events ----
+
+    def handle_event(self, event):
+        """Record a watchdog FileSystemEvent."""
+        if event.event_type not in ("created", "modified", "deleted", "moved"):
+            return  # opened / closed
+        if event.is_directory and event.event_type == "modified":
+            # Emitted for the parent directory of every created, deleted or renamed file
+            # (including editors' atomic saves), which report their own events
+            return
+        self.notify(os.fsdecode(event.src_path), event.is_directory)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.notify(os.fsdecode(dest_path), event.is_directory)
+
+    def notify(self, path: str, is_directory: bool = False):
+        """Record a filesystem event for an absolute path below repo_root."""
+        rel = os.path.relpath(os.path.abspath(path), self.repo_root)
+        if rel == "." or rel.startswith(".."):
+            return
+        repo_name, _, rel_path = rel.partition(os.sep)
+        parts = rel_path.split(os.sep) if rel_path else []
+        if repo_name.startswith(".") or any(part in EXCLUDE_DIRS for part in parts):
+            return  # e.g. .git internals, node_modules
+
+        if not rel_path or is_directory or parts[-1] in CRAWL_CONFIG_FILES:
+            paths = None
+        elif os.path.splitext(rel_path)[1].lower() in EXTENSION_LANGUAGE_MAP and not parts[-1].startswith("."):
+            paths = {rel_path}
+        else:
+            return  # Editor swap files, build outputs, ...
+
+        now = time.monotonic()
+        with self._lock:
+            if repo_name not in self._pending:
+                self._pending[repo_name] = paths
+                self._first_event[repo_name] = now
+            elif self._pending[repo_name] is not None:
+                self._pending[repo_name] = None if paths is None else self._pending[repo_name] | paths
+            self._last_event[repo_name] = now
+
+    def flush(self, force: bool = False):
+        """Report every repo whose edits have settled (all pending repos if force)."""
+        now = time.monotonic()
+        with self._lock:
+            ready = [
+                repo_name for repo_name in self._pending
+                if force
+                or now - self._last_event[repo_name] >= self.debounce
+                or now - self._first_event[repo_name] >= self.max_delay
+            ]
+            batches = [(repo_name, self._pending.pop(repo_name)) for repo_name in ready]
+            for repo_name in ready:
+                del self._first_event[repo_name], self._last_event[repo_name]
+
+        for repo_name, paths in batches:
+            repo_path = os.path.join(self.repo_root, repo_name)
+            count = "all" if paths is None else len(paths)
+            logger.info(f"[{repo_name}] {count} changed files detected, re-indexing")
+            try:
+                self.on_change(repo_path, paths)
+            except Exception as e:
+                logger.error(f"[{repo_name}] Could not schedule re-index: {e}", exc_info=True)
+
+    def _flush_loop(self):
+        interval = max(0.05, min(self.debounce, 1.0) / 2)
+        while not self._stop.wait(interval):
+            self.flush()
+
+    # ---- Polling fallback ----
+
+    def poll(self):
+        """Compare every repo's crawlable files with the previous poll and record the differences."""
+        try:
+            repo_names = sorted(
+                entry.name for entry in os.scandir(self.repo_root)
+                if entry.is_dir(follow_symlinks=False) and not entry.name.startswith(".")
+            )
+        except OSError as e:
+            logger.warning(f"Cannot list {self.repo_root}: {e}")
+            return
+        first = not self._snapshots
+        for repo_name in set(self._snapshots) - set(repo_names):
+            del self._snapshots[repo_name]
+        for repo_name in repo_names:
+            repo_path = os.path.join(self.repo_root, repo_name)
+            try:
+                snapshot = {
+                    code_file.path: (code_file.stat.st_mtime_ns, code_file.stat.st_size, code_file.stat.st_ino)
+                    for code_file in iter_code_files(repo_path)
+                }
+            except (OSError, ValueError) as e:
+                logger.warning(f"[{repo_name}] Polling failed: {e}")
+                continue
+            previous = self._snapshots.get(repo_name)
+            self._snapshots[repo_name] = snapshot
+            if previous is None:
+                if not first:
+                    self.notify(repo_path, is_directory=True)  # New repo
+                continue
+            for path in snapshot.keys() | previous.keys():
+                if snapshot.get(path) != previous.get(path):
+                    self.notify(path)
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
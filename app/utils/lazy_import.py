@@ -0,0 +1,54 @@
+import importlib
+import importlib.util
+from typing import Optional
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module (torch, transformers, faiss, ...) that imports it on
+    first attribute access, so importing the app does not pay for libraries a process
+    never uses. Python's import lock makes concurrent first accesses safe.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def _loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value):
+        # Module-level configuration such as `openai.api_key = ...` goes to the real module
+        if attr in ("_name", "_module"):
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self._load(), attr, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_module(name: str, optional: bool = False) -> Optional[LazyModule]:
+    """
+    Deferred import of `name`. With optional=True, returns None when the package is
+    not installed (checked without importing it).
+    """
+    if optional and importlib.util.find_spec(name) is None:
+        return None
+    return LazyModule(name)
+
+
+def ensure_loaded(module) -> None:
+    """Import a lazily imported module now (used by start-up warm-up)."""
+    if isinstance(module, LazyModule):
+        module._load()
@@ -0,0 +1,205 @@
+import os
+import json
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.repo_utils import get_index_paths
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ManifestDiff:
+    """Result of comparing the crawled files of a repo against its stored manifest."""
+    changed: List[Tuple[str, str, dict]] = field(default_factory=list)  # (full_path, language, new entry without ids / sha256 of new files)
+    unchanged: Dict[str, dict] = field(default_factory=dict)  # rel_path -> entry (stat possibly refreshed)
+    deleted: List[str] = field(default_factory=list)  # rel_paths no longer present
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.changed or self.deleted)
+
+
+def get_manifest_path(repo_name: str) -> str:
+    """Returns path to the per-file manifest stored next to the repo's index."""
+    index_path, _ = get_index_paths(repo_name)
+    return os.path.join(os.path.dirname(index_path), "manifest.json")
+
+
+def load_manifest(repo_name: str) -> Optional[Dict[str, dict]]:
+    """
+    Loads the per-file manifest for a repo.
+
+    Returns:
+        dict mapping repo-relative path -> {"mtime_ns", "size", "inode", "sha256", "ids"}
+        (plus "git_blob" for files that were clean in a git checkout), or None if no
+        (readable) manifest exists
+    """
+    path = get_manifest_path(repo_name)
+    if not os.path.exists(path):
+        logger.info(f"No manifest found for repo '{repo_name}'.")
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring manifest with unsupported version for repo '{repo_name}'.")
+            return None
+        return data["files"]
+    except Exception as e:
+        logger.error(f"Failed to load manifest for '{repo_name}': {e}", exc_info=True)
+        return None
+
+
+def save_manifest(repo_name: str, files: Dict[str, dict]):
+    """Atomically saves the per-file manifest for a repo."""
+    path = get_manifest_path(repo_name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f)
+    os.replace(tmp_path, path)
+    logger.debug(f"Saved manifest for '{repo_name}' with {len(files)} files")
+
+
+def hash_file(file_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(65536):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _try_hash(file_path: str) -> Optional[str]:
+    try:
+        return hash_file(file_path)
+    except OSError as e:
+        logger.warning(f"Skipping unreadable file: {file_path} ({e})")
+        return None
+
+
+def git_blob_ids(repo_path: str, timeout: float = 30.0) -> Optional[Dict[str, str]]:
+    """
+    Blob ids of the tracked files of a git checkout whose working copy matches the
+    git index, keyed by repo-relative path. Returns None if repo_path is not the top
+    of a git checkout or git is unavailable.
+    """
+    if not os.path.exists(os.path.join(repo_path, ".git")):
+        return None
+    try:
+        staged = subprocess.run(
+            ["git", "-C", repo_path, "ls-files", "-s", "-z"], capture_output=True, check=True, timeout=timeout
+        ).stdout
+        dirty = subprocess.run(
+            ["git", "-C", repo_path, "diff", "--name-only", "-z"], capture_output=True, check=True, timeout=timeout
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"git change detection unavailable for {repo_path}: {e}")
+        return None
+
+    modified = set(os.fsdecode(path) for path in dirty.split(b"\0") if path)
+    blobs = {}
+    for record in staged.split(b"\0"):
+        if not record:
+            continue
+        info, path = record.split(b"\t", 1)
+        _, blob, stage = info.split()
+        path = os.fsdecode(path)
+        if stage == b"0" and path not in modified:
+            blobs[os.path.normpath(path)] = blob.decode("ascii")
+    return blobs
+
+
+def file_entry(st: os.stat_result, git_blob: Optional[str] = None) -> dict:
+    """Manifest entry fields known from a file's stat (and git), before its content is read."""
+    entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "inode": st.st_ino}
+    if git_blob:
+        entry["git_blob"] = git_blob
+    return entry
+
+
+def diff_manifest(repo_path: str, code_files: Iterable[Tuple], manifest: Dict[str, dict],
+                  workers: int = None, use_git: bool = None, only: Optional[Set[str]] = None) -> ManifestDiff:
+    """
+    Classify crawled files as changed, unchanged or deleted relative to the manifest.
+
+    Files whose (size, mtime_ns, inode) match the manifest are trusted without reading
+    them. In a git checkout, a file git reports as clean with the blob id recorded at
+    the last run is unchanged too, whatever its timestamps say (fresh clones, branch
+    switches). Only the remaining candidates are hashed, on a pool of `workers` threads,
+    and the content hash decides, so a touched-but-identical file is not re-embedded.
+    Files missing from the manifest are changed without being read here; the pipeline
+    hashes them as it chunks them.
+
+    `code_files` are crawler CodeFile tuples, whose stat from the walk is reused, or
+    plain (path, language) pairs.
+
+    Args:
+        workers: Hashing threads (default CHANGE_DETECTION_WORKERS)
+        use_git: Consult git for repos that are checkouts (default GIT_CHANGE_DETECTION)
+        only: Repo-relative paths the comparison is limited to (e.g. files reported by the
+            watcher); manifest entries outside it are kept as unchanged, not deleted
+    """
+    repo_path = os.path.abspath(repo_path)
+    workers = workers or settings.CHANGE_DETECTION_WORKERS
+    use_git = settings.GIT_CHANGE_DETECTION if use_git is None else use_git
+    git_blobs = (git_blob_ids(repo_path) if use_git else None) or {}
+    diff = ManifestDiff()
+    seen = set()
+    candidates = []  # (file_path, language, rel_path, previous, entry) needing a content hash
+    if only is not None:
+        for rel_path, entry in manifest.items():
+            if rel_path not in only:
+                diff.unchanged[rel_path] = entry
+                seen.add(rel_path)
+
+    for code_file in code_files:
+        file_path, language = code_file[0], code_file[1]
+        rel_path = os.path.relpath(file_path, repo_path)
+        seen.add(rel_path)
+        previous = manifest.get(rel_path)
+        st = getattr(code_file, "stat", None)
+        if st is None:
+            try:
+                st = os.stat(file_path)
+            except OSError as e:
+                logger.warning(f"Skipping unreadable file: {file_path} ({e})")
+                if previous:
+                    diff.unchanged[rel_path] = previous
+                continue
+
+        blob = git_blobs.get(rel_path)
+        entry = file_entry(st, blob)
+
+        if previous is None:
+            diff.changed.append((file_path, language, entry))
+        elif (previous["mtime_ns"] == st.st_mtime_ns and previous["size"] == st.st_size
+                and previous.get("inode", st.st_ino) == st.st_ino):
+            # Manifests written before inodes (or git blobs) were recorded pick them up here
+            diff.unchanged[rel_path] = {**previous, **entry}
+        elif blob and previous.get("git_blob") == blob:
+            diff.unchanged[rel_path] = {**previous, **entry}
+        else:
+            candidates.append((file_path, language, rel_path, previous, entry))
+
+    if len(candidates) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(candidates))) as pool:
+            hashes = list(pool.map(_try_hash, [candidate[0] for candidate in candidates]))
+    else:
+        hashes = [_try_hash(candidate[0]) for candidate in candidates]
+
+    for (file_path, language, rel_path, previous, entry), sha256 in zip(candidates, hashes):
+        if sha256 is None:
+            diff.unchanged[rel_path] = previous
+            continue
+        entry["sha256"] = sha256
+        if previous.get("sha256") == sha256:
+            diff.unchanged[rel_path] = {**entry, "ids": previous["ids"]}
+        else:
+            diff.changed.append((file_path, language, entry))
+
+    diff.deleted = [rel_path for rel_path in manifest if rel_path not in seen]
+    return diff
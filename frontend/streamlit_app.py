@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 import streamlit as st
 
@@ -11,6 +12,21 @@ st.title("🧠 Chat with CodeAtlas")
 load_dotenv()
 backend_url = os.getenv("CODEATLAS_BACKEND_URL", "")
 
+def stream_tokens(response):
+    """Yield tokens from the backend's Server-Sent Events stream."""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data = json.loads(line[len("data:"):])
+            if event == "token":
+                yield data["token"]
+            elif event == "error":
+                raise RuntimeError(data.get("detail", "Streaming failed"))
+            elif event == "done":
+                return
+
 # ---- Repo Selection ----
 try:
     res = requests.get(f"{backend_url}/repos")
@@ -41,27 +57,32 @@ if user_input:
         st.markdown(user_input)
     st.session_state.chat_history.append(("user", user_input))
 
-    # ---- Graceful API Call ----
-    try:
-        response = requests.post(
-            f"{backend_url}/chat?repo_name={selected_repo}",
-            json={"query": user_input},
-            timeout=240,  
-        )
-        response.raise_for_status()
-        answer = response.json().get("answer", "🤖 No answer returned.")
-    except requests.exceptions.ConnectionError:
-        answer = (
-            "🚫 Could not connect to CodeAtlas backend. "
-            "Please ensure the FastAPI server is running at `localhost:8000`."
-        )
-    except requests.exceptions.Timeout:
-        answer = "⏳ The server took too long to respond. Try again later."
-    except requests.exceptions.HTTPError as http_err:
-        answer = f"⚠️ Server returned an error: {http_err.response.status_code}"
-    except Exception as e:
-        answer = f"❌ Unexpected error: {str(e)}"
-
+    # ---- Graceful Streaming API Call ----
     with st.chat_message("assistant"):
-        st.markdown(answer)
+        placeholder = st.empty()
+        answer = ""
+        try:
+            with requests.post(
+                f"{backend_url}/chat/stream?repo_name={selected_repo}",
+                json={"query": user_input},
+                stream=True,
+                timeout=(10, 240),  # (connect, wait between tokens)
+            ) as response:
+                response.raise_for_status()
+                for token in stream_tokens(response):
+                    answer += token
+                    placeholder.markdown(answer + "▌")
+            answer = answer or "🤖 No answer returned."
+        except requests.exceptions.ConnectionError:
+            answer = (
+                "🚫 Could not connect to CodeAtlas backend. "
+                "Please ensure the FastAPI server is running at `localhost:8000`."
+            )
+        except requests.exceptions.Timeout:
+            answer = "⏳ The server took too long to respond. Try again later."
+        except requests.exceptions.HTTPError as http_err:
+            answer = f"⚠️ Server returned an error: {http_err.response.status_code}"
+        except Exception as e:
+            answer = f"❌ Unexpected error: {str(e)}"
+        placeholder.markdown(answer)
     st.session_state.chat_history.append(("assistant", answer))
@@ -0,0 +1,63 @@
+import argparse
+import ast
+import time
+from app.services.chunker import LineIndex, extract_python_chunks
+
+
+def generate_module(classes: int, methods: int) -> str:
+    """Synthetic Python module with `classes` classes of `methods` methods each."""
+    parts = []
+    for c in range(classes):
+        parts.append(f"class Generated{c}:\n    \"\"\"Docstring for class {c}.\"\"\"\n\n")
+        for m in range(methods):
+            parts.append(
+                f"    def method_{m}(self, value):\n"
+                f"        total = value * {m}\n"
+                f"        for i in range(3):\n"
+                f"            total += i\n"
+                f"        return total\n\n"
+            )
+    return "".join(parts)
+
+
+def legacy_extract_python_chunks(source: str):
+    """Previous implementation: re-splits the whole source twice per node."""
+    chunks = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            overlap_start = max(1, node.lineno - 5)
+            overlap_end = min(len(source.splitlines()), node.end_lineno + 5)
+            snippet = '\n'.join(source.splitlines()[overlap_start - 1:overlap_end])
+            chunks.append(snippet.strip())
+    return chunks
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark for Python chunk extraction")
+    parser.add_argument("--classes", type=int, default=50)
+    parser.add_argument("--methods", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    source = generate_module(args.classes, args.methods)
+    line_count = len(LineIndex(source))
+    print(f"Generated module: {line_count} lines, {args.classes * (args.methods + 1)} definitions")
+
+    legacy = best_of(lambda: legacy_extract_python_chunks(source), args.repeat)
+    current = best_of(lambda: extract_python_chunks(source, "<generated>"), args.repeat)
+    print(f"legacy split-per-node : {legacy * 1000:9.1f} ms")
+    print(f"shared line index     : {current * 1000:9.1f} ms")
+    print(f"speedup               : {legacy / current:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
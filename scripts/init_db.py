@@ -1,38 +1,87 @@
-import os
+import argparse
 from pathlib import Path
+from typing import Callable, Iterable, List
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.embedder import Embedder
 from scripts.run_pipeline import run_pipeline
-from app.utils.repo_utils import compute_repo_hash, load_repo_hash, save_repo_hash
 
-def init_repos():
-    repo_root = Path(settings.REPO_ROOT)
+def list_repo_paths(repo_root: str = None) -> List[Path]:
+    """Repository directories under CODEATLAS_REPO_ROOT (or repo_root), sorted by name."""
+    root = Path(repo_root or settings.REPO_ROOT)
+    if not root.exists():
+        logger.error(f"Repo root path '{root}' does not exist.")
+        return []
+    return sorted(path for path in root.iterdir() if path.is_dir())
 
-    if not repo_root.exists():
-        logger.error(f"Repo root path '{repo_root}' does not exist.")
-        return
+def index_repo(repo_path: str, workers: int = None, full_rebuild: bool = False,
+               progress: Callable[[int, int], None] = None, paths: Iterable[str] = None,
+               embedder: Embedder = None) -> bool:
+    """
+    Index one repository if its files changed since the last run (or always with full_rebuild).
+    Change detection is the pipeline's manifest diff, so unchanged repos cost one stat per file;
+    with `paths` only those files are checked (see run_pipeline). Pass `embedder` to reuse a
+    loaded model instead of loading one per call.
 
-    for repo_path in repo_root.iterdir():
-        if not repo_path.is_dir():
-            continue
+    Returns:
+        bool: True if the repo was (re-)indexed, False if it was unchanged
+    """
+    repo_name = Path(repo_path).name
+    logger.info(f"[{repo_name}] Checking for changes...")
+    stats = run_pipeline(
+        str(repo_path), full_rebuild=full_rebuild, workers=workers, progress=progress, paths=paths, embedder=embedder
+    )
+    if stats is None:
+        logger.info(f"[{repo_name}] No changes detected. Skipping indexing.")
+        return False
+    logger.info(f"[{repo_name}] Indexing complete ✅")
+    return True
 
-        repo_name = repo_path.name
+def init_repos(workers: int = None, embedder: Embedder = None):
+    for repo_path in list_repo_paths():
         try:
-            current_hash = compute_repo_hash(str(repo_path))
-            saved_hash = load_repo_hash(repo_name)
-
-            if saved_hash == current_hash:
-                logger.info(f"[{repo_name}] No changes detected. Skipping indexing.")
-                continue
-
-            logger.info(f"[{repo_name}] Indexing started...")
-            run_pipeline(str(repo_path))
-            save_repo_hash(repo_name, current_hash)
-            logger.info(f"[{repo_name}] Indexing complete ✅")
-
+            index_repo(str(repo_path), workers=workers, embedder=embedder)
         except Exception as e:
-            logger.error(f"[{repo_name}] Failed to index repository: {e}", exc_info=True)
+            logger.error(f"[{repo_path.name}] Failed to index repository: {e}", exc_info=True)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index all repositories under CODEATLAS_REPO_ROOT")
+    parser.add_argument("--workers", type=int, default=None, help="Chunk files in a pool of N processes")
+    parser.add_argument("--watch", action="store_true", help="Keep running and re-index files as they change")
+    args = parser.parse_args()
+
+    # One embedder for every repo and every watch-mode job, so the model is loaded once
+    embedder = Embedder(
+        backend=settings.EMBEDDER_BACKEND,
+        hf_model=settings.EMBEDDING_MODEL_NAME,
+        normalize=settings.SIMILARITY_METRIC == "cosine",
+    )
+
     # Index all repos at startup
-    init_repos()
+    init_repos(workers=args.workers, embedder=embedder)
+
+    if args.watch:
+        import time
+        from app.services.index_jobs import IndexJobRunner
+        from app.services.watcher import RepoWatcher
+
+        jobs = IndexJobRunner(
+            lambda repo_path, **kwargs: index_repo(repo_path, workers=args.workers, embedder=embedder, **kwargs)
+        )
+        watcher = RepoWatcher(
+            settings.REPO_ROOT,
+            lambda repo_path, paths: jobs.submit(repo_path, paths=paths),
+            backend=settings.WATCH_BACKEND,
+            debounce=settings.WATCH_DEBOUNCE_SECONDS,
+            max_delay=settings.WATCH_MAX_DELAY_SECONDS,
+            poll_interval=settings.WATCH_POLL_INTERVAL,
+        )
+        watcher.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.stop()
+            jobs.shutdown()
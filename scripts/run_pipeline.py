@@ -1,76 +1,185 @@
 import argparse
 import os
 import logging
-from app.services.crawler import collect_code_files
-from app.services.chunker import extract_chunks
+from typing import Callable, Iterable
+from app.services.crawler import collect_code_files, crawl_file, iter_code_files
 from app.services.embedder import Embedder
+from app.services.embedding_cache import open_embedding_cache
 from app.services.indexer import CodeIndexer
-from app.utils.repo_utils import compute_repo_hash, get_repo_hash_path, load_repo_hash, save_repo_hash
+from app.services.lexical_index import lexical_path_for
+from app.services.chunk_store import chunk_store_path_for
+from app.services.pipeline import IndexingPipeline
+from app.utils.repo_utils import get_index_paths
+from app.utils.manifest import diff_manifest, file_entry, git_blob_ids, load_manifest, save_manifest
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-def run_pipeline(repo_path: str, backend: str = settings.EMBEDDER_BACKEND):
+def run_pipeline(
+    repo_path: str,
+    backend: str = settings.EMBEDDER_BACKEND,
+    full_rebuild: bool = False,
+    index_type: str = None,
+    workers: int = None,
+    batch_size: int = None,
+    file_queue_size: int = None,
+    batch_queue_size: int = None,
+    use_embedding_cache: bool = True,
+    progress: Callable[[int, int], None] = None,
+    paths: Iterable[str] = None,
+    embedder: Embedder = None,
+):
+    """
+    Index (or incrementally re-index) one repository.
+
+    Args:
+        progress: Called with (files processed, files to process) as indexing advances
+        paths: Only check these files (absolute or repo-relative) for changes instead of
+            walking the repo, e.g. the files a watcher saw change. Ignored when the repo
+            has no usable index yet.
+        embedder: Embedder to use (e.g. the API's shared, already loaded one); by default
+            one is created for `backend`. Its `normalize` must match SIMILARITY_METRIC.
+    """
     if not os.path.isdir(repo_path):
         raise ValueError(f"Invalid repo path: {repo_path}")
 
-    repo_name = os.path.basename(os.path.abspath(repo_path))
+    repo_root = os.path.abspath(repo_path)
+    repo_name = os.path.basename(repo_root)
     try:
-        repo_hash_path = get_repo_hash_path(repo_name)
-        current_hash = compute_repo_hash(repo_path)
-        previous_hash = load_repo_hash(repo_name)
-
-        if previous_hash == current_hash:
+        index_path, metadata_path = get_index_paths(repo_name)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+
+        # Indexes without a columnar metadata file (e.g. the old metadata.pkl layout), a lexical
+        # index or a chunk text store are rebuilt, since those need every chunk to be complete
+        index_files = (index_path, metadata_path, lexical_path_for(index_path), chunk_store_path_for(index_path))
+        index_exists = all(os.path.exists(p) for p in index_files)
+        manifest = None if full_rebuild or not index_exists else load_manifest(repo_name)
+
+        if paths is not None and any(os.path.isdir(os.path.join(repo_root, path)) for path in paths):
+            paths = None  # New directories: only a walk finds the files inside them
+
+        code_files = None
+        if manifest is not None and paths is not None:
+            rel_paths = {os.path.relpath(os.path.join(repo_root, path), repo_root) for path in paths}
+            # A removed directory shows up as its own path: cover the files recorded below it
+            only = rel_paths | {rel for rel in manifest for prefix in rel_paths if rel.startswith(prefix + os.sep)}
+            code_files = [
+                code_file for code_file in (crawl_file(repo_root, os.path.join(repo_root, rel)) for rel in sorted(only))
+                if code_file is not None
+            ]
+            logger.info(f"Checking {len(only)} paths reported as changed in {repo_path}")
+            diff = diff_manifest(repo_path, code_files, manifest, only=only)
+            code_files = None  # Not the whole repo, so a rebuild below has to walk it
+        elif manifest is not None:
+            # Deleted files are only known once the walk is complete
+            code_files = collect_code_files(repo_path)
+            logger.info(f"Found {len(code_files)} code files in {repo_path}")
+            diff = diff_manifest(repo_path, code_files, manifest)
+        if manifest is not None and not diff.has_changes:
             logger.info(f"Skipping indexing for '{repo_name}' — no changes detected.")
+            if diff.unchanged != manifest:
+                save_manifest(repo_name, diff.unchanged)  # Persist refreshed mtimes
             return
 
-        save_repo_hash(repo_name, current_hash)
-
-        index_dir = os.path.join(settings.VECTOR_STORE_DIR, repo_name)
-        os.makedirs(index_dir, exist_ok=True)
-
-        index_path = os.path.join(index_dir, "faiss.index")
-        metadata_path = os.path.join(index_dir, "metadata.pkl")
-
-        code_files = collect_code_files(repo_path)
-        logger.info(f"Found {len(code_files)} code files in {repo_path}")
-
-        # Pass hf_model from settings if using HuggingFace backend
-        embedder_kwargs = {}
-        if backend == "huggingface":
-            embedder_kwargs["hf_model"] = settings.EMBEDDING_MODEL_NAME
-
-        embedder = Embedder(backend=backend, **embedder_kwargs)
-        indexer = CodeIndexer(dim=embedder.dim, index_path=index_path, metadata_path=metadata_path)
-
-        for file_path, language in code_files:
-            chunks = extract_chunks(file_path, language)
-            if not chunks:
-                continue
-
-            texts = [chunk["code"] for chunk in chunks]
-
-            try:
-                vectors = embedder.embed(texts)
-            except Exception as e:
-                logger.warning(f"Skipping {file_path} due to embedding error: {e}")
-                continue
-
-            metadata_list = [
-                {
-                    "path": file_path,
-                    "name": chunk["name"],
-                    "type": chunk["type"],
-                    "start_line": chunk["start_line"],
-                    "end_line": chunk["end_line"],
-                }
-                for chunk in chunks
-            ]
-
-            indexer.add_embeddings(vectors, metadata_list)
+        if embedder is None:
+            # Pass hf_model from settings if using HuggingFace backend
+            embedder_kwargs = {}
+            if backend == "huggingface":
+                embedder_kwargs["hf_model"] = settings.EMBEDDING_MODEL_NAME
+
+            embedder = Embedder(backend=backend, normalize=settings.SIMILARITY_METRIC == "cosine", **embedder_kwargs)
+        index_type = index_type or settings.INDEX_TYPE
+        indexer = CodeIndexer(
+            dim=embedder.dim,
+            index_path=index_path,
+            metadata_path=metadata_path,
+            index_type=index_type,
+            train_sample=settings.INDEX_TRAIN_SAMPLE,
+            metric=settings.SIMILARITY_METRIC,
+        )
+
+        stale_ids = set()
+        if manifest is not None:
+            stale_ids = {vector_id for rel_path in diff.deleted for vector_id in manifest[rel_path]["ids"]}
+            for file_path, _, _ in diff.changed:
+                previous = manifest.get(os.path.relpath(file_path, repo_root))
+                if previous:
+                    stale_ids.update(previous["ids"])
+            # Vectors written by an interrupted run are not referenced by any manifest entry
+            known_ids = {vector_id for entry in diff.unchanged.values() for vector_id in entry["ids"]}
+            stale_ids.update(vector_id for vector_id in indexer.metadata if vector_id not in known_ids)
+
+            if indexer.metric != settings.SIMILARITY_METRIC:
+                logger.info(f"Similarity metric changed from '{indexer.metric}' to '{settings.SIMILARITY_METRIC}'; rebuilding.")
+                manifest = None
+            elif index_type != "auto" and index_type != indexer.built_requested_type:
+                # Compared with the requested type, as small corpora get a simpler type than requested
+                logger.info(f"Index type changed from '{indexer.built_requested_type}' to '{index_type}'; rebuilding.")
+                manifest = None
+            elif stale_ids and not indexer.supports_removal:
+                logger.info(f"'{indexer.index_type}' index cannot remove vectors; rebuilding.")
+                manifest = None
+
+        if manifest is None:
+            # No usable record of which vectors belong to which file: start from scratch.
+            # Files stream from the walk into the pipeline, so chunking starts right away
+            indexer.metric = settings.SIMILARITY_METRIC
+            indexer.reset()
+            git_blobs = (git_blob_ids(repo_root) if settings.GIT_CHANGE_DETECTION else None) or {}
+            crawled = code_files if code_files is not None else iter_code_files(repo_path)
+            changed = (
+                (code_file.path, code_file.language,
+                 file_entry(code_file.stat, git_blobs.get(os.path.relpath(code_file.path, repo_root))))
+                for code_file in crawled
+            )
+            unchanged, total = {}, None
+            logger.info(f"Indexing all files of repo '{repo_name}'")
+        else:
+            indexer.remove_ids(stale_ids)
+            changed, unchanged, total = diff.changed, diff.unchanged, len(diff.changed)
+            logger.info(
+                f"Re-indexing {len(diff.changed)} changed files, removing {len(diff.deleted)} deleted files, "
+                f"keeping {len(diff.unchanged)} unchanged files for repo '{repo_name}'"
+            )
+
+        entries = {}  # rel_path -> manifest entry of every file handed to the pipeline
+
+        def files():
+            for file_path, language, entry in changed:
+                rel_path = os.path.relpath(file_path, repo_root)
+                entries[rel_path] = entry
+                yield file_path, language, rel_path
+
+        embedding_cache = open_embedding_cache() if use_embedding_cache else None
+        pipeline = IndexingPipeline(
+            embedder,
+            indexer,
+            workers=workers,
+            file_queue_size=file_queue_size,
+            batch_queue_size=batch_queue_size,
+            batch_size=batch_size,
+            embedding_cache=embedding_cache,
+            # While streaming, the total is the number of files found so far
+            on_progress=(lambda stats: progress(stats.files, len(entries) if total is None else total)) if progress else None,
+        )
+        try:
+            result = pipeline.run(files())
+        finally:
+            if embedding_cache is not None:
+                embedding_cache.close()
+
+        new_manifest = dict(unchanged)
+        for rel_path, ids in result.ids.items():
+            # The hash of the bytes the chunker read, i.e. of exactly what was indexed
+            if result.hashes.get(rel_path) is not None:
+                new_manifest[rel_path] = {**entries[rel_path], "sha256": result.hashes[rel_path], "ids": ids}
+        # Files that failed to read or embed are left out of the manifest so the next run retries them
 
         indexer.save()
-        logger.info(f"Indexed {len(indexer.metadata)} code chunks for repo '{repo_name}'.")
+        save_manifest(repo_name, new_manifest)
+        logger.info(f"Indexed {len(indexer.metadata)} code chunks for repo '{repo_name}' "
+                    f"({result.stats.chunks_per_sec:.1f} chunks/sec, {result.stats.cached_chunks} from embedding cache).")
+        return result.stats
 
     except Exception as e:
         logger.exception(f"Pipeline failed for repo '{repo_name}': {e}")
@@ -80,7 +189,24 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="CodeAtlas Repository Indexing Pipeline")
     parser.add_argument("repo_path", help="Path to the code repository to index")
     parser.add_argument("--backend", default=settings.EMBEDDER_BACKEND, help="Embedding backend to use")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and rebuild the whole index")
+    parser.add_argument("--index-type", default=None, help="auto, flat, ivf_flat, ivf_pq, hnsw or opq_ivf_pq")
+    parser.add_argument("--workers", type=int, default=None, help="Chunk files in a pool of N processes")
+    parser.add_argument("--batch-size", type=int, default=None, help="Chunks per embedding batch")
+    parser.add_argument("--file-queue-size", type=int, default=None, help="Chunked files buffered ahead of the embedder")
+    parser.add_argument("--batch-queue-size", type=int, default=None, help="Embedded batches buffered ahead of the index writer")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Embed every chunk, bypassing the shared embedding cache")
 
     args = parser.parse_args()
 
-    run_pipeline(repo_path=args.repo_path, backend=args.backend)
+    run_pipeline(
+        repo_path=args.repo_path,
+        backend=args.backend,
+        full_rebuild=args.full,
+        index_type=args.index_type,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        file_queue_size=args.file_queue_size,
+        batch_queue_size=args.batch_queue_size,
+        use_embedding_cache=not args.no_embedding_cache,
+    )
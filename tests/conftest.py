@@ -0,0 +1,95 @@
+import os
+import numpy as np
+import pytest
+import app.services.embedder as embedder_mod
+from app.services.indexer import CodeIndexer
+from app.services.index_registry import IndexRegistry
+from app.utils.repo_utils import get_index_paths
+
+DIM = 4
+
+class AxisEmbedder:
+    """Embeds query "eN" as the N-th unit vector (every query as unit vector `axis` if set); counts model calls."""
+    def __init__(self, axis=None):
+        self.axis = axis
+        self.calls = 0
+    def _vector(self, query):
+        return np.eye(DIM)[int(query[1:]) if self.axis is None else self.axis].tolist()
+    def embed_query(self, query):
+        self.calls += 1
+        return self._vector(query)
+    def embed_queries(self, queries):
+        self.calls += 1
+        return [self._vector(query) for query in queries]
+
+class IndexStore:
+    """A vector store directory of small DIM-dimensional repo indexes."""
+    dim = DIM
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def build(self, repo_name, vectors, metadata=None, texts=None, metric="cosine") -> str:
+        """Save an index for repo_name (one function chunk per vector by default); returns its path."""
+        index_path, metadata_path = get_index_paths(repo_name, self.root)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        indexer = CodeIndexer(dim=DIM, index_path=index_path, metadata_path=metadata_path, autoload=False, metric=metric)
+        if metadata is None:
+            metadata = [{"path": f"{repo_name}/{i}.py", "name": f"f{i}", "type": "function",
+                         "start_line": 1, "end_line": 2} for i in range(len(vectors))]
+        indexer.add_embeddings(vectors, metadata, texts=texts)
+        indexer.save()
+        return index_path
+
+    def registry(self, registry_cls=IndexRegistry, max_bytes=10 ** 9, **kwargs) -> IndexRegistry:
+        return registry_cls(dim=DIM, vector_store_dir=self.root, max_bytes=max_bytes, **kwargs)
+
+@pytest.fixture
+def axis_embedder():
+    return AxisEmbedder()
+
+@pytest.fixture
+def index_store(tmp_path):
+    return IndexStore(tmp_path)
+
+@pytest.fixture
+def make_repo(tmp_path):
+    """make_repo(n_files, funcs_per_file): Python files under tmp_path as (path, language, rel_path) pipeline inputs."""
+    def make(n_files, funcs_per_file):
+        files = []
+        for i in range(n_files):
+            path = tmp_path / f"mod{i}.py"
+            path.write_text("".join(f"def f{i}_{j}():\n    return {j}\n\n" for j in range(funcs_per_file)))
+            files.append((str(path), "Python", f"mod{i}.py"))
+        return files
+    return make
+
+class CountingModel:
+    """SentenceTransformer stand-in counting model loads and encode calls."""
+    loads = 0
+    calls = 0
+    def __init__(self, *args, **kwargs):
+        type(self).loads += 1
+    def encode(self, texts, **kwargs):
+        type(self).calls += 1
+        return np.array([[float(len(t))] * DIM for t in texts])
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+@pytest.fixture
+def counting_model(monkeypatch):
+    """Installs a CountingModel subclass with fresh counters as the embedder's SentenceTransformer."""
+    model_cls = type("CountingModel", (CountingModel,), {"loads": 0, "calls": 0})
+    monkeypatch.setattr(embedder_mod, "SentenceTransformer", model_cls)
+    return model_cls
+
+@pytest.fixture
+def embedded_texts(monkeypatch):
+    """List recording every text passed to Embedder.embed (which still runs); clear() it between steps."""
+    embedded = []
+    original_embed = embedder_mod.Embedder.embed
+    def tracking_embed(self, texts, **kwargs):
+        embedded.extend(texts)
+        return original_embed(self, texts, **kwargs)
+    monkeypatch.setattr(embedder_mod.Embedder, "embed", tracking_embed)
+    return embedded
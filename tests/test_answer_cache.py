@@ -0,0 +1,108 @@
+import asyncio
+import time
+from app.core import config
+from app.services.answer_cache import AnswerCache, answer_key
+from app.services.chat_service import ChatService
+
+META = {"id": 3, "path": "a.py", "name": "f", "type": "function", "start_line": 1, "end_line": 2, "text": "def f(): pass"}
+
+class VersionedSearcher:
+    version = (1, 100)
+    def semantic_search(self, repo_name, query, top_k=10, min_score=None, with_text=False):
+        return [(0.9, META)]
+    async def semantic_search_async(self, repo_name, query, top_k=10, min_score=None, with_text=False):
+        return self.semantic_search(repo_name, query)
+    def index_version(self, repo_name):
+        return self.version
+
+class CountingChat:
+    cache_version = "counting:v1"
+    def __init__(self):
+        self.calls = 0
+    def chat(self, question, context):
+        self.calls += 1
+        return f"answer {self.calls}"
+    def stream_chat(self, question, context):
+        self.calls += 1
+        yield from ["streamed ", f"answer {self.calls}"]
+
+def make_service(monkeypatch, cache):
+    monkeypatch.setattr(config.settings, "CODEATLAS_CHAT_BACKEND", "huggingface")
+    chat = CountingChat()
+    return ChatService(VersionedSearcher(), None, chat, None, answer_cache=cache), chat
+
+def test_key_normalizes_question_and_tracks_inputs():
+    key = answer_key("What does  f do?", [1, 2], (1, 100), "m")
+    assert key == answer_key("what does f do? ", [1, 2], (1, 100), "m")
+    assert key != answer_key("What does f do?", [2, 1], (1, 100), "m")
+    assert key != answer_key("What does f do?", [1, 2], (2, 100), "m")
+    assert key != answer_key("What does f do?", [1, 2], (1, 100), "m2")
+
+def test_repeated_question_is_answered_from_cache(monkeypatch):
+    service, chat = make_service(monkeypatch, AnswerCache(max_size=8, ttl=60))
+    assert service.answer_question("repo", "What does f do?") == "answer 1"
+    assert service.answer_question("repo", "what does f do?") == "answer 1"
+    assert asyncio.run(service.answer_question_async("repo", "What does f do?")) == "answer 1"
+    assert list(service.stream_answer("repo", "What does f do?")) == ["answer 1"]
+    assert chat.calls == 1
+
+def test_reindex_invalidates_and_stream_fills_cache(monkeypatch):
+    cache = AnswerCache(max_size=8, ttl=60)
+    service, chat = make_service(monkeypatch, cache)
+    service.answer_question("repo", "q")
+    service.searcher.version = (2, 120)
+    assert "".join(service.stream_answer("repo", "q")) == "streamed answer 2"
+    assert cache.stats()["invalidations"] == 1
+    assert service.answer_question("repo", "q") == "streamed answer 2"
+    assert chat.calls == 2
+
+def test_ttl_lru_and_persistence(tmp_path):
+    path = str(tmp_path / "answers.json")
+    cache = AnswerCache(max_size=2, ttl=60, persist_path=path)
+    for key in "abc":
+        cache.put(key, f"answer {key}", "repo", (1,))
+    assert cache.get("a") is None and cache.stats()["evictions"] == 1
+    cache.save()
+    assert AnswerCache(max_size=2, ttl=60, persist_path=path).get("c") == "answer c"
+
+    expired = AnswerCache(max_size=2, ttl=0.01)
+    expired.put("k", "v", "repo", (1,))
+    time.sleep(0.02)
+    assert expired.get("k") is None
+
+def test_streamed_answer_is_cached_in_chat_format(monkeypatch):
+    from app.services.llm_huggingface import HuggingFaceChat
+
+    class MessyStreamChat(CountingChat):
+        normalize_answer = staticmethod(HuggingFaceChat.normalize_answer)
+        def stream_chat(self, question, context):
+            self.calls += 1
+            yield from ["Purpose:\n   it works", "\n\n\n\n  Done"]
+
+    monkeypatch.setattr(config.settings, "CODEATLAS_CHAT_BACKEND", "huggingface")
+    chat = MessyStreamChat()
+    service = ChatService(VersionedSearcher(), None, chat, None, answer_cache=AnswerCache(max_size=8, ttl=60))
+    assert "".join(service.stream_answer("repo", "q")) == "Purpose:\n   it works\n\n\n\n  Done"
+    assert service.answer_question("repo", "q") == "Purpose:\nit works\n\nDone"
+    assert chat.calls == 1
+
+def test_hf_normalize_answer_matches_chat_formatting():
+    from app.services.llm_huggingface import HuggingFaceChat
+    assert HuggingFaceChat.normalize_answer("\n  a\n    b\n\n\n\nc [END_OF_ANSWER] junk") == "a\nb\n\nc"
+
+def test_sampled_answers_are_not_cached(monkeypatch):
+    from app.services.llm_openai import OpenAIChat
+
+    class SamplingChat(CountingChat):
+        deterministic = OpenAIChat.deterministic
+
+    monkeypatch.setattr(config.settings, "CODEATLAS_CHAT_BACKEND", "huggingface")
+    chat = SamplingChat()
+    service = ChatService(VersionedSearcher(), None, chat, None, answer_cache=AnswerCache(max_size=8, ttl=60))
+    assert service.answer_question("repo", "q") == "answer 1"
+    assert "".join(service.stream_answer("repo", "q")) == "streamed answer 2"
+    assert service.answer_question("repo", "q") == "answer 3"
+
+    monkeypatch.setattr(config.settings, "OPENAI_TEMPERATURE", 0.0)
+    assert service.answer_question("repo", "q") == "answer 4"
+    assert service.answer_question("repo", "q") == "answer 4"
@@ -8,14 +8,20 @@ class DummySearcher:
     def semantic_search(self, repo_name, query, top_k=10):
         return [(0.99, {"path": "dummy.py", "name": "dummy_func", "type": "function", 
                         "start_line": 1, "end_line": 2})]
+    async def semantic_search_async(self, repo_name, query, top_k=10):
+        return self.semantic_search(repo_name, query, top_k)
         
 class DummySearcherEmpty:
     def semantic_search(self, repo_name, query, top_k=10):
         return []
+    async def semantic_search_async(self, repo_name, query, top_k=10):
+        return []
 
 class DummyChatService:
     def answer_question(self, repo_name, query):
         return "Dummy Answer"
+    async def answer_question_async(self, repo_name, query):
+        return self.answer_question(repo_name, query)
     
 client = TestClient(app)
 
@@ -68,3 +74,50 @@ def test_chat_missing_payload():
     assert response.status_code == 422
     app.dependency_overrides = {}
 
+
+def test_search_stats_endpoint():
+    response = client.get("/search/stats")
+    assert response.status_code == 200
+    assert {"hits", "misses", "size"} <= set(response.json()["query_embedding_cache"])
+
+class DummyStreamingChatService:
+    async def stream_answer_async(self, repo_name, query):
+        async def tokens():
+            yield "Dummy "
+            yield "Answer\n"
+        return tokens()
+
+def test_chat_stream_endpoint():
+    app.dependency_overrides[get_chat_service] = lambda repo_name : DummyStreamingChatService()
+    response = client.post("/chat/stream?repo_name=dummy", json={"query": "What does this do?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [e[0] for e in events] == ["event: token", "event: token", "event: done"]
+    assert events[1][1] == 'data: {"token": "Answer\\n"}'
+    app.dependency_overrides = {}
+
+def test_saturated_executor_returns_429():
+    from app.core.executors import ExecutorSaturated
+    class SaturatedSearcher:
+        async def semantic_search_async(self, repo_name, query, top_k=10):
+            raise ExecutorSaturated("The search executor is saturated, retry shortly")
+    app.dependency_overrides[get_code_searcher] = lambda repo_name : SaturatedSearcher()
+    response = client.get("/search?repo_name=dummy&query=test")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    app.dependency_overrides = {}
+
+def test_federated_search_endpoint():
+    from app.dependencies import get_searcher
+    class DummyFederatedSearcher:
+        async def federated_search(self, query, repo_names, top_k, timeout=None, total_timeout=None):
+            assert total_timeout == 0.5
+            meta = {"path": "a.py", "name": "f", "type": "function", "start_line": 1, "end_line": 2}
+            return [(0.9, {**meta, "repo_name": "a"})], {"a": "ok", "b": "timeout"}
+    app.dependency_overrides[get_searcher] = lambda: DummyFederatedSearcher()
+    response = client.get("/search/federated?query=auth&repos=a&repos=b&total_timeout_ms=500")
+    assert response.status_code == 200
+    assert response.json()["results"][0]["repo_name"] == "a"
+    assert response.json()["repos"] == {"a": "ok", "b": "timeout"}
+    app.dependency_overrides = {}
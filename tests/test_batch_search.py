@@ -0,0 +1,44 @@
+import asyncio
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies import get_searcher
+from app.services.indexer import CodeIndexer
+from app.services.searcher import CodeSearcher
+
+@pytest.fixture
+def searcher(index_store, axis_embedder):
+    index_store.build("a", np.eye(index_store.dim))
+    index_store.build("b", np.eye(index_store.dim))
+    return CodeSearcher(embedder=axis_embedder, registry=index_store.registry())
+
+def test_indexer_search_batch_matches_single_searches(tmp_path):
+    dim = 4
+    indexer = CodeIndexer(dim=dim, index_path=str(tmp_path/"x.index"), metadata_path=str(tmp_path/"x.bin"))
+    indexer.add_embeddings(np.random.default_rng(0).random((20, dim)), [{"path": str(i)} for i in range(20)])
+    queries = np.random.default_rng(1).random((5, dim))
+    assert indexer.search_batch(queries, top_k=3) == [indexer.search(q, top_k=3) for q in queries]
+
+def test_search_batch_groups_queries_by_repo(searcher):
+    results = asyncio.run(searcher.search_batch_async(
+        [("a", "e1"), ("b", "e2"), ("missing", "e0"), ("a", "e3")], top_k=1
+    ))
+    assert [hits[0][1]["path"] for hits in (results[0], results[1], results[3])] == ["a/1.py", "b/2.py", "a/3.py"]
+    assert results[2] is None
+    assert searcher.embedder.calls == 1
+
+def test_batch_search_endpoint(searcher):
+    app.dependency_overrides[get_searcher] = lambda: searcher
+    client = TestClient(app)
+    response = client.post("/search/batch", json={
+        "repo_name": "a", "top_k": 2, "queries": [{"query": "e0"}, {"query": "e2", "repo_name": "b"}],
+    })
+    assert response.status_code == 200
+    body = response.json()["results"]
+    assert [r["repo_name"] for r in body] == ["a", "b"]
+    assert body[1]["results"][0]["path"] == "b/2.py"
+
+    missing_repo = client.post("/search/batch", json={"queries": [{"query": "e0"}]})
+    assert missing_repo.status_code == 400
+    app.dependency_overrides = {}
@@ -36,4 +36,86 @@ def test_chat_service_openai_backend(monkeypatch):
     monkeypatch.setattr(config.settings, "CODEATLAS_CHAT_BACKEND", "openai")
     chat_service = ChatService(DummySearcher(), DummyChunker(), DummyHFChat(), DummyOpenAIChat())
     backend = chat_service.get_chat_backend()
-    assert isinstance(backend, DummyOpenAIChat)
\ No newline at end of file
+    assert isinstance(backend, DummyOpenAIChat)
+
+class StreamingSearcher(DummySearcher):
+    def semantic_search(self, repo_name, query, top_k=5, min_score=None, with_text=False):
+        return []
+
+class DummyStreamingHFChat(DummyHFChat):
+    def stream_chat(self, question, context):
+        yield from ["Purpose", ": demo"]
+
+def test_stream_answer_uses_backend_stream(monkeypatch):
+    monkeypatch.setattr(config.settings, "CODEATLAS_CHAT_BACKEND", "huggingface")
+    chat_service = ChatService(StreamingSearcher(), DummyChunker(), DummyStreamingHFChat(), DummyOpenAIChat())
+    assert list(chat_service.stream_answer("repo", "q")) == ["Purpose", ": demo"]
+
+def test_stream_answer_falls_back_to_full_answer(monkeypatch):
+    monkeypatch.setattr(config.settings, "CODEATLAS_CHAT_BACKEND", "openai")
+    chat_service = ChatService(StreamingSearcher(), DummyChunker(), DummyHFChat(), DummyOpenAIChat())
+    assert list(chat_service.stream_answer("repo", "q")) == ["Dummy OpenAI answer"]
+
+def test_until_end_marker_handles_split_marker():
+    from app.services.llm_huggingface import until_end_marker
+    pieces = ["\n  Purpose: it", " works [END_OF", "_ANSWER] trailing junk"]
+    assert "".join(until_end_marker(pieces)) == "Purpose: it works"
+    assert "".join(until_end_marker(["no marker here"])) == "no marker here"
+
+def test_stream_answer_async_holds_an_llm_worker(monkeypatch):
+    import asyncio
+    import threading
+    from app.core.executors import BoundedExecutor, ExecutorSaturated
+    from app.services import chat_service as chat_service_mod
+
+    release = threading.Event()
+
+    class BlockingHFChat(DummyHFChat):
+        def stream_chat(self, question, context):
+            yield "Purpose"
+            release.wait(5)
+            yield ": demo"
+
+    class AsyncSearcher(StreamingSearcher):
+        async def semantic_search_async(self, repo_name, query, **kwargs):
+            return self.semantic_search(repo_name, query, **kwargs)
+
+    executor = BoundedExecutor("llm", max_workers=1, max_queue=0)
+    monkeypatch.setattr(chat_service_mod, "get_executor", lambda kind: executor)
+    monkeypatch.setattr(config.settings, "CODEATLAS_CHAT_BACKEND", "huggingface")
+    chat_service = ChatService(AsyncSearcher(), DummyChunker(), BlockingHFChat(), DummyOpenAIChat())
+
+    async def scenario():
+        stream = await chat_service.stream_answer_async("repo", "q")
+        pieces = [await stream.__anext__()]
+        # The first generation still holds the only worker
+        with pytest.raises(ExecutorSaturated):
+            await chat_service.stream_answer_async("repo", "q")
+        release.set()
+        pieces.extend([piece async for piece in stream])
+        return pieces
+
+    assert asyncio.run(scenario()) == ["Purpose", ": demo"]
+    assert executor.stats()["in_flight"] == 0
+
+@pytest.mark.parametrize("mode", ["hybrid", "auto"])
+def test_chat_min_score_keeps_lexical_only_chunks_out_of_the_prompt(monkeypatch, index_store, axis_embedder, mode):
+    import numpy as np
+    texts = ["def compute_repo_hash(repo_path):\n    return sha256(repo_path)", "def run_pipeline(repo_path):\n    pass"]
+    index_store.build("repo", np.eye(index_store.dim)[:2], texts=texts)
+    axis_embedder.axis = 3  # Orthogonal to every chunk
+    searcher = CodeSearcher(embedder=axis_embedder, registry=index_store.registry())
+
+    class RecordingChat(DummyHFChat):
+        def chat(self, question, context):
+            self.context = context
+            return "answer"
+
+    monkeypatch.setattr(config.settings, "SEARCH_MODE", mode)
+    monkeypatch.setattr(config.settings, "CHAT_MIN_SCORE", 0.5)
+    monkeypatch.setattr(config.settings, "CODEATLAS_CHAT_BACKEND", "huggingface")
+    backend = RecordingChat()
+    chat_service = ChatService(searcher, DummyChunker(), backend, DummyOpenAIChat())
+    assert searcher.semantic_search("repo", "how is the repo hash computed", mode=mode, min_score=0.0)
+    chat_service.answer_question("repo", "how is the repo hash computed")
+    assert backend.context == "No relevant code context found."
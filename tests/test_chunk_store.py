@@ -0,0 +1,65 @@
+import os
+import glob
+import numpy as np
+import pytest
+from app.services import chunk_store
+from app.services.chunk_store import ChunkTextStore
+from app.services.chat_service import ChatService
+from app.services.indexer import CodeIndexer
+from app.services.index_registry import IndexRegistry
+from app.services.searcher import CodeSearcher
+from app.utils.repo_utils import get_index_paths
+
+TEXTS = ["def a():\n    return 1\n", "class B:\n    pass\n", "def ünïcode(): ...\n"]
+
+def blobs(tmp_path):
+    return glob.glob(str(tmp_path / "faiss.chunks.*.bin"))
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_round_trip(tmp_path, codec):
+    if codec == "zstd" and chunk_store.zstandard is None:
+        pytest.skip("zstandard not installed")
+    store = ChunkTextStore(str(tmp_path / "faiss.chunks.npz"), codec=codec)
+    store.add([5, 6, 7], TEXTS)
+    assert store.get_many([7, 5, 99]) == [TEXTS[2], TEXTS[0], None]
+    store.save()
+
+    loaded = ChunkTextStore.load(str(tmp_path / "faiss.chunks.npz"))
+    assert loaded.codec == codec
+    assert loaded.get_many([5, 6, 7]) == TEXTS
+
+def test_compaction_keeps_open_readers_valid(tmp_path):
+    path = str(tmp_path / "faiss.chunks.npz")
+    writer = ChunkTextStore(path, codec="zlib")
+    writer.add([0, 1, 2], TEXTS)
+    writer.save()
+    reader = ChunkTextStore.load(path)
+
+    writer.remove([0, 1])
+    writer.add([3], ["x = 1\n"])
+    writer.save()  # Most of the blob is now dead, so it is rewritten
+    assert len(blobs(tmp_path)) == 1
+    assert writer.get_many([0, 2, 3]) == [None, TEXTS[2], "x = 1\n"]
+    assert reader.get_many([0, 2]) == [TEXTS[0], TEXTS[2]]  # Still reading the old, unlinked blob
+    assert ChunkTextStore.load(path).get_many([2, 3]) == [TEXTS[2], "x = 1\n"]
+
+def test_search_returns_text_and_chat_uses_it(tmp_path):
+    index_path, metadata_path = get_index_paths("repo", str(tmp_path))
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    indexer = CodeIndexer(dim=3, index_path=index_path, metadata_path=metadata_path, autoload=False, metric="cosine")
+    metas = [{"path": "gone.py", "name": n, "type": "function", "start_line": 1, "end_line": 2} for n in "aBc"]
+    indexer.add_embeddings(np.eye(3), metas, texts=TEXTS)
+    indexer.save()
+
+    class Embedder:
+        def embed_query(self, query):
+            return [0.0, 1.0, 0.0]
+    registry = IndexRegistry(dim=3, vector_store_dir=str(tmp_path), max_bytes=10 ** 9)
+    searcher = CodeSearcher(embedder=Embedder(), registry=registry)
+    results = searcher.semantic_search("repo", "a class", top_k=1, mode="semantic", with_text=True)
+    assert results[0][1]["text"] == TEXTS[1]
+    assert "text" not in searcher.semantic_search("repo", "a class", top_k=1, mode="semantic")[0][1]
+
+    # The source file no longer exists, yet the context holds the indexed code
+    context = ChatService(searcher, None, None, None).combine_chunks(results)
+    assert "class B:" in context
@@ -82,4 +82,41 @@ def test_extract_empty_file(tmp_path):
     file_path = tmp_path/"empty.py"
     create_file(file_path, "")
     chunks = chunker.extract_chunks(str(file_path), "Python")
-    assert chunks == []
\ No newline at end of file
+    assert chunks == []
+
+def test_line_index_slices_match_splitlines():
+    source = "a = 1\r\nb = 2\n\nc = 3"
+    lines = chunker.LineIndex(source)
+    assert len(lines) == len(source.splitlines())
+    assert lines.slice(2, 3) == "b = 2\n\n"
+    assert lines.slice(4, 99) == "c = 3"
+    assert lines.slice(0, 1) == "a = 1\r\n"
+    assert lines.slice(5, 9) == ""
+
+def test_overview_chunk_for_large_file(tmp_path):
+    file_path = tmp_path/"big.py"
+    create_file(file_path, "".join(f"x{i} = {i}\n" for i in range(120)))
+    chunks = chunker.extract_chunks(str(file_path), "Python")
+    overview = [c for c in chunks if c['type'] == 'overview']
+    assert len(overview) == 1
+    assert overview[0]['end_line'] == 100
+    assert overview[0]['code'].splitlines()[-1] == "x99 = 99"
+
+def test_extract_treesitter_function_names(tmp_path):
+    file_path = tmp_path/"main.c"
+    create_file(file_path, "int add(int a, int b) {\n    return a + b;\n}\n")
+    chunks = chunker.extract_chunks(str(file_path), "C")
+    assert [(c['name'], c['start_line'], c['end_line']) for c in chunks] == [("add", 1, 3)]
+
+def test_extract_file_records_reads_once_and_hashes(tmp_path):
+    import hashlib
+    path = tmp_path / "mod.py"
+    path.write_bytes(b"def f():\r\n    return 1\r\n")
+    sha256, records = chunker.extract_file_records(str(path), "python")
+    assert sha256 == hashlib.sha256(path.read_bytes()).hexdigest()
+    assert [(r[1], r[2]) for r in records] == [("function", "f")]
+    assert "\r" not in records[0][0]
+
+    binary = tmp_path / "blob.py"
+    binary.write_bytes(b"\xff\xfe\x00binary")
+    assert chunker.extract_file_records(str(binary), "python")[1] == []
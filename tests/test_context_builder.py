@@ -0,0 +1,44 @@
+from app.services.context_builder import ContextBuilder, merge_hits
+
+def words(text):
+    return len(text.split())
+
+def meta(path, start, end, name):
+    return {"path": path, "start_line": start, "end_line": end, "name": name, "type": "function"}
+
+def source(start, end):
+    return "\n".join(f"line{i}" for i in range(start, end + 1))
+
+def test_overlapping_ranges_of_a_file_are_merged():
+    hits = [
+        (0.9, meta("a.py", 10, 20, "method"), source(10, 20)),
+        (0.5, meta("a.py", 1, 30, "Klass"), source(1, 30)),  # Contains the method
+        (0.7, meta("a.py", 26, 40, "after"), source(26, 40)),  # Shares 5 lines with the class
+        (0.6, meta("b.py", 26, 40, "other"), source(26, 40)),
+    ]
+    blocks = sorted(merge_hits(hits), key=lambda b: b.path)
+    assert [(b.path, b.start_line, b.end_line) for b in blocks] == [("a.py", 1, 40), ("b.py", 26, 40)]
+    assert blocks[0].lines == source(1, 40).splitlines()
+    assert blocks[0].score == 0.9
+    assert blocks[0].names == ["Klass", "method", "after"]
+
+def test_packs_by_score_density_and_always_keeps_the_best_hit():
+    hits = [
+        (0.9, meta("big.py", 1, 200, "big"), source(1, 200)),
+        (0.8, meta("small.py", 1, 5, "small"), source(1, 5)),
+        (0.7, meta("mid.py", 1, 60, "mid"), source(1, 60)),
+    ]
+    context = ContextBuilder(count_tokens=words, max_tokens=100).build(hits)
+    # The best hit is cut to fit, so nothing else fits alongside it
+    assert context.startswith("=== From big.py (lines 1-")
+    assert "small.py" not in context and words(context) <= 100
+
+    context = ContextBuilder(count_tokens=words, max_tokens=280).build(hits)
+    assert context.index("big.py") < context.index("small.py")
+    assert "mid.py" not in context  # Lower density than small.py and no longer fits
+
+def test_stripped_chunk_text_still_merges():
+    first = "    def f():\n        return 1\n\n    def g():"
+    second = "def g():\n        return 2"
+    blocks = merge_hits([(0.5, meta("a.py", 1, 4, "f"), first.strip()), (0.4, meta("a.py", 4, 5, "g"), second)])
+    assert blocks[0].lines == ["def f():", "        return 1", "", "    def g():", "        return 2"]
@@ -1,3 +1,4 @@
+import os
 import pytest
 from app.services import crawler
 
@@ -61,4 +62,44 @@ def test_collect_code_files_path_traversal(tmp_path):
     files = crawler.collect_code_files(str(tmp_path))
     # The symlink should not be followed/collected
     assert not any("evil_link.py" in f[0] for f in files)
-    assert not any("outside.py" in f[0] for f in files)
\ No newline at end of file
+    assert not any("outside.py" in f[0] for f in files)
+
+def test_gitignore_and_exclude_globs_prune(tmp_path):
+    for rel in ["app/main.py", "build/gen.py", "app/cache/tmp.py", "app/keep.py", "app/debug_x.py", "vendor/lib.js"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        create_file(tmp_path / rel)
+    create_file(tmp_path / ".gitignore", "build/\n# comment\n**/cache/\n")
+    create_file(tmp_path / "app" / ".gitignore", "debug_*.py\n")
+    files = crawler.collect_code_files(str(tmp_path), exclude=["/vendor"], respect_gitignore=True)
+    assert sorted(os.path.relpath(f.path, tmp_path) for f in files) == ["app/keep.py", "app/main.py"]
+
+    files = crawler.collect_code_files(str(tmp_path), exclude=[], respect_gitignore=False)
+    assert len(files) == 6
+
+def test_negated_gitignore_pattern(tmp_path):
+    create_file(tmp_path / "a_test.py")
+    create_file(tmp_path / "keep_test.py")
+    create_file(tmp_path / ".gitignore", "*_test.py\n!keep_test.py\n")
+    files = crawler.collect_code_files(str(tmp_path), respect_gitignore=True)
+    assert [os.path.basename(f.path) for f in files] == ["keep_test.py"]
+
+def test_iter_code_files_streams_in_order_with_stat(tmp_path):
+    for rel in ["b.py", "a/z.py", "a/b.go", "c.txt"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        create_file(tmp_path / rel)
+    stream = crawler.iter_code_files(str(tmp_path))
+    first = next(stream)
+    assert os.path.relpath(first.path, tmp_path) == "b.py"
+    assert first.stat.st_size == os.path.getsize(first.path)
+    assert [os.path.relpath(f.path, tmp_path) for f in stream] == ["a/b.go", "a/z.py"]
+
+def test_crawl_file_matches_walk(tmp_path):
+    for rel in ["app/main.py", "build/gen.py", "node_modules/x.js", "notes.txt", "app/.hidden.py"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        create_file(tmp_path / rel)
+    create_file(tmp_path / ".gitignore", "build/\n")
+    walked = {f.path for f in crawler.collect_code_files(str(tmp_path), respect_gitignore=True)}
+    for rel in ["app/main.py", "build/gen.py", "node_modules/x.js", "notes.txt", "app/.hidden.py", "gone.py"]:
+        code_file = crawler.crawl_file(str(tmp_path), str(tmp_path / rel), respect_gitignore=True)
+        assert (code_file is not None) == (str(tmp_path / rel) in walked), rel
+    assert crawler.crawl_file(str(tmp_path), str(tmp_path / "app/main.py")).language == "Python"
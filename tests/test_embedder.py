@@ -46,3 +46,35 @@ def test_openai_embedder_dimension(monkeypatch):
     embedder = Embedder(backend="openai", openai_model="text-embedding-3-small", openai_api_key="dummy")
     assert embedder.dim == 1536
 
+
+def test_huggingface_normalized_embeddings(monkeypatch):
+    captured = {}
+    class RecordingModel(DummySentenceTransformer):
+        def encode(self, texts, **kwargs):
+            captured.update(kwargs)
+            return super().encode(texts, **kwargs)
+    monkeypatch.setattr(embedder_mod, "SentenceTransformer", RecordingModel)
+    embedder = Embedder(backend="huggingface", hf_model="dummy", normalize=True)
+    embedder.embed(["a"])
+    assert captured.get("normalize_embeddings") is True
+
+def test_bge_query_instruction(monkeypatch):
+    monkeypatch.setattr(embedder_mod, "SentenceTransformer", DummySentenceTransformer)
+    embedder = Embedder(backend="huggingface", hf_model="BAAI/bge-large-en-v1.5")
+    assert embedder.query_instruction == embedder_mod.BGE_QUERY_INSTRUCTION
+    plain = Embedder(backend="huggingface", hf_model="sentence-transformers/all-MiniLM-L6-v2")
+    assert plain.query_instruction == ""
+
+def test_embed_queries_batches_cache_misses(monkeypatch):
+    from app.services.query_cache import QueryEmbeddingCache
+    calls = []
+    class RecordingModel(DummySentenceTransformer):
+        def encode(self, texts, **kwargs):
+            calls.append(list(texts))
+            return super().encode(texts, **kwargs)
+    monkeypatch.setattr(embedder_mod, "SentenceTransformer", RecordingModel)
+    embedder = Embedder(backend="huggingface", hf_model="dummy", query_cache=QueryEmbeddingCache(max_size=8))
+    embedder.embed_query("cached")
+    vectors = embedder.embed_queries(["a", "cached", "b", "a "])
+    assert calls[1:] == [["a", "b"]]
+    assert vectors[0] == vectors[3] and len(vectors) == 4
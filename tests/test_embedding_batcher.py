@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.services.embedding_batcher import EmbeddingBatcher
+
+class SlowEmbed:
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, texts, batch_size=None):
+        self.calls.append(list(texts))
+        self.release.wait(1)
+        return [[float(len(t))] for t in texts]
+
+def test_concurrent_queries_share_one_model_call():
+    embed = SlowEmbed()
+    batcher = EmbeddingBatcher(embed, max_batch_size=8, window_ms=200)
+    embed.release.set()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(batcher.embed, ["a", "bb", "ccc", "bb"]))
+    batcher.close()
+
+    assert results == [[1.0], [2.0], [3.0], [2.0]]
+    assert len(embed.calls) == 1 and sorted(embed.calls[0]) == ["a", "bb", "ccc"]
+    stats = batcher.stats()
+    assert stats["queries"] == 4 and stats["batch_size_histogram"] == {"3": 1}
+    assert stats["mean_batch_size"] == 3 and stats["mean_queries_per_call"] == 4
+
+def test_batches_are_capped_at_max_size():
+    embed = SlowEmbed()
+    embed.release.set()
+    batcher = EmbeddingBatcher(embed, max_batch_size=2, window_ms=200)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        list(pool.map(batcher.embed, ["a", "b", "c", "d", "e"]))
+    batcher.close()
+    assert all(len(call) <= 2 for call in embed.calls)
+    assert sum(len(call) for call in embed.calls) == 5
+
+def test_errors_reach_every_waiting_caller():
+    def failing(texts, batch_size=None):
+        raise RuntimeError("model down")
+    batcher = EmbeddingBatcher(failing, max_batch_size=4, window_ms=1)
+    with pytest.raises(RuntimeError, match="model down"):
+        batcher.embed("q")
+    batcher.close()
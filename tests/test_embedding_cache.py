@@ -0,0 +1,50 @@
+from app.services.embedding_cache import ChunkEmbeddingCache
+from app.services.indexer import CodeIndexer
+from app.services.pipeline import IndexingPipeline
+
+class CountingEmbedder:
+    dim = 4
+    model_key = "counting"
+
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, texts, batch_size=None):
+        self.batches.append(list(texts))
+        return [[float(len(t))] * self.dim for t in texts]
+
+def test_get_many_returns_hits_in_order(tmp_path):
+    cache = ChunkEmbeddingCache(str(tmp_path/"cache.sqlite"), max_bytes=10 ** 6)
+    cache.put_many("model", ["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+    assert cache.get_many("model", ["b", "x", "a"]) == [[3.0, 4.0], None, [1.0, 2.0]]
+    assert cache.get_many("other-model", ["a"]) == [None]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 2)
+
+def test_entries_persist_and_evict_least_recently_used(tmp_path):
+    path = str(tmp_path/"cache.sqlite")
+    cache = ChunkEmbeddingCache(path, max_bytes=3 * 16)  # Three 4-float vectors
+    cache.put_many("m", ["a", "b", "c"], [[1.0] * 4, [2.0] * 4, [3.0] * 4])
+    cache.get_many("m", ["a"])  # "b" is now the least recently used
+    cache.put_many("m", ["d"], [[4.0] * 4])
+    cache.close()
+
+    reopened = ChunkEmbeddingCache(path, max_bytes=3 * 16)
+    assert reopened.get_many("m", ["a", "b", "d"]) == [[1.0] * 4, None, [4.0] * 4]
+    assert reopened.stats()["bytes"] <= 3 * 16
+
+def test_pipeline_skips_cached_chunks(tmp_path, make_repo):
+    files = make_repo(n_files=3, funcs_per_file=2)
+    cache = ChunkEmbeddingCache(str(tmp_path/"cache.sqlite"), max_bytes=10 ** 6)
+
+    def index():
+        embedder = CountingEmbedder()
+        indexer = CodeIndexer(dim=4, index_path=str(tmp_path/"x.index"), metadata_path=str(tmp_path/"x.bin"))
+        result = IndexingPipeline(embedder, indexer, batch_size=4, embedding_cache=cache).run(files)
+        return embedder, indexer, result
+
+    first, _, _ = index()
+    assert sum(len(b) for b in first.batches) == 6
+    second, indexer, result = index()
+    assert second.batches == []
+    assert result.stats.cached_chunks == 6
+    assert indexer.index.ntotal == 6 and sorted(sum(result.ids.values(), [])) == list(range(6))
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import pytest
+from app.core.executors import BoundedExecutor, ExecutorSaturated, ExecutorTimeout
+
+def test_rejects_work_beyond_workers_and_queue():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(gate.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: "rejected")
+        gate.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == (True, "queued")
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["in_flight"] == 0
+
+def test_drops_work_that_waited_past_queue_timeout():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1, queue_timeout=0.05)
+    ran = []
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.run(lambda: threading.Event().wait(0.2)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ExecutorTimeout):
+            await executor.run(lambda: ran.append(True))
+        await blocker
+
+    asyncio.run(scenario())
+    assert ran == []
+    assert executor.stats()["timed_out"] == 1
+
+def test_submit_admits_before_returning():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+    gate = threading.Event()
+
+    async def scenario():
+        running = executor.submit(gate.wait)
+        with pytest.raises(ExecutorSaturated):
+            executor.submit(lambda: "rejected")
+        gate.set()
+        return await running
+
+    assert asyncio.run(scenario()) is True
+    assert executor.stats()["in_flight"] == 0
@@ -0,0 +1,53 @@
+import asyncio
+import time
+import pytest
+from app.services.index_registry import IndexRegistry
+from app.services.searcher import CodeSearcher
+
+class SlowRegistry(IndexRegistry):
+    slow = set()
+    def get(self, repo_name):
+        if repo_name in self.slow:
+            time.sleep(0.5)
+        return super().get(repo_name)
+
+@pytest.fixture
+def searcher(index_store, axis_embedder):
+    index_store.build("near", [[1, 0.1, 0, 0], [0, 1, 0, 0]])
+    index_store.build("nearest", [[1, 0, 0, 0]])
+    index_store.build("far", [[0.5, 1, 0, 0]])
+    return CodeSearcher(embedder=axis_embedder, registry=index_store.registry(SlowRegistry))
+
+def test_merges_all_repos_into_global_top_k(searcher):
+    hits, statuses = asyncio.run(searcher.federated_search("e0", top_k=3))
+    assert [meta["repo_name"] for _, meta in hits] == ["nearest", "near", "far"]
+    assert [score for score, _ in hits] == sorted((score for score, _ in hits), reverse=True)
+    assert statuses == {"far": "ok", "near": "ok", "nearest": "ok"}
+
+def test_slow_repo_is_skipped_after_timeout(searcher):
+    searcher.registry.slow = {"nearest"}
+    start = time.perf_counter()
+    hits, statuses = asyncio.run(searcher.federated_search("e0", ["nearest", "near", "missing"], top_k=5, timeout=0.1))
+    assert time.perf_counter() - start < 0.45
+    assert statuses == {"nearest": "timeout", "near": "ok", "missing": "error"}
+    assert {meta["repo_name"] for _, meta in hits} == {"near"}
+
+def test_total_timeout_bounds_the_whole_search(searcher):
+    searcher.registry.slow = {"nearest", "near"}
+    start = time.perf_counter()
+    hits, statuses = asyncio.run(searcher.federated_search(
+        "e0", ["nearest", "near", "far"], top_k=5, timeout=5, parallelism=1, total_timeout=0.2
+    ))
+    assert time.perf_counter() - start < 0.45
+    assert statuses == {"nearest": "timeout", "near": "timeout", "far": "timeout"}
+    assert hits == []
+
+def test_timed_out_repo_keeps_its_parallelism_slot(searcher):
+    searcher.registry.slow = {"nearest"}
+    start = time.perf_counter()
+    _, statuses = asyncio.run(searcher.federated_search(
+        "e0", ["nearest", "near"], top_k=5, timeout=0.1, parallelism=1
+    ))
+    # "near" only starts once the slow search has really finished on the executor
+    assert time.perf_counter() - start >= 0.45
+    assert statuses == {"nearest": "timeout", "near": "ok"}
@@ -0,0 +1,85 @@
+import threading
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api import repos as repos_api
+from app.dependencies import get_index_jobs
+from app.services.index_jobs import IndexJobRunner
+
+def wait_for(runner, repo_name, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = runner.get(repo_name)
+        if status["state"] in ("ready", "failed"):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job for {repo_name} did not finish")
+
+def test_job_reports_progress_and_completes():
+    release = threading.Event()
+    seen = []
+
+    def index_fn(repo_path, full_rebuild=False, progress=None, paths=None):
+        progress(1, 2)
+        release.wait(5)
+        progress(2, 2)
+        seen.append((repo_path, full_rebuild, paths))
+        return True
+
+    runner = IndexJobRunner(index_fn)
+    runner.submit("/repos/demo", full_rebuild=True)
+    deadline = time.time() + 5
+    while runner.get("demo")["files_done"] != 1 and time.time() < deadline:
+        time.sleep(0.01)
+    status = runner.get("demo")
+    assert status["state"] == "running" and status["progress"] == 0.5
+    # Requests while running become one follow-up job covering all reported files
+    follow_up = runner.submit("/repos/demo", paths=["a.py"])
+    assert runner.submit("/repos/demo", paths=["b.py"]) is follow_up
+    assert runner.get("demo")["state"] == "queued" and runner.get("demo")["paths"] == 2
+
+    release.set()
+    status = wait_for(runner, "demo")
+    assert status["state"] == "ready" and status["reindexed"] is True and status["progress"] == 1.0
+    assert seen == [("/repos/demo", True, None), ("/repos/demo", False, ["a.py", "b.py"])]
+    runner.shutdown()
+
+def test_failed_job_keeps_error_and_can_be_retried():
+    calls = []
+
+    def index_fn(repo_path, full_rebuild=False, progress=None):
+        calls.append(repo_path)
+        if len(calls) == 1:
+            raise RuntimeError("disk full")
+        return False
+
+    runner = IndexJobRunner(index_fn)
+    runner.submit("/repos/broken")
+    status = wait_for(runner, "broken")
+    assert status["state"] == "failed" and status["error"] == "disk full"
+
+    runner.submit("/repos/broken")
+    status = wait_for(runner, "broken")
+    assert status["state"] == "ready" and status["reindexed"] is False
+    assert list(runner.jobs()) == ["broken"]
+    runner.shutdown()
+
+def test_index_endpoints(tmp_path, monkeypatch):
+    (tmp_path / "demo").mkdir()
+    monkeypatch.setattr(repos_api, "list_repo_paths", lambda: sorted(tmp_path.iterdir()))
+    runner = IndexJobRunner(lambda repo_path, full_rebuild=False, progress=None: True)
+    app.dependency_overrides[get_index_jobs] = lambda: runner
+    try:
+        client = TestClient(app)
+        response = client.post("/repos/demo/index")
+        assert response.status_code == 202
+        assert response.json()["repo_name"] == "demo"
+        assert client.post("/repos/missing/index").status_code == 404
+
+        wait_for(runner, "demo")
+        assert client.get("/repos/demo/status").json()["state"] == "ready"
+        assert client.get("/repos/").json()["status"]["demo"]["state"] == "ready"
+        assert set(client.post("/repos/index").json()["jobs"]) == {"demo"}
+    finally:
+        app.dependency_overrides = {}
+        runner.shutdown()
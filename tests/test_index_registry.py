@@ -0,0 +1,47 @@
+import os
+import pytest
+
+def build_index(index_store, repo_name, n):
+    # Collinear vectors only differ in length, so these indexes use L2
+    return index_store.build(repo_name, [[float(i)] * index_store.dim for i in range(n)], metric="l2")
+
+def test_registry_loads_once(index_store):
+    build_index(index_store, "repo", 3)
+    registry = index_store.registry()
+    first = registry.get("repo")
+    second = registry.get("repo")
+    assert first is second
+    assert registry.stats()["misses"] == 1
+    assert registry.stats()["hits"] == 1
+
+def test_registry_hot_swaps_new_version(index_store):
+    index_path = build_index(index_store, "repo", 3)
+    registry = index_store.registry()
+    assert len(registry.get("repo").metadata) == 3
+    build_index(index_store, "repo", 5)
+    # Guarantee a distinct mtime even on coarse-grained filesystems
+    stat = os.stat(index_path)
+    os.utime(index_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert len(registry.get("repo").metadata) == 5
+
+def test_registry_evicts_least_recently_used(index_store):
+    build_index(index_store, "a", 3)
+    build_index(index_store, "b", 3)
+    registry = index_store.registry(max_bytes=1)
+    registry.get("a")
+    registry.get("b")
+    assert registry.stats()["repos"] == ["b"]
+    assert registry.stats()["evictions"] == 1
+
+def test_registry_missing_repo(index_store):
+    registry = index_store.registry()
+    with pytest.raises(FileNotFoundError):
+        registry.get("missing")
+
+def test_registry_memory_maps_large_indexes(index_store):
+    build_index(index_store, "repo", 3)
+    registry = index_store.registry(mmap_mode="auto", mmap_min_bytes=1)
+    indexer = registry.get("repo")
+    assert indexer.mmapped
+    assert registry.stats()["mmapped"] == ["repo"]
+    assert indexer.search([2.0] * index_store.dim, top_k=1)[0][1]["path"] == "repo/2.py"
@@ -23,3 +23,58 @@ def test_indexer_matches_embedder_dim(tmp_path):
 
     assert index_path.exists(), "Index file should be saved"
     assert metadata_path.exists(), "Metadata file should be saved"
+
+def test_auto_index_type_for_small_corpus(tmp_path):
+    index_path = tmp_path/"auto.index"
+    indexer = CodeIndexer(dim=8, index_path=str(index_path), metadata_path=str(tmp_path/"auto.pkl"), index_type="auto")
+    indexer.add_embeddings(np.random.rand(20, 8).tolist(), [{"path": f"f{i}"} for i in range(20)])
+    indexer.save()
+    assert indexer.index_type == "flat"
+    reloaded = CodeIndexer(dim=8, index_path=str(index_path), metadata_path=str(tmp_path/"auto.pkl"))
+    assert reloaded.index_type == "flat"
+
+def test_ivf_index_trains_and_searches_with_nprobe(tmp_path):
+    vectors = np.random.default_rng(1).random((500, 8)).astype("float32")
+    index_path = tmp_path/"ivf.index"
+    indexer = CodeIndexer(dim=8, index_path=str(index_path), metadata_path=str(tmp_path/"ivf.pkl"), index_type="ivf_flat")
+    indexer.add_embeddings(vectors.tolist(), [{"path": f"f{i}"} for i in range(500)])
+    indexer.remove_ids([0])
+    indexer.save()
+
+    reloaded = CodeIndexer(dim=8, index_path=str(index_path), metadata_path=str(tmp_path/"ivf.pkl"))
+    assert reloaded.index_type == "ivf_flat"
+    assert reloaded.ntotal == 499
+    results = reloaded.search(vectors[7], top_k=1, nprobe=64)
+    assert results[0][1]["path"] == "f7"
+    reloaded.remove_ids([7])
+    assert reloaded.ntotal == 498
+
+def test_hnsw_index_does_not_support_removal(tmp_path):
+    indexer = CodeIndexer(dim=8, index_path=str(tmp_path/"h.index"), metadata_path=str(tmp_path/"h.pkl"), index_type="hnsw")
+    indexer.add_embeddings(np.random.rand(10, 8).tolist(), [{"path": f"f{i}"} for i in range(10)])
+    indexer.build()
+    assert indexer.index_type == "hnsw"
+    assert not indexer.supports_removal
+    assert indexer.search(np.random.rand(8), top_k=3, ef_search=32)
+
+def test_cosine_index_returns_unit_interval_scores(tmp_path):
+    indexer = CodeIndexer(dim=3, index_path=str(tmp_path/"c.index"), metadata_path=str(tmp_path/"c.pkl"), metric="cosine")
+    indexer.add_embeddings([[2.0, 0.0, 0.0], [0.0, 3.0, 0.0], [-1.0, 0.0, 0.0]],
+                           [{"path": "x"}, {"path": "y"}, {"path": "opposite"}])
+    results = indexer.search([5.0, 0.0, 0.0], top_k=3)
+    assert results[0][1]["path"] == "x"
+    assert abs(results[0][0] - 1.0) < 1e-6
+    assert all(0.0 <= score <= 1.0 for score, _ in results)
+    assert results[-1] == (0.0, indexer.metadata[2])
+
+def test_mmapped_index_reloads_into_ram_before_mutation(tmp_path):
+    index_path, metadata_path = str(tmp_path/"m.index"), str(tmp_path/"m.bin")
+    indexer = CodeIndexer(dim=4, index_path=index_path, metadata_path=metadata_path)
+    indexer.add_embeddings(np.eye(4, dtype="float32")[:2], [{"path": "a"}, {"path": "b"}])
+    indexer.save()
+
+    mapped = CodeIndexer(dim=4, index_path=index_path, metadata_path=metadata_path, autoload=False)
+    assert mapped.load(mmap=True) and mapped.mmapped
+    assert mapped.search(np.eye(4)[0], top_k=1)[0][1]["path"] == "a"
+    mapped.add_embeddings(np.eye(4, dtype="float32")[2:3], [{"path": "c"}])
+    assert not mapped.mmapped and mapped.index.ntotal == 3
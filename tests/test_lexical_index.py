@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from app.services.lexical_index import LexicalIndex, identifier_terms, reciprocal_rank_fusion, tokenize
+from app.services.searcher import CodeSearcher
+
+CHUNKS = [
+    ("compute_repo_hash", "def compute_repo_hash(repo_path):\n    return hashlib.sha256(repo_path).hexdigest()"),
+    ("run_pipeline", "def run_pipeline(repo_path):\n    digest = compute_repo_hash(repo_path)\n    return digest"),
+    ("CodeSearcher", "class CodeSearcher:\n    def semantic_search(self, query):\n        return []"),
+]
+
+class NoEmbedder:
+    def embed_query(self, query):
+        raise AssertionError("the lexical fast path must not embed the query")
+
+def test_tokenize_splits_identifiers_and_keeps_them_whole():
+    assert tokenize("computeRepoHash(x) repo_path") == ["computerepohash", "compute", "repo", "hash", "repo_path", "repo", "path"]
+
+def test_identifier_terms():
+    assert identifier_terms("compute_repo_hash") == ["compute_repo_hash"]
+    assert identifier_terms("CodeSearcher.semantic_search") == ["codesearcher", "semantic_search"]
+    assert identifier_terms("where is `compute_repo_hash` defined") == ["compute_repo_hash"]
+    assert identifier_terms("how are repos hashed") is None
+    assert identifier_terms("hash") is None
+
+def test_definition_outranks_callers():
+    index = LexicalIndex()
+    index.add([10, 11, 12], [text for _, text in CHUNKS], [name for name, _ in CHUNKS])
+    hits = index.search(["compute_repo_hash"])
+    assert [doc_id for _, doc_id in hits] == [10, 11]
+    assert hits[0][0] > hits[1][0]
+
+def test_remove_add_and_reload(tmp_path):
+    index = LexicalIndex()
+    index.add([0, 1, 2], [text for _, text in CHUNKS], [name for name, _ in CHUNKS])
+    path = str(tmp_path / "lexical.npz")
+    index.save(path)
+
+    loaded = LexicalIndex.load(path)
+    assert len(loaded) == 3
+    loaded.remove([0])
+    loaded.add([3], ["def compute_repo_hash(path): pass"], ["compute_repo_hash"])
+    assert [doc_id for _, doc_id in loaded.search(["compute_repo_hash"])] == [3, 1]
+    loaded.save(path)
+    assert len(LexicalIndex.load(path)) == 3
+
+def test_reciprocal_rank_fusion_prefers_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 4]])
+    assert [doc_id for _, doc_id in fused][:2] == [2, 1]
+    assert reciprocal_rank_fusion([[7], [7]])[0] == (1.0, 7)
+
+@pytest.fixture
+def registry(index_store):
+    index_store.build(
+        "repo",
+        np.eye(index_store.dim)[:3],
+        [{"path": f"{name}.py", "name": name, "type": "function", "start_line": 1, "end_line": 3} for name, _ in CHUNKS],
+        texts=[text for _, text in CHUNKS],
+    )
+    return index_store.registry()
+
+def test_identifier_query_skips_the_embedder(registry):
+    searcher = CodeSearcher(embedder=NoEmbedder(), registry=registry)
+    results = searcher.semantic_search("repo", "where is `compute_repo_hash` defined", top_k=5, mode="auto")
+    assert [meta["name"] for _, meta in results] == ["compute_repo_hash", "run_pipeline"]
+    assert results[0][0] == 1.0
+
+def test_hybrid_fuses_vector_and_lexical_hits(registry, axis_embedder):
+    axis_embedder.axis = 2  # Nearest to the CodeSearcher chunk
+    searcher = CodeSearcher(embedder=axis_embedder, registry=registry)
+    semantic = searcher.semantic_search("repo", "hash of a repo", top_k=1, mode="semantic")
+    assert [meta["name"] for _, meta in semantic] == ["CodeSearcher"]
+    hybrid = searcher.semantic_search("repo", "hash of a repo", top_k=3, mode="hybrid")
+    assert {meta["name"] for _, meta in hybrid} == {"CodeSearcher", "compute_repo_hash", "run_pipeline"}
+    assert all(0.0 <= score <= 1.0 for score, _ in hybrid)
+    assert semantic[0] in hybrid  # Vector hits keep their vector score
+
+@pytest.mark.parametrize("mode", ["hybrid", "auto"])
+def test_hybrid_respects_min_score(registry, axis_embedder, mode):
+    axis_embedder.axis = 2
+    searcher = CodeSearcher(embedder=axis_embedder, registry=registry)
+    semantic = searcher.semantic_search("repo", "hash of a repo", top_k=3, min_score=0.9, mode="semantic")
+    results = searcher.semantic_search("repo", "hash of a repo", top_k=3, min_score=0.9, mode=mode)
+    assert results == semantic
+    assert [meta["name"] for _, meta in results] == ["CodeSearcher"]
+    assert searcher.semantic_search("repo", "hash of a repo", top_k=3, min_score=1.01, mode=mode) == []
+
+def test_weak_lexical_hits_fall_back_to_hybrid(registry, axis_embedder, monkeypatch):
+    from app.core.config import settings
+    axis_embedder.axis = 2
+    searcher = CodeSearcher(embedder=axis_embedder, registry=registry)
+    strong = searcher.lexical_search("repo", "compute_repo_hash", top_k=5)
+    best_bm25 = searcher._get_indexer("repo").lexical.search(["compute_repo_hash"], 1)[0][0]
+    assert searcher.lexical_search("repo", "compute_repo_hash", top_k=5, min_bm25=best_bm25) == strong[:1]
+
+    monkeypatch.setattr(settings, "LEXICAL_MIN_SCORE", best_bm25 * 2)
+    results = searcher.semantic_search("repo", "where is `compute_repo_hash` defined", top_k=3, mode="auto")
+    assert axis_embedder.calls == 1  # No hit cleared the threshold, so the query was embedded
+    assert results
@@ -0,0 +1,71 @@
+import os
+import shutil
+import subprocess
+import pytest
+from app.utils import manifest as manifest_mod
+from app.utils.manifest import diff_manifest, git_blob_ids
+
+def write_repo(root, files):
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return [(str(root / name), "Python") for name in sorted(files)]
+
+def first_manifest(repo, code_files, **kwargs):
+    # New files are not read by the diff; the pipeline supplies their hash
+    diff = diff_manifest(str(repo), code_files, {}, **kwargs)
+    return {os.path.relpath(path, repo): {**entry, "sha256": manifest_mod.hash_file(path), "ids": [i]}
+            for i, (path, _, entry) in enumerate(diff.changed)}
+
+def test_unchanged_stat_skips_hashing(tmp_path, monkeypatch):
+    code_files = write_repo(tmp_path, {"a.py": "x = 1\n", "b.py": "y = 2\n", "c.py": "z = 3\n"})
+    manifest = first_manifest(tmp_path, code_files, use_git=False)
+    assert all("inode" in entry for entry in manifest.values())
+
+    hashed = []
+    original = manifest_mod.hash_file
+    monkeypatch.setattr(manifest_mod, "hash_file", lambda path: hashed.append(path) or original(path))
+    (tmp_path / "b.py").write_text("y = 22\n")
+    os.utime(tmp_path / "c.py", ns=(0, 10 ** 9))  # Touched, same content
+    os.remove(tmp_path / "a.py")
+
+    diff = diff_manifest(str(tmp_path), code_files[1:], manifest, workers=4, use_git=False)
+    assert sorted(os.path.basename(path) for path in hashed) == ["b.py", "c.py"]
+    assert [os.path.basename(path) for path, _, _ in diff.changed] == ["b.py"]
+    assert diff.unchanged["c.py"]["ids"] == manifest["c.py"]["ids"]
+    assert diff.deleted == ["a.py"]
+
+def test_manifest_without_inodes_is_upgraded(tmp_path):
+    code_files = write_repo(tmp_path, {"a.py": "x = 1\n"})
+    manifest = first_manifest(tmp_path, code_files, use_git=False)
+    legacy = {path: {k: v for k, v in entry.items() if k != "inode"} for path, entry in manifest.items()}
+    diff = diff_manifest(str(tmp_path), code_files, legacy, use_git=False)
+    assert not diff.has_changes
+    assert diff.unchanged == manifest
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_clean_git_blob_trusted_despite_new_mtime(tmp_path, monkeypatch):
+    code_files = write_repo(tmp_path, {"a.py": "x = 1\n", "b.py": "y = 2\n"})
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(git + ["init", "-q"], check=True)
+    subprocess.run(git + ["add", "."], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "init"], check=True)
+    manifest = first_manifest(tmp_path, code_files)
+    assert set(git_blob_ids(str(tmp_path))) == {"a.py", "b.py"}
+
+    # Re-created files (as after a checkout) with the same content and a dirty edit
+    for name in ("a.py", "b.py"):
+        text = (tmp_path / name).read_text()
+        os.remove(tmp_path / name)
+        (tmp_path / name).write_text(text)
+        os.utime(tmp_path / name, ns=(0, 10 ** 9))
+    (tmp_path / "b.py").write_text("y = 3\n")
+
+    hashed = []
+    original = manifest_mod.hash_file
+    monkeypatch.setattr(manifest_mod, "hash_file", lambda path: hashed.append(path) or original(path))
+    diff = diff_manifest(str(tmp_path), code_files, manifest)
+    assert [os.path.basename(path) for path in hashed] == ["b.py"]
+    assert [os.path.basename(path) for path, _, _ in diff.changed] == ["b.py"]
+    assert diff.unchanged["a.py"]["ids"] == manifest["a.py"]["ids"]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from app.services.indexer import CodeIndexer
+from app.services.metadata_store import ColumnarMetadata, write_metadata
+
+
+def test_round_trip_preserves_fields(tmp_path):
+    path = tmp_path/"metadata.bin"
+    metadata = {
+        7: {"path": "src/a.py", "name": "área", "type": "function", "start_line": 3, "end_line": 9},
+        2: {"path": "src/a.py", "name": "A", "type": "class", "start_line": 1, "end_line": 20},
+        5: {"path": "lib/b.rs", "name": "", "type": "impl_item", "start_line": 4, "end_line": 4},
+    }
+    write_metadata(str(path), metadata)
+
+    store = ColumnarMetadata(str(path))
+    assert len(store) == 3
+    assert list(store) == [2, 5, 7]
+    assert store.paths == ["src/a.py", "lib/b.rs"]  # Interned once per file
+    assert "impl_item" in store.types
+    assert store[7] == {"id": 7, **metadata[7]}
+    assert store[5]["type"] == "impl_item"
+    assert 3 not in store and store.get(3) is None
+    with pytest.raises(KeyError):
+        store[100]
+    assert store.max_id() == 7
+
+
+def test_empty_metadata(tmp_path):
+    write_metadata(str(tmp_path/"empty.bin"), {})
+    store = ColumnarMetadata(str(tmp_path/"empty.bin"))
+    assert len(store) == 0 and list(store) == [] and store.max_id() == -1
+
+
+def test_loaded_index_is_mapped_and_mutable(tmp_path):
+    index_path, metadata_path = str(tmp_path/"faiss.index"), str(tmp_path/"metadata.bin")
+    indexer = CodeIndexer(dim=4, index_path=index_path, metadata_path=metadata_path)
+    indexer.add_embeddings(np.eye(4, dtype="float32")[:2], [{"path": "a.py", "name": "a"}, {"path": "b.py", "name": "b"}])
+    indexer.save()
+
+    reloaded = CodeIndexer(dim=4, index_path=index_path, metadata_path=metadata_path)
+    assert isinstance(reloaded.metadata, ColumnarMetadata)
+    assert reloaded.next_id == 2
+    assert reloaded.search(np.eye(4)[1], top_k=1)[0][1]["path"] == "b.py"
+
+    reloaded.remove_ids([0])
+    reloaded.add_embeddings(np.eye(4, dtype="float32")[2:3], [{"path": "c.py", "name": "c"}])
+    reloaded.save()
+    assert sorted(m["path"] for m in CodeIndexer(dim=4, index_path=index_path,
+                                                 metadata_path=metadata_path).metadata.values()) == ["b.py", "c.py"]
@@ -0,0 +1,51 @@
+import numpy as np
+from app.services.indexer import CodeIndexer
+from app.services.pipeline import IndexingPipeline
+
+class RecordingEmbedder:
+    dim = 4
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def embed(self, texts, batch_size=None):
+        if self.fail_on and any(self.fail_on in t for t in texts):
+            raise RuntimeError("boom")
+        self.batches.append(list(texts))
+        return np.ones((len(texts), self.dim)).tolist()
+
+def test_pipeline_packs_chunks_across_files(tmp_path, make_repo):
+    files = make_repo(n_files=5, funcs_per_file=3)
+    embedder = RecordingEmbedder()
+    indexer = CodeIndexer(dim=4, index_path=str(tmp_path/"x.index"), metadata_path=str(tmp_path/"x.pkl"))
+    result = IndexingPipeline(embedder, indexer, chunk_workers=2, batch_size=4, sort_window=2).run(files)
+
+    assert [len(b) for b in embedder.batches] == [4, 4, 4, 3]
+    assert result.stats.files == 5
+    assert result.stats.chunks == 15
+    assert set(result.ids) == {f"mod{i}.py" for i in range(5)}
+    assert all(len(ids) == 3 for ids in result.ids.values())
+    assert indexer.index.ntotal == 15
+
+def test_pipeline_drops_files_that_fail_to_embed(tmp_path, make_repo):
+    files = make_repo(n_files=2, funcs_per_file=1)
+    (tmp_path/"bad.py").write_text("def poison():\n    return 0\n")
+    files.append((str(tmp_path/"bad.py"), "Python", "bad.py"))
+    embedder = RecordingEmbedder(fail_on="poison")
+    indexer = CodeIndexer(dim=4, index_path=str(tmp_path/"x.index"), metadata_path=str(tmp_path/"x.pkl"))
+    result = IndexingPipeline(embedder, indexer, batch_size=1).run(files)
+
+    assert result.failed == {"bad.py"}
+    assert set(result.ids) == {"mod0.py", "mod1.py"}
+    assert indexer.index.ntotal == 2
+
+def test_process_pool_matches_threaded_output(tmp_path, make_repo):
+    files = make_repo(n_files=6, funcs_per_file=2)
+
+    def index_with(workers):
+        indexer = CodeIndexer(dim=4, index_path=str(tmp_path/"x.index"), metadata_path=str(tmp_path/"x.pkl"))
+        result = IndexingPipeline(RecordingEmbedder(), indexer, workers=workers, batch_size=5).run(files)
+        return result.ids, indexer.metadata
+
+    assert index_with(workers=2) == index_with(workers=0)
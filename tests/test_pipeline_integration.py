@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import pytest
 from app.services import crawler, chunker, embedder, indexer
@@ -40,4 +41,122 @@ class Bar: pass""")
     idx.add_embeddings(vectors, chunks)
     idx.save()
     assert (tmp_path/"faiss.index").exists(), "Index file should be saved"
-    assert (tmp_path/"metadata.pkl").exists(), "Metadata file should be saved"
\ No newline at end of file
+    assert (tmp_path/"metadata.pkl").exists(), "Metadata file should be saved"
+
+def test_pipeline_reindexes_only_changed_files(tmp_path, monkeypatch, embedded_texts):
+    from app.core.config import settings
+    from app.utils.manifest import load_manifest
+    from scripts import run_pipeline as pipeline_mod
+
+    monkeypatch.setattr(settings, "VECTOR_STORE_DIR", str(tmp_path/"store"))
+    monkeypatch.setattr(embedder, "SentenceTransformer", DummyHFModel)
+
+    repo_dir = tmp_path/"repo"
+    repo_dir.mkdir()
+    (repo_dir/"a.py").write_text("def a(): return 1\n")
+    (repo_dir/"b.py").write_text("def b(): return 2\n")
+    (repo_dir/"c.py").write_text("def c(): return 3\n")
+
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface")
+    assert len(embedded_texts) == 3
+    first_manifest = load_manifest("repo")
+    assert set(first_manifest) == {"a.py", "b.py", "c.py"}
+
+    embedded_texts.clear()
+    (repo_dir/"b.py").write_text("def b(): return 20\n")
+    (repo_dir/"c.py").unlink()
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface")
+    assert embedded_texts == ["def b(): return 20"]
+
+    manifest = load_manifest("repo")
+    assert set(manifest) == {"a.py", "b.py"}
+    assert manifest["a.py"]["ids"] == first_manifest["a.py"]["ids"]
+
+    idx = indexer.CodeIndexer(dim=10, index_path=str(tmp_path/"store"/"repo"/"faiss.index"),
+                              metadata_path=str(tmp_path/"store"/"repo"/"metadata.bin"))
+    assert idx.index.ntotal == 2
+    assert sorted(m["name"] for m in idx.metadata.values()) == ["a", "b"]
+
+    embedded_texts.clear()
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface")
+    assert embedded_texts == []
+
+def test_pipeline_reindexes_only_reported_paths(tmp_path, monkeypatch, embedded_texts):
+    from app.core.config import settings
+    from app.utils.manifest import load_manifest
+    from scripts import run_pipeline as pipeline_mod
+
+    monkeypatch.setattr(settings, "VECTOR_STORE_DIR", str(tmp_path/"store"))
+    monkeypatch.setattr(embedder, "SentenceTransformer", DummyHFModel)
+
+    repo_dir = tmp_path/"repo"
+    (repo_dir/"pkg").mkdir(parents=True)
+    (repo_dir/"a.py").write_text("def a(): return 1\n")
+    (repo_dir/"b.py").write_text("def b(): return 2\n")
+    (repo_dir/"pkg"/"c.py").write_text("def c(): return 3\n")
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface")
+    first_manifest = load_manifest("repo")
+
+    # Only the reported files are looked at, even though a.py changed too
+    embedded_texts.clear()
+    (repo_dir/"a.py").write_text("def a(): return 10\n")
+    (repo_dir/"b.py").write_text("def b(): return 20\n")
+    (repo_dir/"d.py").write_text("def d(): return 4\n")
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface", paths=["b.py", str(repo_dir/"d.py")])
+    assert sorted(embedded_texts) == ["def b(): return 20", "def d(): return 4"]
+    manifest = load_manifest("repo")
+    assert set(manifest) == {"a.py", "b.py", "d.py", os.path.join("pkg", "c.py")}
+    assert manifest["a.py"] == first_manifest["a.py"]
+
+    # A removed directory drops the files recorded below it
+    embedded_texts.clear()
+    (repo_dir/"pkg"/"c.py").unlink()
+    (repo_dir/"pkg").rmdir()
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface", paths=["pkg"])
+    assert embedded_texts == []
+    assert set(load_manifest("repo")) == {"a.py", "b.py", "d.py"}
+
+def test_index_repo_reuses_given_embedder(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from scripts import init_db
+    from scripts import run_pipeline as pipeline_mod
+
+    monkeypatch.setattr(settings, "VECTOR_STORE_DIR", str(tmp_path/"store"))
+    monkeypatch.setattr(embedder, "SentenceTransformer", DummyHFModel)
+    shared = embedder.Embedder(backend="huggingface", hf_model="dummy", normalize=settings.SIMILARITY_METRIC == "cosine")
+    def no_new_embedder(*args, **kwargs):
+        raise AssertionError("a second embedder was created")
+    monkeypatch.setattr(pipeline_mod, "Embedder", no_new_embedder)
+
+    repo_dir = tmp_path/"repo"
+    repo_dir.mkdir()
+    (repo_dir/"a.py").write_text("def a(): return 1\n")
+    assert init_db.index_repo(str(repo_dir), embedder=shared) is True
+    (repo_dir/"a.py").write_text("def a(): return 2\n")
+    assert init_db.index_repo(str(repo_dir), embedder=shared, paths=["a.py"]) is True
+
+def test_downgraded_index_type_stays_incremental(tmp_path, monkeypatch, embedded_texts):
+    from app.core.config import settings
+    from scripts import run_pipeline as pipeline_mod
+
+    monkeypatch.setattr(settings, "VECTOR_STORE_DIR", str(tmp_path/"store"))
+    monkeypatch.setattr(embedder, "SentenceTransformer", DummyHFModel)
+
+    repo_dir = tmp_path/"repo"
+    repo_dir.mkdir()
+    (repo_dir/"a.py").write_text("def a(): return 1\n")
+    (repo_dir/"b.py").write_text("def b(): return 2\n")
+    # Two vectors are too few for ivf_pq, so a flat index is built
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface", index_type="ivf_pq")
+
+    embedded_texts.clear()
+    (repo_dir/"b.py").write_text("def b(): return 20\n")
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface", index_type="ivf_pq")
+    assert embedded_texts == ["def b(): return 20"]
+
+    (repo_dir/"b.py").write_text("def b(): return 200\n")
+    pipeline_mod.run_pipeline(str(repo_dir), backend="huggingface", index_type="hnsw")
+    # A different requested type still rebuilds
+    idx = indexer.CodeIndexer(dim=10, index_path=str(tmp_path/"store"/"repo"/"faiss.index"),
+                              metadata_path=str(tmp_path/"store"/"repo"/"metadata.bin"))
+    assert idx.index_type == "hnsw" and idx.index.ntotal == 2
@@ -0,0 +1,32 @@
+from app.services.embedder import Embedder
+from app.services.query_cache import QueryEmbeddingCache
+
+def test_lru_eviction_and_counters():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    assert cache.get("m", "a") == [1.0]  # "a" becomes most recent
+    cache.put("m", "c", [3.0])
+    assert cache.get("m", "b") is None
+    assert cache.get("other-model", "a") is None
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 2, 1)
+
+def test_embed_query_uses_normalized_key(counting_model):
+    embedder = Embedder(backend="huggingface", hf_model="dummy", query_cache=QueryEmbeddingCache(max_size=8))
+    first = embedder.embed_query("where is  auth handled")
+    second = embedder.embed_query("  where is auth\thandled ")
+    assert first == second
+    assert counting_model.calls == 1
+    assert embedder.query_cache.stats()["hits"] == 1
+
+def test_persistence_round_trip(tmp_path):
+    path = str(tmp_path/"queries.npz")
+    cache = QueryEmbeddingCache(max_size=8, persist_path=path)
+    cache.put("small", "q1", [0.5, 0.25])
+    cache.put("large", "q2", [1.0, 2.0, 3.0])
+    cache.save()
+
+    restored = QueryEmbeddingCache(max_size=8, persist_path=path)
+    assert restored.get("small", "q1") == [0.5, 0.25]
+    assert restored.get("large", "q2") == [1.0, 2.0, 3.0]
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+from app.core.warmup import Warmup
+from app.dependencies import get_warmup
+from app.main import app
+from app.services.embedder import Embedder
+
+def test_importing_app_defers_heavy_libraries():
+    code = (
+        "import sys, app.main\n"
+        "heavy = ['torch', 'transformers', 'sentence_transformers', 'faiss', 'tree_sitter_languages', 'openai']\n"
+        "print(','.join(m for m in heavy if m in sys.modules))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+def test_embedder_loads_model_on_first_use(counting_model):
+    embedder = Embedder(backend="huggingface", hf_model="dummy")
+    assert not embedder.loaded and counting_model.loads == 0
+    assert embedder.dim == 4
+    embedder.embed(["a", "b"])
+    assert embedder.loaded and counting_model.loads == 1
+
+def test_warmup_tracks_step_states():
+    loaded = []
+    def broken():
+        raise RuntimeError("no weights")
+    warmup = Warmup({"embedder": lambda: loaded.append("embedder"), "chat": broken})
+    assert warmup.ready  # nothing to wait for until warm-up is started
+    warmup.start()
+    assert not warmup.wait(timeout=5)
+    status = warmup.status()
+    assert loaded == ["embedder"]
+    assert status["steps"] == {"embedder": "ready", "chat": "failed"}
+    assert status["errors"] == {"chat": "no weights"}
+
+def test_health_endpoints():
+    warmup = Warmup({"embedder": lambda: None})
+    app.dependency_overrides[get_warmup] = lambda: warmup
+    try:
+        client = TestClient(app)
+        assert client.get("/health/live").json() == {"status": "alive"}
+        warmup.state["embedder"] = "loading"
+        warmup.started = True
+        assert client.get("/health/ready").status_code == 503
+        warmup.state["embedder"] = "ready"
+        response = client.get("/health/ready")
+        assert response.status_code == 200 and response.json()["ready"] is True
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,72 @@
+import os
+import time
+from app.services.watcher import RepoWatcher
+
+def make_repos(root, files):
+    for rel, text in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+def test_notify_filters_and_batches_per_repo(tmp_path):
+    calls = []
+    watcher = RepoWatcher(str(tmp_path), lambda repo_path, paths: calls.append((repo_path, paths)), debounce=60)
+    watcher.notify(str(tmp_path / "demo" / "a.py"))
+    watcher.notify(str(tmp_path / "demo" / "pkg" / "b.go"))
+    watcher.notify(str(tmp_path / "demo" / "a.py"))
+    for ignored in ["demo/.git/index", "demo/node_modules/x.js", "demo/.a.py.swp", "demo/notes.txt", ".cache/a.py"]:
+        watcher.notify(str(tmp_path / ignored))
+    watcher.notify(str(tmp_path / "other" / ".gitignore"))
+
+    watcher.flush()
+    assert calls == []  # Still within the debounce window
+    watcher.flush(force=True)
+    assert sorted(calls, key=lambda call: call[0]) == [
+        (str(tmp_path / "demo"), {"a.py", os.path.join("pkg", "b.go")}),
+        (str(tmp_path / "other"), None),
+    ]
+
+def test_parent_directory_modified_events_are_ignored(tmp_path):
+    from types import SimpleNamespace
+    calls = []
+    watcher = RepoWatcher(str(tmp_path), lambda repo_path, paths: calls.append(paths))
+    def event(event_type, path, is_directory=False, dest_path=None):
+        return SimpleNamespace(event_type=event_type, src_path=str(tmp_path / path),
+                               is_directory=is_directory, dest_path=dest_path and str(tmp_path / dest_path))
+    # An editor's atomic save: temp file written, renamed over the original, parent dir touched
+    watcher.handle_event(event("created", "demo/pkg/.a.py.tmp"))
+    watcher.handle_event(event("moved", "demo/pkg/.a.py.tmp", dest_path="demo/pkg/a.py"))
+    watcher.handle_event(event("modified", "demo/pkg", is_directory=True))
+    watcher.flush(force=True)
+    assert calls == [{os.path.join("pkg", "a.py")}]
+
+    watcher.handle_event(event("created", "demo/new_pkg", is_directory=True))
+    watcher.flush(force=True)
+    assert calls[-1] is None
+
+def test_max_delay_flushes_during_continuous_edits(tmp_path):
+    calls = []
+    watcher = RepoWatcher(str(tmp_path), lambda repo_path, paths: calls.append(paths), debounce=60, max_delay=0.05)
+    watcher.notify(str(tmp_path / "demo" / "a.py"))
+    time.sleep(0.06)
+    watcher.notify(str(tmp_path / "demo" / "b.py"))
+    watcher.flush()
+    assert calls == [{"a.py", "b.py"}]
+
+def test_polling_backend_reports_changed_files(tmp_path):
+    make_repos(tmp_path, {"demo/a.py": "a = 1\n", "demo/b.py": "b = 1\n", "demo/c.py": "c = 1\n"})
+    calls = []
+    watcher = RepoWatcher(str(tmp_path), lambda repo_path, paths: calls.append((repo_path, paths)),
+                          backend="polling", debounce=0.05, poll_interval=0.05)
+    watcher.start()
+    try:
+        assert watcher.active_backend == "polling"
+        (tmp_path / "demo" / "a.py").write_text("a = 22\n")
+        (tmp_path / "demo" / "c.py").unlink()
+        (tmp_path / "demo" / "d.py").write_text("d = 1\n")
+        deadline = time.time() + 5
+        while not calls and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        watcher.stop()
+    assert calls == [(str(tmp_path / "demo"), {"a.py", "c.py", "d.py"})]